@@ -22,6 +22,7 @@
 import datetime as dt
 import logging
 import os
+import signal
 import stat
 import sys
 import textwrap
@@ -30,7 +31,7 @@ from shutil import get_terminal_size
 import click
 import click_log
 
-from . import controllers, plugins
+from . import daemon, plugins
 from .cli_utils import (
     _select_one_calendar_callback,
     build_collection,
@@ -45,7 +46,6 @@ from .cli_utils import (
 from .exceptions import FatalError
 from .plugins import COMMANDS
 from .terminal import colored
-from .utils import human_formatter, json_formatter
 
 try:
     from setproctitle import setproctitle
@@ -60,6 +60,9 @@ days_option = click.option('--days', default=None, type=int, help='How many days
 week_option = click.option('--week', '-w', help='Include all events in one week.', is_flag=True)
 events_option = click.option('--events', default=None, type=int, help='How many events to include.')
 dates_arg = click.argument('dates', nargs=-1)
+ndjson_option = click.option(
+    '--ndjson', is_flag=True,
+    help='Output one JSON object per event and line (all fields, unless --json is given).')
 
 
 def time_args(f):
@@ -82,15 +85,46 @@ def stringify_conf(conf):
     return '\n'.join(out)
 
 
+def echo_lines(lines):
+    """echo each of `lines` as soon as it is available
+
+    :returns: False if there were no lines at all
+    """
+    echoed = False
+    for line in lines:
+        click.echo(line)
+        echoed = True
+    return echoed
+
+
 class _KhalGroup(click.Group):
     def list_commands(self, ctx):
-        return super().list_commands(ctx) + list(COMMANDS.keys())
+        commands = super().list_commands(ctx)
+        # plugins cannot replace built-in commands, see `get_command`
+        return commands + [name for name in COMMANDS if name not in commands]
 
     def get_command(self, ctx, name):
-        if name in COMMANDS:
+        # only look for plugins (which is slow) if there is no such built-in
+        # command
+        command = super().get_command(ctx, name)
+        if command is None and name in COMMANDS:
             logger.debug(f'found command {name} as a plugin')
             return COMMANDS[name]
-        return super().get_command(ctx, name)
+        return command
+
+    def resolve_command(self, ctx, args):
+        # this runs before `cli` loads the configuration, so that commands a
+        # running `khal daemon` can answer do not need to load it at all
+        cmd_name, cmd, cmd_args = super().resolve_command(ctx, args)
+        if cmd_name in daemon.COMMANDS and ctx.obj is None and not ctx.resilient_parsing \
+                and getattr(ctx, 'logfilepath', None) is None:
+            color = ctx.color if ctx.color is not None else sys.stdout.isatty()
+            level = logging.getLevelName(logging.getLogger('khal').getEffectiveLevel())
+            code = daemon.forward(
+                [cmd_name, *cmd_args], ctx.params.get('config'), color, level)
+            if code is not None:
+                ctx.exit(code)
+        return cmd_name, cmd, cmd_args
 
 
 @click.group(cls=_KhalGroup)
@@ -98,6 +132,9 @@ class _KhalGroup(click.Group):
 @global_options
 @click.pass_context
 def cli(ctx, config):
+    if ctx.obj is not None:
+        # run by `khal daemon`, which has prepared the context already
+        return
     # setting the process title so it looks nicer in ps
     # shows up as 'khal' under linux and as 'python: khal (python2.7)'
     # under FreeBSD, which is still nicer than the default
@@ -124,6 +161,7 @@ def cli(ctx, config):
 def calendar(ctx, include_calendar, exclude_calendar, daterange, once,
              notstarted, format, day_format):
     '''Print calendar with agenda.'''
+    from . import controllers
     try:
         rows = controllers.calendar(
             build_collection(
@@ -168,18 +206,22 @@ def calendar(ctx, include_calendar, exclude_calendar, daterange, once,
 @click.option('--notstarted', help=('Print only events that have not started.'),
               is_flag=True)
 @click.option('--json', help=("Fields to output in json"), multiple=True)
+@ndjson_option
 @click.argument('DATERANGE', nargs=-1, required=False,
                 metavar='[DATETIME [DATETIME | RANGE]]')
 @click.pass_context
 def klist(ctx, include_calendar, exclude_calendar,
-          daterange, once, notstarted, json, format, day_format):
+          daterange, once, notstarted, json, ndjson, format, day_format):
     """List all events between a start (default: today) and (optional)
     end datetime."""
+    from . import controllers
+    if ndjson and not json:
+        json = ('all', )
     enabled_eventformatters = plugins.FORMATTERS
    # TODO: register user given format string as a plugin
     logger.debug(f'{enabled_eventformatters}')
     try:
-        event_column = controllers.khal_list(
+        event_column = controllers.khal_list_iter(
             build_collection(
                 ctx.obj['conf'],
                 multi_calendar_select(ctx, include_calendar, exclude_calendar)
@@ -191,11 +233,10 @@ def klist(ctx, include_calendar, exclude_calendar,
             notstarted=notstarted,
             conf=ctx.obj['conf'],
             env={"calendars": ctx.obj['conf']['calendars']},
-            json=json
+            json=json,
+            ndjson=ndjson,
         )
-        if event_column:
-            click.echo('\n'.join(event_column))
-        else:
+        if not echo_lines(event_column):
             logger.debug('No events found')
 
     except FatalError as error:
@@ -234,6 +275,7 @@ def new(ctx, calendar, info, location, categories, repeat, until, alarms, url, f
     assumed to be the event's summary, if two colons (::) are present,
     everything behind them is taken as the event's description.
     '''
+    from . import controllers
     if not info and not interactive:
         raise click.BadParameter(
             'no details provided, did you mean to use --interactive/-i?'
@@ -303,6 +345,7 @@ def import_ics(ctx, ics, include_calendar, batch, random_uid, format):
     each calendar's name or any unique prefix of a calendar's name.
 
     '''
+    from . import controllers
     if include_calendar:
         ctx.obj['calendar_selection'] = {include_calendar, }
     collection = build_collection(ctx.obj['conf'], ctx.obj.get('calendar_selection', None))
@@ -314,8 +357,12 @@ def import_ics(ctx, ics, include_calendar, batch, random_uid, format):
     rvalue = 0
     # Default to stdin:
     if not ics:
-        ics_strs = ((sys.stdin.read(), 'stdin'),)
-        if not batch:
+        if batch:
+            ics_inputs = ((sys.stdin, 'stdin'),)
+        else:
+            # stdin needs to be read completely so that we can ask questions
+            # on the tty afterwards
+            ics_inputs = ((sys.stdin.read(), 'stdin'),)
 
             def isatty(_file):
                 try:
@@ -328,14 +375,14 @@ def import_ics(ctx, ics, include_calendar, batch, random_uid, format):
             else:
                 logger.warning('/dev/tty does not exist, importing might not work')
     else:
-        ics_strs = ((ics_file.read(), ics_file.name) for ics_file in ics)
+        ics_inputs = ((ics_file, ics_file.name) for ics_file in ics)
 
-    for ics_str, filename in ics_strs:
+    for ics_input, filename in ics_inputs:
         try:
             controllers.import_ics(
                 collection,
                 ctx.obj['conf'],
-                ics=ics_str,
+                ics=ics_input,
                 batch=batch,
                 random_uid=random_uid,
                 env={"calendars": ctx.obj['conf']['calendars']},
@@ -355,6 +402,7 @@ def import_ics(ctx, ics, include_calendar, batch, random_uid, format):
 @click.pass_context
 def interactive(ctx, include_calendar, exclude_calendar, mouse):
     '''Interactive UI. Also launchable via `ikhal`.'''
+    from . import controllers
     if mouse is not None:
         ctx.obj['conf']['default']['enable_mouse'] = mouse
     controllers.interactive(
@@ -372,6 +420,7 @@ def interactive(ctx, include_calendar, exclude_calendar, mouse):
 @click.pass_context
 def interactive_cli(ctx, config, include_calendar, exclude_calendar, mouse):
     '''Interactive UI. Also launchable via `khal interactive`.'''
+    from . import controllers
     prepare_context(ctx, config)
     if mouse is not None:
         ctx.obj['conf']['default']['enable_mouse'] = mouse
@@ -427,6 +476,7 @@ def printics(ctx, ics, format):
     '''Print an ics file (or read from stdin) without importing it.
 
     Just print the ics file, do nothing else.'''
+    from . import controllers
     try:
         if ics:
             ics_str = ics.read()
@@ -445,42 +495,53 @@ def printics(ctx, ics, format):
 @click.option('--format', '-f',
               help=('The format of the events.'))
 @click.option('--json', help=("Fields to output in json"), multiple=True)
+@ndjson_option
 @click.argument('search_string')
 @click.pass_context
-def search(ctx, format, json, search_string, include_calendar, exclude_calendar):
+def search(ctx, format, json, ndjson, search_string, include_calendar, exclude_calendar):
     '''Search for events matching SEARCH_STRING.
 
-    For recurring events, only the master event and different overwritten
-    events are shown.
+    Summaries, descriptions, locations, attendees and categories are
+    searched. For recurring events, only the master event and different
+    overwritten events are shown. The best matches are shown first.
     '''
+    from .utils import CONTENT_ATTRIBUTES, format_fields, human_formatter, json_formatter
     # TODO support for time ranges, location, description etc
     if format is None:
         format = ctx.obj['conf']['view']['event_format']
+    if ndjson and not json:
+        json = ('all', )
     try:
         collection = build_collection(
             ctx.obj['conf'],
             multi_calendar_select(ctx, include_calendar, exclude_calendar)
         )
-        events = sorted(collection.search(search_string))
-        event_column = []
+        events = collection.search(search_string)
         term_width, _ = get_terminal_size()
         now = dt.datetime.now()
         env = {"calendars": ctx.obj['conf']['calendars']}
         if len(json) == 0:
             formatter = human_formatter(format)
+            fields = format_fields(format)
         else:
-            formatter = json_formatter(json)
-        for event in events:
-            desc = textwrap.wrap(formatter(
-                event.attributes(relative_to=now, env=env)), term_width)
-            event_column.extend(
-                [colored(d, event.color,
-                         bold_for_light_color=ctx.obj['conf']['view']['bold_for_light_color'])
-                 for d in desc]
-            )
-        if event_column:
-            click.echo('\n'.join(event_column))
-        else:
+            formatter = json_formatter(json, ndjson=ndjson)
+            fields = set(CONTENT_ATTRIBUTES if list(json) == ['all'] else json)
+
+        def format_events():
+            for event in events:
+                if ndjson:
+                    # neither wrapped nor colored, so each line stays valid JSON
+                    yield formatter(event.attributes(
+                        relative_to=now, env=env, colors=False, fields=fields))
+                    continue
+                desc = textwrap.wrap(formatter(
+                    event.attributes(relative_to=now, env=env, fields=fields)), term_width)
+                for d in desc:
+                    yield colored(
+                        d, event.color,
+                        bold_for_light_color=ctx.obj['conf']['view']['bold_for_light_color'])
+
+        if not echo_lines(format_events()):
             logger.debug('No events found')
     except FatalError as error:
         logger.debug(error, exc_info=True)
@@ -497,6 +558,7 @@ def search(ctx, format, json, search_string, include_calendar, exclude_calendar)
 @click.pass_context
 def edit(ctx, format, search_string, show_past, include_calendar, exclude_calendar):
     '''Interactively edit (or delete) events matching the search string.'''
+    from . import controllers
     try:
         controllers.edit(
             build_collection(
@@ -523,16 +585,21 @@ def edit(ctx, format, search_string, show_past, include_calendar, exclude_calend
 @click.option('--notstarted', help=('Print only events that have not started'),
               is_flag=True)
 @click.option('--json', help=("Fields to output in json"), multiple=True)
+@ndjson_option
 @click.argument('DATETIME', nargs=-1, required=False, metavar='[[START DATE] TIME | now]')
 @click.pass_context
-def at(ctx, datetime, notstarted, format, day_format, json, include_calendar, exclude_calendar):
+def at(ctx, datetime, notstarted, format, day_format, json, ndjson,
+       include_calendar, exclude_calendar):
     '''Print all events at a specific datetime (defaults to now).'''
+    from . import controllers
     if not datetime:
         datetime = ("now",)
+    if ndjson and not json:
+        json = ('all', )
     if format is None:
         format = ctx.obj['conf']['view']['event_format']
     try:
-        rows = controllers.khal_list(
+        rows = controllers.khal_list_iter(
             build_collection(
                 ctx.obj['conf'],
                 multi_calendar_select(ctx, include_calendar, exclude_calendar)
@@ -544,15 +611,36 @@ def at(ctx, datetime, notstarted, format, day_format, json, include_calendar, ex
             notstarted=notstarted,
             conf=ctx.obj['conf'],
             env={"calendars": ctx.obj['conf']['calendars']},
-            json=json
+            json=json,
+            ndjson=ndjson,
         )
-        if rows:
-            click.echo('\n'.join(rows))
+        echo_lines(rows)
     except FatalError as error:
         logger.debug(error, exc_info=True)
         logger.fatal(error)
         sys.exit(1)
 
+@cli.command('daemon')
+@click.pass_context
+def run_daemon(ctx):
+    '''Keep calendars loaded and answer list, at and search.
+
+    While the daemon is running, `khal list`, `khal at` and `khal search`
+    (with the same configuration file) are run by it, which saves them from
+    loading the configuration and checking all calendars for changes.
+    '''
+    setproctitle('khal daemon')
+    # exit (and remove the socket) cleanly when stopped by e.g. systemd
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        daemon.Daemon(ctx.parent.params.get('config')).serve(daemon.socket_path())
+    except FatalError as error:
+        logger.debug(error, exc_info=True)
+        logger.fatal(error)
+        sys.exit(1)
+    except KeyboardInterrupt:
+        pass
+
 @cli.command()
 @click.pass_context
 def configure(ctx):
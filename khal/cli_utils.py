@@ -145,7 +145,19 @@ def global_options(f):
 
 
 def build_collection(conf, selection):
-    """build and return a khalendar.CalendarCollection from the configuration"""
+    """build and return a khalendar.CalendarCollection from the configuration
+
+    In `khal daemon`, collections are kept (by selection) in the `collections`
+    of the click context's obj and only updated, if needed, when reused.
+    """
+    ctx = click.get_current_context(silent=True)
+    collections = ctx.obj.get('collections') if ctx is not None and ctx.obj else None
+    key = frozenset(selection) if selection is not None else None
+    if collections is not None and key in collections:
+        collection = collections[key]
+        if collection.needs_update():
+            collection.update_db()
+        return collection
     try:
         props = {}
         for name, cal in conf['calendars'].items():
@@ -164,6 +176,9 @@ def build_collection(conf, selection):
             color=conf['highlight_days']['color'],
             locale=conf['locale'],
             dbpath=conf['sqlite']['path'],
+            recurrence_window=conf['sqlite']['recurrence_window'],
+            workers=conf['sqlite']['workers'],
+            threads=conf['sqlite']['threads'],
             hmethod=conf['highlight_days']['method'],
             default_color=conf['highlight_days']['default_color'],
             multiple=conf['highlight_days']['multiple'],
@@ -176,6 +191,8 @@ def build_collection(conf, selection):
         sys.exit(1)
 
     collection._default_calendar_name = conf['default']['default_calendar']
+    if collections is not None:
+        collections[key] = collection
     return collection
 
 
@@ -192,7 +209,7 @@ def prepare_context(ctx, config):
 
     logger.debug('khal %s', __version__)
     try:
-        conf = get_config(config)
+        conf = get_config(config, use_cache=True)
     except NoConfigFile:
         conf = _NoConfig()
     except InvalidSettingsError:
@@ -21,11 +21,16 @@
 #
 
 import datetime as dt
+import io
 import logging
 import os
 import re
 import textwrap
+import time
 from collections import OrderedDict, defaultdict
+from collections.abc import Iterable, Iterator
+from itertools import chain
+from operator import attrgetter
 from shutil import get_terminal_size
 from typing import Callable, Optional
 
@@ -41,19 +46,22 @@ from khal.custom_types import (
 )
 from khal.exceptions import DateTimeParseError, FatalError
 from khal.khalendar import CalendarCollection
-from khal.khalendar.event import Event
+from khal.khalendar.event import VEVENT_ATTRIBUTES, Event
 from khal.khalendar.exceptions import DuplicateUid, ReadOnlyCalendarError
 
 from .exceptions import ConfigurationError
-from .icalendar import cal_from_ics, split_ics
+from .icalendar import cal_from_ics, iter_split_ics
 from .icalendar import sort_key as sort_vevent_key
 from .khalendar.vdir import Item
 from .parse_datetime import timedelta2str
 from .terminal import merge_columns
-from .utils import human_formatter, json_formatter
+from .utils import CONTENT_ATTRIBUTES, format_fields, human_formatter, json_formatter
 
 logger = logging.getLogger('khal')
 
+# `khal list` gets the events of at most this many days at once
+MAX_DAY_BATCH = 32
+
 
 def format_day(day: dt.date, format_string: str, locale, attributes=None):
     if attributes is None:
@@ -179,6 +187,7 @@ def get_events_between(
     original_start: dt.datetime,
     seen=None,
     colors: bool = True,
+    light: bool = False,
 ) -> list[str]:
     """returns a list of events scheduled between start and end. Start and end
     are strings or datetimes (of some kind).
@@ -194,11 +203,11 @@ def get_events_between(
     :param original_start: start datetime to compare against of notstarted is set
     :param seen:
     :param colors:
+    :param light: if `LightEvent`s are sufficient for `formatter`
     :returns: a list to be printed as the agenda for the given days
     """
     assert not (notstarted and not original_start)
 
-    event_list = []
     if env is None:
         env = {}
     assert start
@@ -209,9 +218,34 @@ def get_events_between(
     start = start_local.replace(tzinfo=None)
     end = end_local.replace(tzinfo=None)
 
-    events = sorted(collection.get_localized(start_local, end_local))
-    events_float = sorted(collection.get_floating(start, end))
-    events = sorted(events + events_float)
+    # both come ordered by start from the db, so sorting them is mostly merging
+    events = sorted(
+        chain(collection.get_localized(start_local, end_local, light=light),
+              collection.get_floating(start, end, light=light)),
+        key=attrgetter('sort_key'),
+    )
+    return _format_events(
+        events, start, end, formatter, notstarted, env, original_start, seen, colors)
+
+
+def _format_events(
+    events: Iterable[Event],
+    start: dt.datetime,
+    end: dt.datetime,
+    formatter: Callable,
+    notstarted: bool,
+    env: dict,
+    original_start: dt.datetime,
+    seen=None,
+    colors: bool = True,
+    fields: Optional[set[str]] = None,
+) -> list[str]:
+    """format the (sorted) `events` between the naive datetimes `start` and
+    `end`, see `get_events_between` for the other parameters
+
+    :param fields: the attributes `formatter` needs (by default all)
+    """
+    event_list = []
     for event in events:
         # yes the logic could be simplified, but I believe it's easier
         # to understand what's going on here this way
@@ -224,7 +258,8 @@ def get_events_between(
             continue
 
         try:
-            event_attributes = event.attributes(relative_to=(start, end), env=env, colors=colors)
+            event_attributes = event.attributes(
+                relative_to=(start, end), env=env, colors=colors, fields=fields)
         except KeyError as error:
             raise FatalError(error)
 
@@ -247,8 +282,38 @@ def khal_list(
     env=None,
     datepoint=None,
     json: Optional[list] = None,
-):
+    ndjson: bool = False,
+) -> list[str]:
     """returns a list of all events in `daterange`"""
+    return list(khal_list_iter(
+        collection, daterange=daterange, conf=conf, agenda_format=agenda_format,
+        day_format=day_format, once=once, notstarted=notstarted, width=width, env=env,
+        datepoint=datepoint, json=json, ndjson=ndjson,
+    ))
+
+
+def khal_list_iter(
+    collection,
+    daterange: Optional[list[str]] = None,
+    conf: Optional[dict] = None,
+    agenda_format=None,
+    day_format: Optional[str]=None,
+    once=False,
+    notstarted: bool = False,
+    width: Optional[int] = None,
+    env=None,
+    datepoint=None,
+    json: Optional[list] = None,
+    ndjson: bool = False,
+) -> Iterator[str]:
+    """like `khal_list`, but yields the lines as soon as they are formatted
+
+    The events are fetched a few days at a time, so the first lines can be
+    printed right away and memory use does not grow with the range.
+
+    :param ndjson: with `json`, yield one line per event instead of a JSON
+        array per day
+    """
     assert daterange is not None or datepoint is not None
     assert conf is not None
 
@@ -257,11 +322,15 @@ def khal_list(
         agenda_format = conf['view']['agenda_event_format']
 
     if json:
-        formatter = json_formatter(json)
+        formatter = json_formatter(json, ndjson=ndjson)
         colors = False
+        fields = set(CONTENT_ATTRIBUTES if list(json) == ['all'] else json)
     else:
         formatter = human_formatter(agenda_format, width)
         colors = True
+        fields = format_fields(agenda_format)
+    # only parse the events if we need any of their attributes not stored in the db
+    light = not fields & VEVENT_ATTRIBUTES
 
     if daterange is not None:
         if day_format is None:
@@ -295,32 +364,54 @@ def khal_list(
             )
         logger.debug(f'Getting all events between {start} and {end}')
 
-    event_column: list[str] = []
     once = set() if once else None
     if env is None:
         env = {}
 
     original_start = conf['locale']['local_timezone'].localize(start)
+    empty = True
+    for days in _day_batches(start, end):
+        # get the events of several days at once instead of querying the db
+        # for every day
+        events_by_day = collection.get_events_in_ranges(days, light=light)
+        for (start, day_end), events in zip(days, events_by_day):
+            events.sort(key=attrgetter('sort_key'))
+            current_events = _format_events(
+                events, start, day_end, formatter=formatter, notstarted=notstarted,
+                env=env, original_start=original_start, seen=once, colors=colors,
+                fields=fields,
+            )
+            if day_format and (conf['default']['show_all_days'] or current_events) and not json:
+                if not empty and conf['view']['blank_line_before_day']:
+                    yield ''
+                yield format_day(start.date(), day_format, conf['locale'])
+                empty = False
+            for line in current_events:
+                yield line
+                empty = False
+
+
+def _day_batches(start: dt.datetime, end: dt.datetime) \
+        -> Iterator[list[tuple[dt.datetime, dt.datetime]]]:
+    """split the naive datetimes `start` to `end` into days (the first and the
+    last one possibly shorter), returned in batches of growing size, so the
+    first days are available soon
+    """
+    size = 1
+    days = []
     while start < end:
         if start.date() == end.date():
             day_end = end
         else:
             day_end = dt.datetime.combine(start.date(), dt.time.max)
-        current_events = get_events_between(
-            collection, locale=conf['locale'], formatter=formatter, start=start,
-            end=day_end, notstarted=notstarted, original_start=original_start,
-            env=env,
-            seen=once,
-            colors=colors,
-        )
-        if day_format and (conf['default']['show_all_days'] or current_events) and not json:
-            if len(event_column) != 0 and conf['view']['blank_line_before_day']:
-                event_column.append('')
-            event_column.append(format_day(start.date(), day_format, conf['locale']))
-        event_column.extend(current_events)
+        days.append((start, day_end))
         start = dt.datetime(*start.date().timetuple()[:3]) + dt.timedelta(days=1)
-
-    return event_column
+        if len(days) == size:
+            yield days
+            days = []
+            size = min(2 * size, MAX_DAY_BATCH)
+    if days:
+        yield days
 
 
 def new_interactive(collection, calendar_name, conf, info, location=None,
@@ -611,9 +702,11 @@ def edit(collection, search_string, locale, format=None, allow_past=False, conf=
     term_width, _ = get_terminal_size()
     now = conf['locale']['local_timezone'].localize(dt.datetime.now())
 
-    events = sorted(collection.search(search_string))
+    events = sorted(collection.search(search_string), key=attrgetter('sort_key'))
     for event in events:
-        if not allow_past:
+        # recurring events are found as their first instance, later ones
+        # might still be in the future
+        if not allow_past and not event.recurring:
             if event.allday and event.end < now.date():
                 continue
             elif not event.allday and event.end_local < now:
@@ -640,6 +733,8 @@ def interactive(collection, conf):
 def import_ics(collection, conf, ics, batch=False, random_uid=False, format=None,
                env=None):
     """
+    :param ics: icalendar data, either as a string or as a (text or binary)
+                file, which is read incrementally
     :param batch: setting this to True will insert without asking for approval,
                   even when an event with the same uid already exists
     :type batch: bool
@@ -650,20 +745,69 @@ def import_ics(collection, conf, ics, batch=False, random_uid=False, format=None
     """
     if format is None:
         format = conf['view']['event_format']
-    try:
-        vevents = split_ics(ics, random_uid, conf['locale']['default_timezone'])
-    except Exception as error:
-        raise FatalError(error)
-    for vevent in vevents:
-        import_event(vevent, collection, conf['locale'], batch, format, env)
+    if isinstance(ics, str):
+        ics = io.StringIO(ics)
+    vevents = _split_ics_for_import(ics, random_uid, conf['locale']['default_timezone'])
+    if batch:
+        import_batch(vevents, collection)
+        return
+    for uid, vevent in vevents:
+        import_event(vevent, collection, conf['locale'], batch, format, env, uid=uid)
+
+
+def _split_ics_for_import(ics, random_uid, default_timezone) -> Iterator[tuple[str, str]]:
+    """like `iter_split_ics`, but raise all errors as FatalError"""
+    vevents = iter_split_ics(ics, random_uid, default_timezone)
+    while True:
+        try:
+            uid, vevent = next(vevents)
+        except StopIteration:
+            return
+        except Exception as error:
+            raise FatalError(error)
+        yield uid, vevent
+
+
+def import_batch(vevents, collection):
+    """import events into the default (or only writable) calendar without
+    asking, updating existing events with the same UID
+
+    All events are inserted with `CalendarCollection.insert_many`, progress
+    and throughput are logged at the info level.
+
+    :param vevents: (uid, ics) pairs, as returned by `iter_split_ics`
+    :type vevents: iterable(tuple(str, str))
+    """
+    if not collection.writable_names:
+        raise ConfigurationError('No writable calendars found, aborting import.')
+    if len(collection.writable_names) == 1:
+        calendar_name = collection.writable_names[0]
+    else:
+        calendar_name = collection.default_calendar_name
+    start = time.monotonic()
+
+    def log_progress(count):
+        rate = count / max(time.monotonic() - start, 1e-6)
+        logger.info(f'Imported {count} events into `{calendar_name}` ({rate:.0f} events/s)')
+
+    count = collection.insert_many(
+        (Item(vevent, uid=uid) for uid, vevent in vevents),
+        calendar_name,
+        overwrite=True,
+        progress=log_progress,
+    )
+    logger.info(
+        f'Imported {count} events into `{calendar_name}` in {time.monotonic() - start:.1f}s')
 
 
-def import_event(vevent, collection, locale, batch, format=None, env=None):
+def import_event(vevent, collection, locale, batch, format=None, env=None, uid=None):
     """import one event into collection, let user choose the collection
 
     :type vevent: list of vevents, which can be more than one VEVENT, i.e., the
         same UID, i.e., one "master" event and (optionally) 1+ RECURRENCE-ID events
     :type vevent: list(str)
+    :param uid: the UID of the events in `vevent`, if it is already known
+    :type uid: str
     """
     # print all sub-events
     if not batch:
@@ -703,11 +847,11 @@ def import_event(vevent, collection, locale, batch, format=None, env=None):
 
     if batch or confirm(f"Do you want to import this event into `{calendar_name}`?"):
         try:
-            collection.insert(Item(vevent), collection=calendar_name)
+            collection.insert(Item(vevent, uid=uid), collection=calendar_name)
         except DuplicateUid:
             if batch or confirm(
                     "An event with the same UID already exists. Do you want to update it?"):
-                collection.force_update(Item(vevent), collection=calendar_name)
+                collection.force_update(Item(vevent, uid=uid), collection=calendar_name)
             else:
                 logger.warning(f"Not importing event with UID `{event.uid}`")
 
@@ -0,0 +1,279 @@
+# Copyright (c) 2013-2022 khal contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""A khal process keeping the configuration and the calendars loaded
+
+`khal daemon` listens on a unix socket. `khal list`, `khal at` and `khal
+search` send their arguments there and print what the daemon's run of the
+same command writes, so they need neither to read the configuration nor to
+check the vdirs for changes themselves. Without a daemon (or with one for
+another configuration file) they run as always.
+
+Each request is one JSON object on one line, the daemon answers with one JSON
+object per line: {"out": text} and {"err": text} for the command's output and
+finally {"exit": code}, with a code of null if the daemon cannot run the
+command.
+"""
+
+import contextlib
+import io
+import json
+import logging
+import os
+import shutil
+import socket
+import stat
+import sys
+import tempfile
+from typing import Optional
+
+from .exceptions import FatalError
+
+logger = logging.getLogger('khal')
+
+PROTOCOL_VERSION = 1
+
+# the commands `khal` runs in the daemon if there is one
+COMMANDS = frozenset(['list', 'at', 'search'])
+
+
+def socket_path() -> str:
+    """the path of the daemon's socket, $KHAL_DAEMON_SOCKET if set"""
+    if os.environ.get('KHAL_DAEMON_SOCKET'):
+        return os.environ['KHAL_DAEMON_SOCKET']
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir:
+        return os.path.join(runtime_dir, 'khal', 'daemon.sock')
+    return os.path.join(tempfile.gettempdir(), f'khal-{os.getuid()}', 'daemon.sock')
+
+
+def _check_private(path: str) -> None:
+    """make sure no other user can have placed or can access the socket at
+    `path`
+
+    The directory of the default socket (in /tmp if $XDG_RUNTIME_DIR is not
+    set) must be owned by and only accessible to the current user, the socket
+    itself must be owned by them, if it exists.
+
+    :raises FatalError: otherwise
+    """
+    if not os.environ.get('KHAL_DAEMON_SOCKET'):
+        directory = os.path.dirname(path)
+        dir_stat = os.lstat(directory)
+        if not stat.S_ISDIR(dir_stat.st_mode) or dir_stat.st_uid != os.getuid() or \
+                stat.S_IMODE(dir_stat.st_mode) & 0o077:
+            raise FatalError(
+                f'{directory} must be a directory owned by and only accessible to you')
+    try:
+        sock_stat = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(sock_stat.st_mode) or sock_stat.st_uid != os.getuid():
+        raise FatalError(f'{path} must be a socket owned by you')
+
+
+def _config_key(config: Optional[str]) -> Optional[str]:
+    return os.path.abspath(config) if config else None
+
+
+def forward(args: list[str], config: Optional[str], color: bool, level: str) -> Optional[int]:
+    """run the khal command `args` in the daemon, if one is running
+
+    The command's output is written to stdout and stderr.
+
+    :param args: the command's name and arguments
+    :param config: the path of the configuration file given with --config
+    :param color: whether the output should be colored
+    :param level: the name of the log level
+    :returns: the command's exit code, or None if no daemon ran the command
+    """
+    path = socket_path()
+    if not os.path.exists(path):
+        return None
+    try:
+        _check_private(path)
+    except (FatalError, OSError) as error:
+        logger.warning(f'Not using the khal daemon: {error}')
+        return None
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        return None
+    columns, lines = shutil.get_terminal_size()
+    request = {
+        'version': PROTOCOL_VERSION,
+        'config': _config_key(config),
+        'args': args,
+        'color': color,
+        'level': level,
+        'columns': columns,
+        'lines': lines,
+    }
+    answered = False
+    with sock, sock.makefile('rwb') as stream:
+        try:
+            stream.write(json.dumps(request).encode('utf-8') + b'\n')
+            stream.flush()
+            for line in stream:
+                message = json.loads(line)
+                if 'exit' in message:
+                    return message['exit']
+                out = sys.stdout if 'out' in message else sys.stderr
+                out.write(message.get('out', message.get('err')))
+                out.flush()
+                answered = True
+        except (OSError, ValueError) as error:
+            logger.debug(f'lost the connection to the khal daemon: {error}')
+    if answered:
+        logger.fatal('The khal daemon stopped while running the command')
+        return 1
+    return None
+
+
+class _MessageWriter(io.TextIOBase):
+    """a text stream sending everything written to it as `key` messages"""
+
+    def __init__(self, stream: io.BufferedIOBase, key: str) -> None:
+        self._stream = stream
+        self._key = key
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, text: str) -> int:
+        self._stream.write(json.dumps({self._key: text}).encode('utf-8') + b'\n')
+        self._stream.flush()
+        return len(text)
+
+
+class Daemon:
+    """runs khal commands with a loaded configuration and warm calendar
+    collections
+
+    :param config: the path of the configuration file, as given with --config
+    """
+
+    def __init__(self, config: Optional[str]) -> None:
+        self.config = _config_key(config)
+        self._load()
+
+    def _config_mtime(self) -> Optional[float]:
+        from .settings import find_configuration_file
+        path = self.config or find_configuration_file()
+        try:
+            return os.stat(path).st_mtime if path else None
+        except OSError:
+            return None
+
+    def _load(self) -> None:
+        from .cli_utils import build_collection
+        from .settings import get_config
+        self._mtime = self._config_mtime()
+        conf = get_config(self.config)
+        # the obj of the root click context, the CalendarCollections built
+        # for the commands are kept in `collections`
+        self.obj = {'conf': conf, 'collections': {}}
+        self.obj['collections'][None] = build_collection(conf, None)
+
+    def handle(self, request: dict, stream: io.BufferedIOBase) -> Optional[int]:
+        """run the command of `request`, sending its output to `stream`
+
+        :returns: the command's exit code, or None if it cannot be run here
+        """
+        if request.get('version') != PROTOCOL_VERSION or \
+                request.get('config') != self.config or \
+                not request.get('args') or request['args'][0] not in COMMANDS:
+            return None
+        logger.info(f'running khal {" ".join(request["args"])}')
+        if self._config_mtime() != self._mtime:
+            logger.info('configuration file changed, reloading it')
+            self._load()
+
+        from .cli import cli
+        args = ['--color' if request['color'] else '--no-color',
+                '--verbosity', request['level'], *request['args']]
+        environ = {key: os.environ.get(key) for key in ['COLUMNS', 'LINES']}
+        os.environ['COLUMNS'] = str(request['columns'])
+        os.environ['LINES'] = str(request['lines'])
+        level = logger.level
+        try:
+            with contextlib.redirect_stdout(_MessageWriter(stream, 'out')), \
+                    contextlib.redirect_stderr(_MessageWriter(stream, 'err')):
+                try:
+                    cli.main(args, prog_name='khal', obj=self.obj)
+                except SystemExit as error:
+                    if error.code is None or isinstance(error.code, int):
+                        return error.code or 0
+                    return 1
+                except Exception as error:
+                    logger.debug(error, exc_info=True)
+                    logger.fatal(error)
+                    return 1
+                return 0
+        finally:
+            logger.setLevel(level)
+            for key, value in environ.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+
+    def serve(self, path: str) -> None:
+        """answer requests on the unix socket at `path` until interrupted"""
+        import socketserver
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        # the directory might have existed already, e.g. created by another
+        # user in /tmp
+        _check_private(path)
+        if os.path.exists(path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            with probe:
+                try:
+                    probe.connect(path)
+                except OSError:
+                    os.unlink(path)
+                else:
+                    raise FatalError(f'Another khal daemon is listening on {path}')
+
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                try:
+                    request = json.loads(self.rfile.readline())
+                    code = daemon.handle(request, self.wfile)
+                    self.wfile.write(json.dumps({'exit': code}).encode('utf-8') + b'\n')
+                except (OSError, ValueError) as error:
+                    logger.debug(f'failed to answer a request: {error}')
+
+        umask = os.umask(0o077)
+        try:
+            server = socketserver.UnixStreamServer(path, Handler)
+        finally:
+            os.umask(umask)
+        logger.info(f'khal daemon listening on {path}')
+        try:
+            with server:
+                server.serve_forever()
+        finally:
+            os.unlink(path)
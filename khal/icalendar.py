@@ -22,10 +22,14 @@
 """collection of icalendar helper functions"""
 
 import datetime as dt
+import io
 import logging
-from collections import defaultdict
+import re
+import tempfile
+from collections import Counter, defaultdict
+from collections.abc import Iterable, Iterator
 from hashlib import sha256
-from typing import Optional, Union
+from typing import IO, Optional, Union
 
 import dateutil.rrule
 import icalendar
@@ -37,6 +41,16 @@ from .utils import generate_random_uid, localize_strip_tz, str2alarm, to_unix_ti
 
 logger = logging.getLogger('khal')
 
+# the fast path of cal_from_ics builds on icalendar's parser internals, which
+# moved around between icalendar versions, without them it is just skipped
+try:
+    from icalendar.cal import component_factory, types_factory
+    from icalendar.parser import NEWLINE, Contentline, uFOLD
+    from icalendar.parser_tools import to_unicode
+    from icalendar.timezone import tzp
+except ImportError:
+    component_factory = None
+
 # Force use of pytz because we rely on functionalities not available in
 # zoneinfo.
 icalendar.use_pytz()
@@ -49,45 +63,170 @@ def split_ics(ics: str, random_uid: bool=False, default_timezone=None) -> list:
     ignores all other ics components
     :param random_uid: assign random uids to all events
     """
-    cal = cal_from_ics(ics)
-    tzs = {}
+    return [ics for _, ics in split_ics_by_uid(ics, random_uid, default_timezone)]
 
-    events_grouped = defaultdict(list)
-    for item in cal.walk():
 
+def split_ics_by_uid(
+    ics: str, random_uid: bool=False, default_timezone=None
+) -> list[tuple[str, str]]:
+    """like split_ics, but return each ics string together with its UID"""
+    ics_file = io.StringIO(ics)
+    tzs, counts = _scan_ics(ics_file)
+    ics_file.seek(0)
+    groups = sorted(_group_vevents(ics_file, counts), key=lambda events: events[0]['UID'])
+    return list(_ics_from_groups(groups, tzs, random_uid, default_timezone))
+
+
+def iter_split_ics(
+    ics_file: IO, random_uid: bool=False, default_timezone=None
+) -> Iterator[tuple[str, str]]:
+    """like split_ics_by_uid, but read from a file and yield as early as possible
+
+    `ics_file` is read twice, once for the VTIMEZONEs and once for the
+    VEVENTs, but only one component at a time. A UID's ics string is yielded
+    as soon as all its VEVENTs have been read, in the order of the file.
+    Files that cannot be seeked (e.g. stdin) are first copied to a temporary
+    file.
+
+    :param ics_file: a text or binary file containing icalendar data
+    """
+    spool = None
+    if not ics_file.seekable():
+        ics_file = spool = _spool(ics_file)
+    try:
+        start = ics_file.tell()
+        tzs, counts = _scan_ics(ics_file)
+        ics_file.seek(start)
+        yield from _ics_from_groups(
+            _group_vevents(ics_file, counts), tzs, random_uid, default_timezone)
+    finally:
+        if spool is not None:
+            spool.close()
+
+
+def _spool(ics_file: IO) -> IO:
+    """copy `ics_file` to a temporary binary file"""
+    spool = tempfile.TemporaryFile()
+    while True:
+        chunk = ics_file.read(2 ** 16)
+        if not chunk:
+            break
+        spool.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+    spool.seek(0)
+    return spool
+
+
+def unfolded_lines(lines: Iterable[Union[str, bytes]]) -> Iterator[str]:
+    """lazily yield the unfolded content lines of the physical `lines` of an
+    ics file (e.g. the file itself)"""
+    line = None
+    for physical in lines:
+        if isinstance(physical, bytes):
+            physical = physical.decode('utf-8-sig')
+        physical = physical.rstrip('\r\n')
+        if line is not None and physical[:1] in (' ', '\t'):
+            line += physical[1:]
+            continue
+        if line is not None:
+            yield line
+        line = physical
+    if line is not None:
+        yield line
+
+
+def _iter_components(ics_file: IO) -> Iterator[tuple[str, Optional[str], str]]:
+    """yield the name, UID and text of each top level component in `ics_file`
+
+    top level components are those directly inside a VCALENDAR or, if there is
+    none, the outermost ones
+    """
+    names: list[str] = []
+    lines: list[str] = []
+    uid = None
+    for line in unfolded_lines(ics_file):
+        name, _, value = line.partition(':')
+        name = name.upper()
+        if name == 'BEGIN':
+            names.append(value.strip().upper())
+        depth = 1 if names and names[0] == 'VCALENDAR' else 0
+        if len(names) <= depth:
+            continue
+        lines.append(line)
+        if name == 'END':
+            if len(names) == depth + 1:
+                yield names[depth], uid, '\r\n'.join(lines)
+                lines, uid = [], None
+            names.pop()
+        elif len(names) == depth + 1 and name.split(';')[0] == 'UID':
+            uid = value.strip()
+    if lines:
+        raise ValueError('Component without END encountered in ics file')
+
+
+def _component_from_ics(text: str) -> icalendar.cal.Component:
+    """parse the text of a single component"""
+    return cal_from_ics(f'BEGIN:VCALENDAR\r\n{text}\r\nEND:VCALENDAR\r\n').subcomponents[0]
+
+
+def _scan_ics(ics_file: IO) -> tuple[dict, Counter]:
+    """parse the VTIMEZONEs in `ics_file` and count the VEVENTs per UID"""
+    tzs = {}
+    counts: Counter = Counter()
+    for name, uid, text in _iter_components(ics_file):
         # Since some events could have a Windows format timezone (e.g. 'New Zealand
         # Standard Time' for 'Pacific/Auckland' in Olson format), we convert any
         # Windows format timezones to Olson.
-        if item.name == 'VTIMEZONE':
+        if name == 'VTIMEZONE':
+            item = _component_from_ics(text)
             if item['TZID'] in icalendar.timezone.windows_to_olson.WINDOWS_TO_OLSON:
                 key = icalendar.timezone.windows_to_olson.WINDOWS_TO_OLSON[item['TZID']]
             else:
                 key = item['TZID']
             tzs[key] = item
+        elif name == 'VEVENT' and uid:
+            counts[uid] += 1
+    return tzs, counts
 
-        if item.name == 'VEVENT':
-            if 'UID' not in item:
-                logger.warning(
-                    f"Event with summary '{item['SUMMARY']}' doesn't have a unique ID."
-                    "A generated ID will be used instead."
-                )
-                item['UID'] = sha256(item.to_ical()).hexdigest()
-            events_grouped[item['UID']].append(item)
-        else:
+
+def _group_vevents(ics_file: IO, counts: Counter) -> Iterator[list[icalendar.Event]]:
+    """yield the VEVENTs in `ics_file` grouped by UID
+
+    :param counts: the number of VEVENTs per UID, a group is yielded as soon as
+        it is complete
+    """
+    pending = defaultdict(list)
+    for name, uid, text in _iter_components(ics_file):
+        if name != 'VEVENT':
             continue
-    out = []
+        item = _component_from_ics(text)
+        if not uid:
+            logger.warning(
+                f"Event with summary '{item['SUMMARY']}' doesn't have a unique ID."
+                "A generated ID will be used instead."
+            )
+            item['UID'] = sha256(item.to_ical()).hexdigest()
+            yield [item]
+            continue
+        pending[uid].append(item)
+        if len(pending[uid]) >= counts[uid]:
+            yield pending.pop(uid)
+
+
+def _ics_from_groups(
+    groups: Iterable[list[icalendar.Event]], tzs, random_uid: bool, default_timezone,
+) -> Iterator[tuple[str, str]]:
     saved_exception = None
-    for uid, events in sorted(events_grouped.items()):
+    for events in groups:
+        uid = events[0]['UID']
         try:
             ics = ics_from_list(events, tzs, random_uid, default_timezone)
         except Exception as exception:
             logger.warn(f'Error when trying to import the event {uid}')
             saved_exception = exception
         else:
-            out.append(ics)
+            yield str(events[0]['UID']), ics
     if saved_exception:
         raise saved_exception
-    return out
 
 
 def new_vevent(locale,
@@ -217,6 +356,7 @@ def ics_from_list(
 def expand(
     vevent: icalendar.Event,
     href: str='',
+    window: Optional[tuple[dt.datetime, dt.datetime]]=None,
 ) -> Optional[list[tuple[dt.datetime, dt.datetime]]]:
     """
     Constructs a list of start and end dates for all recurring instances of the
@@ -231,6 +371,8 @@ def expand(
     :param vevent: vevent to be expanded
     :param href: the href of the vevent, used for more informative logging and
                  nothing else
+    :param window: if given, only instances of the RRULE starting between those
+                   two naive datetimes (and the first instance) are returned
     :returns: list of start and end (date)times of the expanded event
     """
     # we do this now and than never care about the "real" end time again
@@ -301,19 +443,24 @@ def expand(
                     'This event will not be available in khal.')
                 return None
 
-        if rrule.count() == 0:
+        first = next(iter(rrule), None)
+        if first is None:
             logger.warning(
                 f'{href}: Recurrence defined but will never occur.\n'
                 'This event will not be available in khal.')
             return None
 
-        rrule = map(sanitize_datetime, rrule)  # type: ignore
-
-        logger.debug(f'calculating recurrence dates for {href}, this might take some time.')
+        if window is not None:
+            # we always include the first instance, so that even events which
+            # have no instances in the window can be found
+            starts = [first] + rrule.between(*window, inc=True)
+        else:
+            logger.debug(f'calculating recurrence dates for {href}, this might take some time.')
+            starts = rrule  # type: ignore
 
         # RRULE and RDATE may specify the same date twice, it is recommended by
         # the RFC to consider this as only one instance
-        dtstartl = set(rrule)
+        dtstartl: set[dt.datetime] = set(map(sanitize_datetime, starts))  # type: ignore
         if not dtstartl:
             raise UnsupportedRecurrence()
     else:
@@ -341,6 +488,9 @@ def expand(
             try:
                 dtstartl.remove(date)
             except KeyError:
+                if window is not None and not _in_window(date, window):
+                    # that instance was not expanded in the first place
+                    continue
                 logger.warning(
                     f'In event {href}, excluded instance starting at {date} '
                     'not found, event might be invalid.')
@@ -351,6 +501,15 @@ def expand(
     return dtstartend
 
 
+def _in_window(date: dt.date, window: tuple[dt.datetime, dt.datetime]) -> bool:
+    """check if `date` (naive, localized or a date) falls into `window`"""
+    if isinstance(date, dt.datetime):
+        date = date.replace(tzinfo=None)
+    else:
+        date = dt.datetime.combine(date, dt.time.min)
+    return window[0] <= date <= window[1]
+
+
 def assert_only_one_uid(cal: icalendar.Calendar):
     """assert that all VEVENTs in cal have the same UID"""
     uids = set()
@@ -529,10 +688,89 @@ def sort_key(vevent: icalendar.Event) -> tuple[str, float]:
         return uid, 1
 
 
+# a content line without quoted, escaped, rfc6868 encoded or multiple parameter
+# values and without escaped values, the parts of those can be split off with
+# a regex instead of icalendar's parser
+SIMPLE_CONTENT_LINE = re.compile(
+    r'([\w.-]+)((?:;[\w.-]+=[^\x00-\x1f\x7f",:;\\%^]*)*):([^\\%]*)')
+
+# properties whose values are parsed with their TZID parameter
+DATETIME_PROPERTIES = frozenset(
+    ['DTSTART', 'DTEND', 'RECURRENCE-ID', 'DUE', 'RDATE', 'EXDATE'])
+
+
+def _cal_from_simple_ics(ics: str) -> Optional[icalendar.cal.Component]:
+    """parse `ics` like `icalendar.Calendar.from_ical` does, but faster
+
+    Content lines in the simple (and common) subset are split with
+    SIMPLE_CONTENT_LINE, all others with icalendar's parser.
+
+    :returns: None if `ics` is anything unusual (invalid, several calendars,
+        VTIMEZONEs after other components, FREEBUSY...), it should then be
+        parsed with icalendar
+    """
+    if component_factory is None:
+        return None
+    stack: list[icalendar.cal.Component] = []
+    calendars = []
+    for line in NEWLINE.split(uFOLD.sub('', to_unicode(ics))):
+        if not line:
+            continue
+        match = SIMPLE_CONTENT_LINE.fullmatch(line)
+        if match is None:
+            try:
+                name, params, value = Contentline(line).parts()
+            except ValueError:
+                return None
+        else:
+            name, params_string, value = match.groups()
+            params = icalendar.Parameters(
+                param.split('=', 1) for param in params_string[1:].split(';') if param)
+        uname = name.upper()
+        if uname == 'BEGIN':
+            component_name = value.upper()
+            component = component_factory.get(component_name, icalendar.cal.Component)()
+            if not getattr(component, 'name', ''):
+                component.name = component_name
+            stack.append(component)
+        elif uname == 'END':
+            if not stack:
+                return None
+            component = stack.pop()
+            if stack:
+                if component.name == 'VTIMEZONE':
+                    if any(sub.name != 'VTIMEZONE' for sub in stack[-1].subcomponents):
+                        return None
+                stack[-1].add_component(component)
+            else:
+                calendars.append(component)
+            if value == 'VTIMEZONE' and 'TZID' in component:
+                tzp.cache_timezone_component(component)
+        elif not stack or uname == 'FREEBUSY':
+            return None
+        else:
+            factory = types_factory.for_property(name)
+            try:
+                if name in DATETIME_PROPERTIES and 'TZID' in params:
+                    prop = factory(factory.from_ical(value, params['TZID']))
+                else:
+                    prop = factory(factory.from_ical(value))
+            except ValueError:
+                return None
+            prop.params = params
+            stack[-1].add(name, prop, encode=0)
+    if stack or len(calendars) != 1:
+        return None
+    return calendars[0]
+
+
 def cal_from_ics(ics: str) -> icalendar.Calendar:
     """
     :param ics: an icalendar formatted string
     """
+    cal = _cal_from_simple_ics(ics)
+    if cal is not None:
+        return cal
     try:
         cal = icalendar.Calendar.from_ical(ics)
     except ValueError as error:
@@ -19,4 +19,16 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-from .khalendar import CalendarCollection as CalendarCollection
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .khalendar import CalendarCollection as CalendarCollection
+
+
+def __getattr__(name: str):
+    # importing CalendarCollection pulls in icalendar, dateutil and the
+    # backend, which is not needed when only using e.g. khal.khalendar.vdir
+    if name == 'CalendarCollection':
+        from .khalendar import CalendarCollection
+        return CalendarCollection
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
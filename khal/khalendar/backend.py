@@ -29,7 +29,7 @@ import sqlite3
 from collections.abc import Iterable, Iterator
 from enum import IntEnum
 from os import makedirs, path
-from typing import Any, Optional, Union
+from typing import Any, Callable, Optional, Union
 
 import icalendar
 import icalendar.cal
@@ -43,11 +43,20 @@ from khal.icalendar import expand as expand_vevent
 from khal.icalendar import sanitize as sanitize_vevent
 from khal.icalendar import sort_key as sort_vevent_key
 
+from .event import Event
 from .exceptions import CouldNotCreateDbDir, NonUniqueUID, OutdatedDbVersionError, UpdateFailed
 
 logger = logging.getLogger('khal')
 
-DB_VERSION = 5  # The current db layout version
+DB_VERSION = 9  # The current db layout version
+
+# all tables in the db, everything in them can be recreated from the vdirs
+DB_TABLES = ['calendars', 'events', 'recs_loc', 'recs_float', 'vevents', 'search_fts']
+
+# instances in the recs_* tables are put into buckets by the bit length of
+# their duration in seconds, an instance in bucket `n` lasts less than 2**n
+# seconds. 2**40 seconds are more than datetime's year 1 to year 9999.
+MAX_SPAN = 40
 
 RECURRENCE_ID = 'RECURRENCE-ID'
 THISANDFUTURE = 'THISANDFUTURE'
@@ -55,6 +64,19 @@ THISANDPRIOR = 'THISANDPRIOR'
 
 PROTO = 'PROTO'
 
+# the properties `SQLiteDb.search` looks at
+SEARCH_PROPERTIES = ['SUMMARY', 'DESCRIPTION', 'LOCATION', 'ATTENDEE', 'CATEGORIES']
+
+# the columns of the vevents table `LightEvent`s are created from
+VEVENT_FIELDS = ['uid', 'summary', 'description', 'location', 'status', 'recurring', 'alarms']
+
+# the trigram tokenizer cannot find shorter search strings
+MIN_FTS_LENGTH = 3
+
+# the recs table to insert into, rows to insert and (only for THISANDFUTURE
+# overrides) the parameters for updating all following instances
+Instances = tuple[str, list[tuple], Optional[tuple]]
+
 
 class EventType(IntEnum):
     DATE = 0
@@ -72,24 +94,32 @@ class SQLiteDb:
         combination should be unique.
     :param db_path: path where this sqlite database will be saved, if this is
         None, a place according to the XDG specifications will be chosen
+    :param recurrence_window: if set, recurring events are only expanded in a
+        window of this size around now, the window is extended (per calendar)
+        whenever events outside of it are requested
     """
 
     def __init__(self,
                  calendars: Iterable[str],
                  db_path: Optional[str],
                  locale: LocaleConfiguration,
+                 recurrence_window: Optional[dt.timedelta]=None,
                  ) -> None:
         assert db_path is not None
         self.calendars: list[str] = list(calendars)
         self.db_path = path.expanduser(db_path)
         self._create_dbdir()
         self.locale = locale
+        self.recurrence_window = recurrence_window or None
         self._at_once: bool = False
+        self._fts: bool = False
         self.conn = sqlite3.connect(self.db_path)
         self.cursor = self.conn.cursor()
+        self._check_table_version()
         self._create_default_tables()
         self._check_calendars_exists()
-        self._check_table_version()
+        self._windows: dict[str, Optional[tuple[float, float]]] = {}
+        self._check_windows()
 
     @contextlib.contextmanager
     def at_once(self) -> Iterator['SQLiteDb']:
@@ -120,31 +150,47 @@ class SQLiteDb:
 
     def _check_table_version(self) -> None:
         """tests for current db Version
-        if the table is still empty, insert db_version
+        if the table is still empty, insert db_version, if the db was created
+        by an older version of khal, drop all tables so they get recreated
+        (and refilled from the vdirs) with the current layout
         """
+        self.cursor.execute('CREATE TABLE IF NOT EXISTS '
+                            'version (version INTEGER)')
         self.cursor.execute('SELECT version FROM version')
         result = self.cursor.fetchone()
         if result is None:
             self.cursor.execute('INSERT INTO version (version) VALUES (?)',
                                 (DB_VERSION, ))
             self.conn.commit()
-        elif not result[0] == DB_VERSION:
+        elif result[0] < DB_VERSION:
+            logger.info(
+                f'{self.db_path} was created by an older version of khal, '
+                'rebuilding it')
+            for table in DB_TABLES:
+                try:
+                    self.cursor.execute(f'DROP TABLE IF EXISTS {table}')
+                except sqlite3.OperationalError as error:
+                    # the full text index cannot be dropped by an sqlite
+                    # without FTS5, it is rebuilt once it can be used again
+                    logger.debug(f'Cannot drop {table}: {error}')
+            self.cursor.execute('UPDATE version SET version = ?', (DB_VERSION, ))
+            self.conn.commit()
+        elif result[0] > DB_VERSION:
             raise OutdatedDbVersionError(
                 str(self.db_path) +
-                " is probably an invalid or outdated database.\n"
+                " is probably an invalid database or was created by a newer "
+                "version of khal.\n"
                 "You should consider removing it and running khal again.")
 
     def _create_default_tables(self) -> None:
-        """creates version and calendar tables and inserts table version number
+        """creates calendar, event and recurrence tables and their indexes
         """
-        self.cursor.execute('CREATE TABLE IF NOT EXISTS '
-                            'version (version INTEGER)')
-        logger.debug("created version table")
-
         self.cursor.execute('''CREATE TABLE IF NOT EXISTS calendars (
             calendar TEXT NOT NULL UNIQUE,
             resource TEXT NOT NULL,
-            ctag TEXT
+            ctag TEXT,
+            window_start INT,
+            window_end INT
             )''')
         self.cursor.execute('''CREATE TABLE IF NOT EXISTS events (
                 href TEXT NOT NULL,
@@ -152,11 +198,13 @@ class SQLiteDb:
                 sequence INT,
                 etag TEXT,
                 item TEXT,
+                windowed INT NOT NULL DEFAULT 0,
                 primary key (href, calendar)
                 );''')
         self.cursor.execute('''CREATE TABLE IF NOT EXISTS recs_loc (
             dtstart INT NOT NULL,
             dtend INT NOT NULL,
+            span INT NOT NULL,
             href TEXT NOT NULL REFERENCES events( href ),
             rec_inst TEXT NOT NULL,
             ref TEXT NOT NULL,
@@ -164,9 +212,12 @@ class SQLiteDb:
             calendar TEXT NOT NULL,
             primary key (href, rec_inst, calendar)
             );''')
+        self.cursor.execute(
+            'CREATE INDEX IF NOT EXISTS recs_loc_span_dtstart ON recs_loc (span, dtstart)')
         self.cursor.execute('''CREATE TABLE IF NOT EXISTS recs_float (
             dtstart INT NOT NULL,
             dtend INT NOT NULL,
+            span INT NOT NULL,
             href TEXT NOT NULL REFERENCES events( href ),
             rec_inst TEXT NOT NULL,
             ref TEXT NOT NULL,
@@ -174,8 +225,63 @@ class SQLiteDb:
             calendar TEXT NOT NULL,
             primary key (href, rec_inst, calendar)
             );''')
+        self.cursor.execute(
+            'CREATE INDEX IF NOT EXISTS recs_float_span_dtstart ON recs_float (span, dtstart)')
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS vevents (
+            href TEXT NOT NULL REFERENCES events( href ),
+            calendar TEXT NOT NULL,
+            ref TEXT NOT NULL,
+            uid TEXT NOT NULL,
+            summary TEXT,
+            description TEXT NOT NULL,
+            location TEXT NOT NULL,
+            status TEXT NOT NULL,
+            recurring INT NOT NULL,
+            alarms INT NOT NULL,
+            text TEXT NOT NULL
+            );''')
+        self.cursor.execute(
+            'CREATE INDEX IF NOT EXISTS vevents_href ON vevents (href, calendar, ref)')
+        self._create_fts_table()
         self.conn.commit()
 
+    def _create_fts_table(self) -> None:
+        """create a full text index over `vevents.text`, if this sqlite
+        supports FTS5 (with the trigram tokenizer)
+
+        The index is kept up to date by triggers. If they are missing, because
+        the index is new or the db was last used by an sqlite without FTS5, the
+        index is rebuilt from `vevents`. If this sqlite lacks FTS5, the triggers
+        are dropped, as they would make every change to `vevents` fail.
+        """
+        try:
+            self.cursor.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5('
+                "text, content='vevents', tokenize='trigram');")
+            # fails if the index exists, but this sqlite cannot use it
+            self.cursor.execute('SELECT rowid FROM search_fts LIMIT 0')
+        except sqlite3.OperationalError as error:
+            logger.debug(f'Cannot create full text index, searching will be slower: {error}')
+            self.cursor.execute('DROP TRIGGER IF EXISTS vevents_insert')
+            self.cursor.execute('DROP TRIGGER IF EXISTS vevents_delete')
+            return
+        self.cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' "
+            "AND name IN ('vevents_insert', 'vevents_delete')")
+        if self.cursor.fetchone()[0] != 2:
+            logger.debug('Rebuilding the full text index')
+            self.cursor.execute("INSERT INTO search_fts (search_fts) VALUES ('rebuild')")
+        self.cursor.execute('''CREATE TRIGGER IF NOT EXISTS vevents_insert
+            AFTER INSERT ON vevents BEGIN
+                INSERT INTO search_fts (rowid, text) VALUES (new.rowid, new.text);
+            END;''')
+        self.cursor.execute('''CREATE TRIGGER IF NOT EXISTS vevents_delete
+            AFTER DELETE ON vevents BEGIN
+                INSERT INTO search_fts (search_fts, rowid, text)
+                VALUES ('delete', old.rowid, old.text);
+            END;''')
+        self._fts = True
+
     def _check_calendars_exists(self) -> None:
         """make sure an entry for the current calendar exists in `calendar`
         table
@@ -191,6 +297,77 @@ class SQLiteDb:
                 stuple = (cal, '')
                 self.sql_ex(sql_s, stuple)
 
+    def _check_windows(self) -> None:
+        """load the recurrence windows of all calendars
+
+        if the recurrence window has been disabled since the db was last used,
+        expand all recurring events that were only expanded in a window
+        """
+        for cal in self.calendars:
+            sql_s = 'SELECT window_start, window_end FROM calendars WHERE calendar = ?;'
+            window_start, window_end = self.sql_ex(sql_s, (cal, ))[0]
+            if window_start is None:
+                self._windows[cal] = None
+            elif self.recurrence_window is None:
+                logger.info(f'expanding all recurring events of calendar {cal}')
+                with self.at_once():
+                    self._set_window(None, cal)
+            else:
+                self._windows[cal] = (window_start, window_end)
+
+    def get_window(self, calendar: str) -> Optional[tuple[float, float]]:
+        """return the recurrence window of `calendar` as unix timestamps
+
+        if no window has been set for `calendar` yet, it is centered around now
+        """
+        if self.recurrence_window is None:
+            return None
+        window = self._windows.get(calendar)
+        if window is None:
+            now = utils.to_unix_time(dt.datetime.now(pytz.UTC))
+            delta = int(self.recurrence_window.total_seconds())
+            window = (now - delta, now + delta)
+            self.sql_ex(
+                'UPDATE calendars SET window_start = ?, window_end = ? WHERE calendar = ?;',
+                (now - delta, now + delta, calendar))
+            self._windows[calendar] = window
+        return window
+
+    def _set_window(self, window: Optional[tuple[float, float]], calendar: str) -> None:
+        """change the recurrence window of `calendar` to `window` and expand all
+        recurring events of `calendar` again
+        """
+        start, end = window if window is not None else (None, None)
+        self.sql_ex(
+            'UPDATE calendars SET window_start = ?, window_end = ? WHERE calendar = ?;',
+            (start, end, calendar))
+        self._windows[calendar] = window
+        sql_s = 'SELECT href, item FROM events WHERE windowed = 1 AND calendar = ?;'
+        for href, item in self.sql_ex(sql_s, (calendar, )):
+            self._expand_item(item, href, calendar)
+
+    def _ensure_window(self, start: float, end: float) -> None:
+        """make sure all recurring events between `start` and `end` (unix
+        timestamps) are expanded
+        """
+        if self.recurrence_window is None:
+            return
+        delta = int(self.recurrence_window.total_seconds())
+        for calendar in self.calendars:
+            window_start, window_end = self.get_window(calendar)  # type: ignore
+            if window_start <= start and end <= window_end:
+                continue
+            if start < window_start:
+                window_start = start - delta
+            if end > window_end:
+                window_end = end + delta
+            logger.debug(f'extending the recurrence window of calendar {calendar}')
+            if self._at_once:
+                self._set_window((window_start, window_end), calendar)
+            else:
+                with self.at_once():
+                    self._set_window((window_start, window_end), calendar)
+
     def sql_ex(self, statement: str, stuple: tuple) -> list:
         """wrapper for sql statements, does a "fetchall" """
         self.cursor.execute(statement, stuple)
@@ -199,6 +376,18 @@ class SQLiteDb:
             self.conn.commit()
         return result
 
+    def sql_iter(self, statement: str, stuple: tuple) -> Iterator[tuple]:
+        """wrapper for (read only) sql statements, like `sql_ex` but fetching
+        the rows only when they are needed"""
+        yield from self.conn.execute(statement, stuple)
+
+    def sql_exmany(self, statement: str, stuples: Iterable[tuple]) -> None:
+        """wrapper for sql statements, executes `statement` once for each tuple
+        in `stuples`"""
+        self.cursor.executemany(statement, stuples)
+        if not self._at_once:
+            self.conn.commit()
+
     def update(self,
                vevent_str: str,
                href: str,
@@ -223,34 +412,57 @@ class SQLiteDb:
         """
         assert calendar is not None
         assert href is not None
-        ical = cal_from_ics(vevent_str)
-        check_for_errors(ical, calendar, href)
-        if not assert_only_one_uid(ical):
-            logger.warning(
-                f"The .ics file at {calendar}/{href} contains multiple UIDs.\n"
-                "This should not occur in vdir .ics files.\n"
-                "If you didn't edit the file by hand, please report a bug "
-                "at https://github.com/pimutils/khal/issues .\n"
-                "If you want to import it, please use `khal import FILE`."
+        try:
+            prepared = prepare_update(
+                vevent_str, href, calendar, self.locale['default_timezone'],
+                self.get_window(calendar),
             )
-            raise NonUniqueUID
-        vevents = (sanitize_vevent(c, self.locale['default_timezone'], href, calendar) for
-                   c in ical.walk() if c.name == 'VEVENT')
+        except NonUniqueUID:
+            raise
+        except Exception:
+            # the old version of this event should not be shown anymore
+            self.delete(href, calendar=calendar)
+            raise
+        self.update_prepared(prepared, vevent_str, href, etag, calendar)
+
+    def update_prepared(self,
+                        prepared: tuple[bool, list[Instances], list[tuple]],
+                        vevent_str: str,
+                        href: str,
+                        etag: str,
+                        calendar: str,
+                        ) -> None:
+        """insert an event already parsed and expanded by `prepare_update`"""
+        windowed, instances, fields = prepared
         # Need to delete the whole event in case we are updating a
         # recurring event with an event which is either not recurring any
         # more or has EXDATEs, as those would be left in the recursion
         # tables. There are obviously better ways to achieve the same
         # result.
         self.delete(href, calendar=calendar)
-        for vevent in sorted(vevents, key=sort_vevent_key):
-            check_for_errors(vevent, calendar, href)
-            check_support(vevent, href, calendar)
-            self._update_impl(vevent, href, calendar)
+        self._insert_instances(instances)
+        self._insert_vevents(fields, href, calendar)
 
-        sql_s = ('INSERT INTO events (item, etag, href, calendar) VALUES (?, ?, ?, ?);')
-        stuple = (vevent_str, etag, href, calendar)
+        sql_s = ('INSERT INTO events (item, etag, href, calendar, windowed) '
+                 'VALUES (?, ?, ?, ?, ?);')
+        stuple = (vevent_str, etag, href, calendar, windowed)
         self.sql_ex(sql_s, stuple)
 
+    def _expand_item(self, item: str, href: str, calendar: str) -> None:
+        """expand the already stored `item` again, e.g. after the recurrence
+        window of its calendar changed
+        """
+        for table in ['recs_loc', 'recs_float']:
+            sql_s = f'DELETE FROM {table} WHERE href = ? AND calendar = ?;'
+            self.sql_ex(sql_s, (href, calendar))
+        vevents = [sanitize_vevent(c, self.locale['default_timezone'], href, calendar) for
+                   c in cal_from_ics(item).walk() if c.name == 'VEVENT']
+        windowed, instances = get_all_instances(
+            vevents, href, calendar, self.get_window(calendar))
+        self._insert_instances(instances)
+        sql_s = 'UPDATE events SET windowed = ? WHERE href = ? AND calendar = ?;'
+        self.sql_ex(sql_s, (windowed, href, calendar))
+
     def update_vcf_dates(self, vevent_str: str, href: str, etag: str='',
                          calendar: Optional[str]=None) -> None:
         """insert events from a vcard into the db
@@ -323,10 +535,12 @@ class SQLiteDb:
                            f'{name}\'s {description}')
                 vevent.add('uid', href + key)
                 vevent_str = vevent.to_ical().decode('utf-8')
-                self._update_impl(vevent, href + key, calendar)
-                sql_s = ('INSERT INTO events (item, etag, href, calendar)'
-                         ' VALUES (?, ?, ?, ?);')
-                stuple = (vevent_str, etag, href + key, calendar)
+                windowed = self._update_impl(
+                    vevent, href + key, calendar, self.get_window(calendar))
+                self._insert_vevents([get_vevent_fields(vevent)], href + key, calendar)
+                sql_s = ('INSERT INTO events (item, etag, href, calendar, windowed)'
+                         ' VALUES (?, ?, ?, ?, ?);')
+                stuple = (vevent_str, etag, href + key, calendar, windowed)
                 try:
                     self.sql_ex(sql_s, stuple)
                 except sqlite3.IntegrityError as error:
@@ -334,75 +548,46 @@ class SQLiteDb:
                                        f'on {date} for contact {name} (UID: {uuid}): '
                                        f'{error}')
 
-    def _update_impl(self, vevent: icalendar.cal.Event, href: str, calendar: str) -> None:
-        """insert `vevent` into the database
-
-        expand `vevent`'s recurrence rules (if needed) and insert all instance
-        in the respective tables
-        than insert non-recurring and original recurring (those with an RRULE
-        property) events into table `events`
+    def _update_impl(self,
+                     vevent: icalendar.cal.Event,
+                     href: str,
+                     calendar: str,
+                     window: Optional[tuple[float, float]]=None,
+                     ) -> bool:
+        """insert all instances of `vevent` into the database
+
+        :param window: if given, only expand the RRULE between those two unix
+            timestamps
+        :returns: True if `vevent`'s RRULE was only expanded in `window`
         """
-        # TODO FIXME this function is a steaming pile of shit
-        rec_id = vevent.get(RECURRENCE_ID)
-        if rec_id is None:
-            rrange = None
-        else:
-            rrange = rec_id.params.get('RANGE')
-
-        # testing on datetime.date won't work as datetime is a child of date
-        if not isinstance(vevent['DTSTART'].dt, dt.datetime):
-            dtype = EventType.DATE
-        else:
-            dtype = EventType.DATETIME
-        if ('TZID' in vevent['DTSTART'].params and dtype == EventType.DATETIME) or \
-                getattr(vevent['DTSTART'].dt, 'tzinfo', None):
-            recs_table = 'recs_loc'
-        else:
-            recs_table = 'recs_float'
-
-        thisandfuture = (rrange == THISANDFUTURE)
-        if thisandfuture:
-            start_shift, duration = calc_shift_deltas(vevent)
-            start_shift_seconds = start_shift.days * 3600 * 24 + start_shift.seconds
-            duration_seconds = duration.days * 3600 * 24 + duration.seconds
-
-        dtstartend = expand_vevent(vevent, href)
-        if not dtstartend:
-            # Does this event even have dates? Technically it is possible for
-            # events to be empty/non-existent by deleting all their recurrences
-            # through EXDATE.
-            return
-
-        for dtstart, dtend in dtstartend:
-            if dtype == EventType.DATE:
-                dbstart = utils.to_unix_time(dtstart)
-                dbend = utils.to_unix_time(dtend)
-            else:
-                dbstart = utils.to_unix_time(dtstart)
-                dbend = utils.to_unix_time(dtend)
-
-            if rec_id is not None:
-                ref = rec_inst = str(utils.to_unix_time(rec_id.dt))
-            else:
-                rec_inst = str(dbstart)
-                ref = PROTO
-
-            if thisandfuture:
+        windowed, instances = get_instances(vevent, href, calendar, window)
+        self._insert_instances(instances)
+        return windowed
+
+    def _insert_instances(self, instances: Iterable[Instances]) -> None:
+        """insert instances as returned by `get_instances` into the database"""
+        for recs_table, rows, thisandfuture in instances:
+            if thisandfuture is not None:
                 recs_sql_s = (
                     f'UPDATE {recs_table} SET dtstart = rec_inst + ?, dtend = rec_inst + ?, '
-                    'ref = ? WHERE rec_inst >= ? AND href = ? AND calendar = ?;')
-                stuple_f = (
-                    start_shift_seconds, start_shift_seconds + duration_seconds,
-                    ref, rec_inst, href, calendar,
-                )
-                self.sql_ex(recs_sql_s, stuple_f)
+                    'span = ?, ref = ? WHERE rec_inst >= ? AND href = ? AND calendar = ?;')
+                self.sql_ex(recs_sql_s, thisandfuture)
             else:
                 recs_sql_s = (
                     f'INSERT OR REPLACE INTO {recs_table} '
-                    '(dtstart, dtend, href, ref, dtype, rec_inst, calendar)'
-                    'VALUES (?, ?, ?, ?, ?, ?, ?);')
-                stuple_n = (dbstart, dbend, href, ref, dtype, rec_inst, calendar)
-                self.sql_ex(recs_sql_s, stuple_n)
+                    '(dtstart, dtend, span, href, ref, dtype, rec_inst, calendar)'
+                    'VALUES (?, ?, ?, ?, ?, ?, ?, ?);')
+                self.sql_exmany(recs_sql_s, rows)
+
+    def _insert_vevents(self, fields: Iterable[tuple], href: str, calendar: str) -> None:
+        """insert the fields of all vevents in `href` into the vevents table
+
+        :param fields: as returned by `get_vevent_fields` for each vevent
+        """
+        columns = ', '.join(['ref'] + VEVENT_FIELDS + ['text'])
+        sql_s = (f'INSERT INTO vevents (href, calendar, {columns}) '
+                 f'VALUES (?, ?, {", ".join("?" * (len(VEVENT_FIELDS) + 2))});')
+        self.sql_exmany(sql_s, ((href, calendar) + row for row in fields))
 
     def get_ctag(self, calendar: str) -> Optional[str]:
         stuple = (calendar, )
@@ -431,6 +616,33 @@ class SQLiteDb:
         except IndexError:
             return None
 
+    def diff_etags(self,
+                   etags: dict[str, str],
+                   calendar: str,
+                   item_href: Optional[Callable[[str], str]]=None,
+                   ) -> tuple[set[str], set[str], set[str]]:
+        """compare the etags of all items in a vdir with those in the db
+
+        :param etags: etags of all items in `calendar`'s vdir by their href
+        :param item_href: maps the href of an event in the db to the href of the
+            item it was created from (as several events can be created from one
+            vcard), by default those are the same
+        :returns: hrefs of the items that were added to or changed in the vdir,
+            and hrefs of the events whose items were removed from the vdir
+        """
+        sql_s = 'SELECT href, etag FROM events WHERE calendar = ?;'
+        db_etags: dict[str, str] = {}
+        removed: set[str] = set()
+        for href, etag in self.sql_ex(sql_s, (calendar, )):
+            item = item_href(href) if item_href is not None else href
+            if item in etags:
+                db_etags[item] = etag
+            else:
+                removed.add(href)
+        added = etags.keys() - db_etags.keys()
+        changed = {href for href, etag in db_etags.items() if etags[href] != etag}
+        return added, changed, removed
+
     def delete(self, href: str, etag: Any=None, calendar: str='') -> None:
         """
         removes the event from the db,
@@ -439,7 +651,7 @@ class SQLiteDb:
                      we always delete
         """
         assert calendar != ''
-        for table in ['recs_loc', 'recs_float']:
+        for table in ['recs_loc', 'recs_float', 'vevents']:
             sql_s = f'DELETE FROM {table} WHERE href = ? AND calendar = ?;'
             self.sql_ex(sql_s, (href, calendar))
         sql_s = 'DELETE FROM events WHERE href = ? AND calendar = ?;'
@@ -455,12 +667,39 @@ class SQLiteDb:
                      we always delete
         """
         assert calendar != ''
-        for table in ['recs_loc', 'recs_float']:
+        for table in ['recs_loc', 'recs_float', 'vevents']:
             sql_s = f'DELETE FROM {table} WHERE href LIKE ? AND calendar = ?;'
             self.sql_ex(sql_s, (href, calendar))
         sql_s = 'DELETE FROM events WHERE href LIKE ? AND calendar = ?;'
         self.sql_ex(sql_s, (href, calendar))
 
+    def get_days(self, href: str, calendar: str, like: bool=False) \
+            -> Optional[tuple[dt.date, dt.date]]:
+        """get the first and the last (local) day any instance of the events
+        with `href` covers
+
+        :param like: treat `href` as an SQL 'like' pattern, see `deletelike`
+        :returns: None if there are no such events
+        """
+        op = 'LIKE' if like else '='
+        days: list[dt.date] = []
+        for table in ['recs_loc', 'recs_float']:
+            sql_s = (f'SELECT MIN(dtstart), MAX(dtend) FROM {table} '
+                     f'WHERE href {op} ? AND calendar = ?;')
+            start, end = self.sql_ex(sql_s, (href, calendar))[0]
+            if start is None:
+                continue
+            for stamp in (start, end):
+                if table == 'recs_loc':
+                    day = dt.datetime.fromtimestamp(stamp, pytz.UTC).astimezone(
+                        self.locale['local_timezone']).date()
+                else:
+                    day = dt.datetime.fromtimestamp(stamp, pytz.UTC).date()
+                days.append(day)
+        if not days:
+            return None
+        return min(days), max(days)
+
     def list(self, calendar: str) -> list[tuple[str, str]]:
         """ list all events in `calendar`
 
@@ -470,104 +709,133 @@ class SQLiteDb:
         sql_s = 'SELECT href, etag FROM events WHERE calendar = ?;'
         return list(set(self.sql_ex(sql_s, (calendar, ))))
 
+    def _get_range(self, table: str, columns: str, start: float, end: float,
+                   vevents: bool=False) -> Iterable[tuple]:
+        """select `columns` of all instances in `table` overlapping `start` and
+        `end` (both unix timestamps), ordered by their start
+
+        (keep the condition in sync with `overlaps()`)
+
+        :param vevents: if the columns of the vevents table are needed
+
+        Going through the instances of each duration bucket separately, we
+        only need to look at those instances starting less than 2**bucket
+        seconds before `start`, which allows sqlite to use the (span, dtstart)
+        index instead of scanning the whole table.
+        """
+        if table == 'recs_loc':
+            overlap = ('(dtstart >= ? AND dtstart <= ? OR '
+                       'dtend > ? AND dtend <= ? OR '
+                       'dtstart <= ? AND dtend >= ?)')
+        else:
+            overlap = ('(dtstart >= ? AND dtstart < ? OR '
+                       'dtend > ? AND dtend <= ? OR '
+                       'dtstart <= ? AND dtend > ?)')
+        sql_s = (
+            'WITH RECURSIVE spans(span) AS '
+            f'(VALUES(0) UNION ALL SELECT span + 1 FROM spans WHERE span < {MAX_SPAN}) '
+            f'SELECT {columns} FROM spans CROSS JOIN {table} ON '
+            f'{table}.span = spans.span AND '
+            f'{table}.dtstart > ? - (1 << spans.span) AND {table}.dtstart <= ? '
+            f'JOIN events ON {table}.href = events.href AND '
+            f'{table}.calendar = events.calendar '
+            + (f'LEFT JOIN vevents ON {table}.href = vevents.href AND '
+               f'{table}.calendar = vevents.calendar AND {table}.ref = vevents.ref '
+               if vevents else '') +
+            f'WHERE {overlap} AND '
+            # insert as many "?" as we have configured calendars
+            f'events.calendar in ({",".join("?" * len(self.calendars))}) '
+            'ORDER BY dtstart')
+        stuple = (start, end) + (start, end) * 3 + tuple(self.calendars)
+        return self.sql_ex(sql_s, stuple)
+
     def get_localized_calendars(self, start: dt.datetime, end: dt.datetime) -> Iterable[str]:
         assert start.tzinfo is not None
         assert end.tzinfo is not None
         start_u = utils.to_unix_time(start)
         end_u = utils.to_unix_time(end)
-        sql_s = (
-            'SELECT events.calendar FROM '
-            'recs_loc JOIN events ON '
-            'recs_loc.href = events.href AND '
-            'recs_loc.calendar = events.calendar WHERE '
-            '(dtstart >= ? AND dtstart <= ? OR '
-            'dtend > ? AND dtend <= ? OR '
-            'dtstart <= ? AND dtend >= ?) AND events.calendar in ({0}) '
-            'ORDER BY dtstart')
-        stuple = tuple(
-            [start_u, end_u, start_u, end_u, start_u, end_u] + list(self.calendars))  # type: ignore
-        result = self.sql_ex(sql_s.format(','.join(["?"] * len(self.calendars))), stuple)
+        self._ensure_window(start_u, end_u)
+        result = self._get_range('recs_loc', 'events.calendar', start_u, end_u)
         for calendar in result:
             yield calendar[0]  # result is always an iterable, even if getting only one item
 
     def get_localized(self, start: dt.datetime, end: dt.datetime) -> Iterable[EventTuple]:
+        for event, _ in self._get_localized(start, end):
+            yield event
+
+    def get_localized_with_fields(self, start: dt.datetime, end: dt.datetime) \
+            -> Iterable[tuple[EventTuple, tuple]]:
+        """like `get_localized`, but also return the VEVENT_FIELDS of each
+        instance (all None if they are not stored for it)
+        """
+        return self._get_localized(start, end, VEVENT_FIELDS)
+
+    def _get_localized(self, start: dt.datetime, end: dt.datetime,
+                       fields: Iterable[str]=()) -> Iterable[tuple[EventTuple, tuple]]:
         assert start.tzinfo is not None
         assert end.tzinfo is not None
+        columns = [f'vevents.{field}' for field in fields]
         start_timestamp = utils.to_unix_time(start)
         end_timestamp = utils.to_unix_time(end)
-        sql_s = (
-            'SELECT item, recs_loc.href, dtstart, dtend, ref, etag, dtype, events.calendar '
-            'FROM recs_loc JOIN events ON '
-            'recs_loc.href = events.href AND '
-            'recs_loc.calendar = events.calendar WHERE '
-            '(dtstart >= ? AND dtstart <= ? OR '
-            'dtend > ? AND dtend <= ? OR '
-            'dtstart <= ? AND dtend >= ?) AND '
-            # insert as many "?" as we have configured calendars
-            f'events.calendar in ({",".join("?" * len(self.calendars))}) '
-            'ORDER BY dtstart')
-        stuple = (
-            start_timestamp,
-            end_timestamp,
-            start_timestamp,
-            end_timestamp,
-            start_timestamp,
-            end_timestamp,
-        ) + tuple(self.calendars)
-        result = self.sql_ex(sql_s, stuple)
-        for item, href, start_timestamp, end_timestamp, ref, etag, _dtype, calendar in result:
+        self._ensure_window(start_timestamp, end_timestamp)
+        result = self._get_range(
+            'recs_loc',
+            ', '.join(['item, recs_loc.href, dtstart, dtend, recs_loc.ref, etag, dtype, '
+                       'events.calendar'] + columns),
+            start_timestamp, end_timestamp, vevents=bool(columns),
+        )
+        for item, href, start_timestamp, end_timestamp, ref, etag, _dtype, calendar, \
+                *values in result:
             start = dt.datetime.fromtimestamp(start_timestamp, pytz.UTC)
             end = dt.datetime.fromtimestamp(end_timestamp, pytz.UTC)
-            yield item, href, start, end, ref, etag, calendar
+            yield (item, href, start, end, ref, etag, calendar), tuple(values)
 
     def get_floating_calendars(self, start: dt.datetime, end: dt.datetime) -> Iterable[str]:
         assert start.tzinfo is None
         assert end.tzinfo is None
         start_u = utils.to_unix_time(start)
         end_u = utils.to_unix_time(end)
-        sql_s = (
-            'SELECT events.calendar FROM '
-            'recs_float JOIN events ON '
-            'recs_float.href = events.href AND '
-            'recs_float.calendar = events.calendar WHERE '
-            '(dtstart >= ? AND dtstart < ? OR '
-            'dtend > ? AND dtend <= ? OR '
-            'dtstart <= ? AND dtend > ? ) AND events.calendar in ({0}) '
-            'ORDER BY dtstart')
-        stuple = tuple(
-            [start_u, end_u, start_u, end_u, start_u, end_u] + list(self.calendars))  # type: ignore
-        result = self.sql_ex(sql_s.format(','.join(["?"] * len(self.calendars))), stuple)
+        self._ensure_window(start_u, end_u)
+        result = self._get_range('recs_float', 'events.calendar', start_u, end_u)
         for calendar in result:
             yield calendar[0]
 
     def get_floating(self, start: dt.datetime, end: dt.datetime) -> Iterable[EventTuple]:
         """return floating events between `start` and `end`"""
+        for event, _ in self._get_floating(start, end):
+            yield event
+
+    def get_floating_with_fields(self, start: dt.datetime, end: dt.datetime) \
+            -> Iterable[tuple[EventTuple, tuple]]:
+        """like `get_floating`, but also return the VEVENT_FIELDS of each
+        instance (all None if they are not stored for it)
+        """
+        return self._get_floating(start, end, VEVENT_FIELDS)
+
+    def _get_floating(self, start: dt.datetime, end: dt.datetime,
+                      fields: Iterable[str]=()) -> Iterable[tuple[EventTuple, tuple]]:
         assert start.tzinfo is None
         assert end.tzinfo is None
         start_dt: Union[dt.datetime, dt.date]
         end_dt: Union[dt.datetime, dt.date]
+        columns = [f'vevents.{field}' for field in fields]
 
         start_u = utils.to_unix_time(start)
         end_u = utils.to_unix_time(end)
-        sql_s = (
-            'SELECT item, recs_float.href, dtstart, dtend, ref, etag, dtype, events.calendar '
-            'FROM recs_float JOIN events ON '
-            'recs_float.href = events.href AND '
-            'recs_float.calendar = events.calendar WHERE '
-            '(dtstart >= ? AND dtstart < ? OR '
-            'dtend > ? AND dtend <= ? OR '
-            'dtstart <= ? AND dtend > ? ) AND events.calendar in ({0}) '
-            'ORDER BY dtstart')
-        stuple = tuple(
-            [start_u, end_u, start_u, end_u, start_u, end_u] + list(self.calendars))  # type: ignore
-        result = self.sql_ex(sql_s.format(','.join(["?"] * len(self.calendars))), stuple)
-        for item, href, start_s, end_s, ref, etag, dtype, calendar in result:
+        self._ensure_window(start_u, end_u)
+        result = self._get_range(
+            'recs_float',
+            ', '.join(['item, recs_float.href, dtstart, dtend, recs_float.ref, etag, dtype, '
+                       'events.calendar'] + columns),
+            start_u, end_u, vevents=bool(columns),
+        )
+        for item, href, start_s, end_s, ref, etag, dtype, calendar, *values in result:
             start_dt = dt.datetime.fromtimestamp(start_s, pytz.UTC).replace(tzinfo=None)
             end_dt = dt.datetime.fromtimestamp(end_s, pytz.UTC).replace(tzinfo=None)
             if dtype == EventType.DATE:
                 start_dt = start_dt.date()
                 end_dt = end_dt.date()
-            yield item, href, start_dt, end_dt, ref, etag, calendar
+            yield (item, href, start_dt, end_dt, ref, etag, calendar), tuple(values)
 
     def get(self, href: str, calendar: str) -> str:
         """returns the ical string matching href and calendar"""
@@ -585,40 +853,278 @@ class SQLiteDb:
 
     def search(self, search_string: str) \
             -> Iterable[tuple[str, str, dt.date, dt.date, str, str, str]]:
-        """search for events matching `search_string`"""
-        sql_s = (
-            'SELECT item, recs_loc.href, dtstart, dtend, ref, etag, dtype, events.calendar '
-            'FROM recs_loc JOIN events ON '
-            'recs_loc.href = events.href AND '
-            'recs_loc.calendar = events.calendar '
-            'WHERE item LIKE (?) and events.calendar in ({0});'
-        )
-        stuple = tuple([f'%{search_string}%'] + list(self.calendars))
-        result = self.sql_ex(sql_s.format(','.join(["?"] * len(self.calendars))), stuple)
-        for item, href, start, end, ref, etag, dtype, calendar in result:
+        """search for events matching `search_string`
+
+        Only the summary, description, location, attendees and categories are
+        searched. Every matching vevent (i.e. the master event or an
+        overwritten instance) is returned once, as its first instance, best
+        matches first.
+        """
+        calendars = ','.join(["?"] * len(self.calendars))
+        if self._fts and len(search_string) >= MIN_FTS_LENGTH:
+            matches_s = (
+                'SELECT href, calendar, ref, search_fts.rank AS rank '
+                'FROM search_fts JOIN vevents ON vevents.rowid = search_fts.rowid '
+                f'WHERE search_fts MATCH ? AND calendar IN ({calendars})'
+            )
+            # search for the whole string as a phrase
+            term = '"' + search_string.replace('"', '""') + '"'
+        else:
+            matches_s = (
+                'SELECT href, calendar, ref, 0 AS rank FROM vevents '
+                f'WHERE text LIKE ? AND calendar IN ({calendars})'
+            )
+            term = f'%{search_string}%'
+        stuple = tuple([term] + list(self.calendars))
+
+        selects = []
+        tables = ['recs_loc', 'recs_float']
+        for index, table in enumerate(tables):
+            selects.append(
+                f'SELECT item, {table}.href, MIN(dtstart) AS start, dtend, {table}.ref, etag, '
+                f'dtype, {table}.calendar, matches.rank AS rank, {index} AS tbl '
+                f'FROM ({matches_s}) AS matches '
+                f'JOIN {table} ON {table}.href = matches.href AND '
+                f'{table}.calendar = matches.calendar AND {table}.ref = matches.ref '
+                f'JOIN events ON {table}.href = events.href AND '
+                f'{table}.calendar = events.calendar '
+                f'GROUP BY {table}.href, {table}.calendar, {table}.ref'
+            )
+        # best matches first, then by date, sorted by sqlite so we can return
+        # the first results before fetching all of them
+        sql_s = ' UNION ALL '.join(selects) + ' ORDER BY rank, start, tbl, 2, 8, 5;'
+
+        for item, href, start, end, ref, etag, dtype, calendar, _, index in \
+                self.sql_iter(sql_s, stuple * 2):
+            table = tables[index]
             start = dt.datetime.fromtimestamp(start, pytz.UTC)
             end = dt.datetime.fromtimestamp(end, pytz.UTC)
+            if table == 'recs_float':
+                start = start.replace(tzinfo=None)
+                end = end.replace(tzinfo=None)
             if dtype == EventType.DATE:
                 start = start.date()
                 end = end.date()
             yield item, href, start, end, ref, etag, calendar
 
-        sql_s = (
-            'SELECT item, recs_float.href, dtstart, dtend, ref, etag, dtype, events.calendar '
-            'FROM recs_float JOIN events ON '
-            'recs_float.href = events.href AND '
-            'recs_float.calendar = events.calendar '
-            'WHERE item LIKE (?) and events.calendar in ({0});'
+
+def span_bucket(duration: float) -> int:
+    """return the bucket an instance lasting `duration` seconds is put into
+
+    an instance in bucket `n` lasts less than 2**n seconds
+    """
+    return int(max(duration, 0)).bit_length()
+
+
+def overlaps(table: str, start: float, end: float, dtstart: float, dtend: float) -> bool:
+    """check if an instance from `table` (lasting from `dtstart` to `dtend`)
+    would be selected by `SQLiteDb._get_range(table, ..., start, end)`
+
+    all arguments are unix timestamps
+    """
+    if table == 'recs_loc':
+        return (start <= dtstart <= end or start < dtend <= end or
+                dtstart <= start and dtend >= end)
+    else:
+        return (start <= dtstart < end or start < dtend <= end or
+                dtstart <= start and dtend > end)
+
+
+def prepare_update(vevent_str: str,
+                   href: str,
+                   calendar: str,
+                   default_timezone: pytz.BaseTzInfo,
+                   window: Optional[tuple[float, float]]=None,
+                   ) -> tuple[bool, list[Instances], list[tuple]]:
+    """parse, check and expand `vevent_str` for `SQLiteDb.update_prepared`
+
+    This does all the work of `SQLiteDb.update` that does not need the
+    database, and only returns plain tuples, so it can be run in another
+    process.
+
+    :param window: the recurrence window of `calendar`
+    :returns: True if any vevent was only expanded in `window`, the
+        instances of all vevents and the fields of each vevent (see
+        `get_vevent_fields`)
+    """
+    ical = cal_from_ics(vevent_str)
+    check_for_errors(ical, calendar, href)
+    if not assert_only_one_uid(ical):
+        logger.warning(
+            f"The .ics file at {calendar}/{href} contains multiple UIDs.\n"
+            "This should not occur in vdir .ics files.\n"
+            "If you didn't edit the file by hand, please report a bug "
+            "at https://github.com/pimutils/khal/issues .\n"
+            "If you want to import it, please use `khal import FILE`."
         )
-        stuple = tuple([f'%{search_string}%'] + list(self.calendars))
-        result = self.sql_ex(sql_s.format(','.join(["?"] * len(self.calendars))), stuple)
-        for item, href, start, end, ref, etag, dtype, calendar in result:
-            start = dt.datetime.fromtimestamp(start, pytz.UTC).replace(tzinfo=None)
-            end = dt.datetime.fromtimestamp(end, pytz.UTC).replace(tzinfo=None)
-            if dtype == EventType.DATE:
-                start = start.date()
-                end = end.date()
-            yield item, href, start, end, ref, etag, calendar
+        raise NonUniqueUID
+    vevents = [sanitize_vevent(c, default_timezone, href, calendar) for
+               c in ical.walk() if c.name == 'VEVENT']
+    for vevent in vevents:
+        check_for_errors(vevent, calendar, href)
+        check_support(vevent, href, calendar)
+    windowed, instances = get_all_instances(vevents, href, calendar, window)
+    fields = [get_vevent_fields(vevent) for vevent in vevents]
+    return windowed, instances, fields
+
+
+def get_ref(vevent: icalendar.cal.Event) -> str:
+    """the ref of `vevent`'s instances in the recs tables"""
+    rec_id = vevent.get(RECURRENCE_ID)
+    if rec_id is None:
+        return PROTO
+    return str(utils.to_unix_time(rec_id.dt))
+
+
+def get_vevent_fields(vevent: icalendar.cal.Event) -> tuple:
+    """the ref, VEVENT_FIELDS and searchable text of `vevent`, as stored in
+    the vevents table
+
+    The summary of birthdays and other anniversaries depends on the instance,
+    it is stored as None.
+    """
+    if any(key in vevent for key in ['X-BIRTHDAY', 'X-ANNIVERSARY', 'X-ABDATE']):
+        summary = None
+    else:
+        summary = str(vevent.get('SUMMARY', ''))
+    recurring = any(key in vevent for key in ['RRULE', RECURRENCE_ID, 'RDATE'])
+    alarms = any(component.name == 'VALARM' and Event._can_handle_alarm(component)
+                 for component in vevent.subcomponents)
+    return (
+        get_ref(vevent),
+        str(vevent.get('UID', '')),
+        summary,
+        str(vevent.get('DESCRIPTION', '')),
+        str(vevent.get('LOCATION', '')),
+        str(vevent.get('STATUS', '')),
+        recurring,
+        alarms,
+        get_search_text(vevent),
+    )
+
+
+def get_search_text(vevent: icalendar.cal.Event) -> str:
+    """the text of all of `vevent`'s SEARCH_PROPERTIES"""
+    texts: list[str] = []
+    for prop in SEARCH_PROPERTIES:
+        values = vevent.get(prop, [])
+        if not isinstance(values, list):
+            values = [values]
+        for value in values:
+            if isinstance(value, icalendar.prop.vCategory):
+                texts.extend(str(category) for category in value.cats)
+                continue
+            texts.append(str(value))
+            if 'CN' in getattr(value, 'params', {}):
+                texts.append(value.params['CN'])
+    return '\n'.join(texts)
+
+
+def get_all_instances(vevents: Iterable[icalendar.cal.Event],
+                      href: str,
+                      calendar: str,
+                      window: Optional[tuple[float, float]]=None,
+                      ) -> tuple[bool, list[Instances]]:
+    """get the instances of all `vevents` (all belonging to `href`), see
+    `get_instances`
+    """
+    windowed = False
+    instances: list[Instances] = []
+    for vevent in sorted(vevents, key=sort_vevent_key):
+        vevent_windowed, vevent_instances = get_instances(vevent, href, calendar, window)
+        windowed |= vevent_windowed
+        instances.extend(vevent_instances)
+    return windowed, instances
+
+
+def get_instances(vevent: icalendar.cal.Event,
+                  href: str,
+                  calendar: str,
+                  window: Optional[tuple[float, float]]=None,
+                  ) -> tuple[bool, list[Instances]]:
+    """expand `vevent`'s recurrence rules (if needed) into rows for the
+    recs_loc or recs_float table
+
+    :param window: if given, only expand the RRULE between those two unix
+        timestamps
+    :returns: True if `vevent`'s RRULE was only expanded in `window` and the
+        instances to insert
+    """
+    # TODO FIXME this function is a steaming pile of shit
+    rec_id = vevent.get(RECURRENCE_ID)
+    if rec_id is None:
+        rrange = None
+    else:
+        rrange = rec_id.params.get('RANGE')
+
+    # testing on datetime.date won't work as datetime is a child of date
+    if not isinstance(vevent['DTSTART'].dt, dt.datetime):
+        dtype = EventType.DATE
+    else:
+        dtype = EventType.DATETIME
+    if ('TZID' in vevent['DTSTART'].params and dtype == EventType.DATETIME) or \
+            getattr(vevent['DTSTART'].dt, 'tzinfo', None):
+        recs_table = 'recs_loc'
+    else:
+        recs_table = 'recs_float'
+
+    thisandfuture = (rrange == THISANDFUTURE)
+    if thisandfuture:
+        start_shift, duration = calc_shift_deltas(vevent)
+        start_shift_seconds = start_shift.days * 3600 * 24 + start_shift.seconds
+        duration_seconds = duration.days * 3600 * 24 + duration.seconds
+
+    windowed = False
+    if window is not None and rec_id is None and 'RRULE' in vevent:
+        windowed = True
+        # the window is given in UTC, but recurrences are expanded in the
+        # event's local time, a day more on either side covers all timezones
+        window_start, window_end = (
+            dt.datetime.fromtimestamp(stamp, pytz.UTC).replace(tzinfo=None)
+            for stamp in window
+        )
+        # instances starting before the window may still last into it
+        if 'DURATION' in vevent:
+            duration = vevent['DURATION'].dt
+        elif 'DTEND' in vevent:
+            duration = vevent['DTEND'].dt - vevent['DTSTART'].dt
+        else:
+            duration = dt.timedelta(0)
+        dtstartend = expand_vevent(vevent, href, window=(
+            window_start - dt.timedelta(days=1) - max(duration, dt.timedelta(0)),
+            window_end + dt.timedelta(days=1)))
+    else:
+        dtstartend = expand_vevent(vevent, href)
+    if not dtstartend:
+        # Does this event even have dates? Technically it is possible for
+        # events to be empty/non-existent by deleting all their recurrences
+        # through EXDATE.
+        return windowed, []
+
+    if thisandfuture:
+        # events with a RECURRENCE-ID are never expanded, so there is only
+        # one instance
+        ref = rec_inst = str(utils.to_unix_time(rec_id.dt))
+        stuple_f = (
+            start_shift_seconds, start_shift_seconds + duration_seconds,
+            span_bucket(duration_seconds), ref, rec_inst, href, calendar,
+        )
+        return windowed, [(recs_table, [], stuple_f)]
+
+    rows = []
+    for dtstart, dtend in dtstartend:
+        dbstart = utils.to_unix_time(dtstart)
+        dbend = utils.to_unix_time(dtend)
+        if rec_id is not None:
+            ref = rec_inst = str(utils.to_unix_time(rec_id.dt))
+        else:
+            rec_inst = str(dbstart)
+            ref = PROTO
+        rows.append((
+            dbstart, dbend, span_bucket(dbend - dbstart), href, ref, dtype, rec_inst,
+            calendar,
+        ))
+    return windowed, [(recs_table, rows, None)]
 
 
 def check_support(vevent: icalendar.cal.Event, href: str, calendar: str) -> None:
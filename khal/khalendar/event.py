@@ -22,9 +22,12 @@
 """This module contains the event model with all relevant subclasses and some
 helper functions."""
 
+import copy
 import datetime as dt
+import functools
 import logging
 import os
+from collections.abc import Iterable
 from typing import Callable, Optional, Union
 
 import icalendar
@@ -43,6 +46,62 @@ from khal.utils import generate_random_uid, is_aware, to_naive_utc, to_unix_time
 
 logger = logging.getLogger('khal')
 
+# the attributes (see `Event.attributes`) `LightEvent`s cannot provide
+VEVENT_ATTRIBUTES = frozenset([
+    'repeat-pattern', 'partstat-symbol', 'organizer', 'attendees', 'categories', 'url',
+    'url-separator',
+])
+
+
+COLOR_ATTRIBUTES = frozenset(['reset', 'bold'] + [
+    color + bold
+    for color in ['black', 'red', 'green', 'yellow', 'blue', 'magenta', 'cyan', 'white']
+    for bold in ['', '-bold']
+])
+
+# the attributes some other attributes are computed from (including the ones
+# those are computed from)
+ATTRIBUTE_DEPENDENCIES = {
+    'start': {'start-date'},
+    'start-long': {'start-date-long'},
+    'end': {'end-date'},
+    'end-long': {'end-date-long'},
+    'start-style': {'start-time', 'end-time'},
+    'end-style': {'start-time', 'end-time'},
+    'to-style': {'start-time', 'end-time'},
+    'start-end-time-style': {'start-time', 'end-time'},
+    'end-necessary': {'end', 'end-long', 'end-time', 'end-date', 'end-date-long'},
+    'end-necessary-long': {'end', 'end-long', 'end-time', 'end-date', 'end-date-long'},
+}
+
+
+def _with_dependencies(fields: Iterable[str]) -> set[str]:
+    """return `fields` and all attributes they are computed from"""
+    wanted = set(fields)
+    for field in list(wanted):
+        wanted |= ATTRIBUTE_DEPENDENCIES.get(field, set())
+    return wanted
+
+
+def modifies_vevents(method: Callable) -> Callable:
+    """decorator for Event methods which change the event's vevents
+
+    vevents of events constructed by a CalendarCollection may be shared with
+    other events (of the same href), so they are copied before the first change.
+    The cached `Event.sort_key` is reset after every change.
+    """
+    @functools.wraps(method)
+    def wrapper(self: 'Event', *args, **kwargs):
+        if self.shared_vevents:
+            self._vevents = {
+                ref: copy.deepcopy(vevent) for ref, vevent in self._vevents.items()}
+            self.shared_vevents = False
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._sort_key = None
+    return wrapper
+
 
 class Event:
     """base Event class for representing a *recurring instance* of an Event
@@ -57,6 +116,11 @@ class Event:
         icalendar standard would have the end date be one day later)
     """
     allday: bool = False
+    # ikhal keeps the events of all loaded days around
+    __slots__ = (
+        '_vevents', 'shared_vevents', 'ref', '_locale', 'readonly', 'href', 'etag',
+        'calendar', 'color', '_start', '_end', 'addresses', '_sort_key',
+    )
 
     def __init__(self,
                  vevents: dict[str, icalendar.Event],
@@ -70,16 +134,20 @@ class Event:
                  start: Optional[dt.datetime] = None,
                  end: Optional[dt.datetime] = None,
                  addresses: Optional[list[str]] =None,
+                 shared_vevents: bool = False,
                  ):
         """
         :param start: start datetime of this event instance
         :param end: end datetime of this event instance
+        :param shared_vevents: if the vevents are shared with other events and
+            need to be copied before being changed
         """
         if self.__class__.__name__ == 'Event':
             raise ValueError('do not initialize this class directly')
         if ref is None:
             raise ValueError('ref should not be None')
         self._vevents = vevents
+        self.shared_vevents = shared_vevents
         self.ref = ref
         self._locale = locale
         self.readonly = readonly
@@ -90,6 +158,7 @@ class Event:
         self._start: dt.datetime
         self._end: dt.datetime
         self.addresses = addresses if addresses else []
+        self._sort_key: Optional[tuple[dt.datetime, dt.datetime, str]] = None
 
         if start is None:
             self._start = self._vevents[self.ref]['DTSTART'].dt
@@ -125,19 +194,19 @@ class Event:
             cls = AllDayEvent
         return cls
 
-    @classmethod
-    def fromVEvents(cls,
-                    events_list: list[icalendar.Event],
-                    ref: Optional[str]=None,
-                    start: Optional[dt.datetime]=None,
-                    **kwargs) -> 'Event':
-        assert isinstance(events_list, list)
-
+    @staticmethod
+    def vevents_by_ref(events_list: list[icalendar.Event],
+                       locale: Optional[LocaleConfiguration],
+                       ) -> dict[str, icalendar.Event]:
+        """index `events_list` by their refs, i.e. `PROTO` for the proto event
+        and RECURRENCE-ID (as unix time) for all others
+        """
         vevents = {}
         for event in events_list:
             if 'RECURRENCE-ID' in event:
                 if invalid_timezone(event['RECURRENCE-ID']):
-                    default_timezone = kwargs['locale']['default_timezone']
+                    assert locale is not None
+                    default_timezone = locale['default_timezone']
                     recur_id = default_timezone.localize(event['RECURRENCE-ID'].dt)
                     ident = str(to_unix_time(recur_id))
                 else:
@@ -145,7 +214,34 @@ class Event:
                 vevents[ident] = event
             else:
                 vevents['PROTO'] = event
+        return vevents
+
+    @staticmethod
+    def vevents_from_string(ics: str,
+                            locale: Optional[LocaleConfiguration],
+                            ) -> dict[str, icalendar.Event]:
+        """parse `ics` and return all its VEVENTs indexed by their refs"""
+        calendar_collection = cal_from_ics(ics)
+        events = [item for item in calendar_collection.walk() if item.name == 'VEVENT']
+        return Event.vevents_by_ref(events, locale)
+
+    @classmethod
+    def fromVEvents(cls,
+                    events_list: list[icalendar.Event],
+                    ref: Optional[str]=None,
+                    start: Optional[dt.datetime]=None,
+                    **kwargs) -> 'Event':
+        assert isinstance(events_list, list)
+        vevents = cls.vevents_by_ref(events_list, kwargs.get('locale'))
+        return cls.fromVEventsDict(vevents, ref, start=start, **kwargs)
 
+    @classmethod
+    def fromVEventsDict(cls,
+                        vevents: dict[str, icalendar.Event],
+                        ref: Optional[str]=None,
+                        **kwargs) -> 'Event':
+        """create an event from vevents already indexed by their refs"""
+        start = kwargs.pop('start', None)
         if ref is None:
             ref = 'PROTO' if ref in vevents.keys() else list(vevents.keys())[0]
         try:
@@ -162,47 +258,30 @@ class Event:
 
     @classmethod
     def fromString(cls, ics: str, ref=None, **kwargs) -> 'Event':
-        calendar_collection = cal_from_ics(ics)
-        events = [item for item in calendar_collection.walk() if item.name == 'VEVENT']
-        return cls.fromVEvents(events, ref, **kwargs)
+        vevents = cls.vevents_from_string(ics, kwargs.get('locale'))
+        return cls.fromVEventsDict(vevents, ref, **kwargs)
 
-    def __lt__(self, other: 'Event') -> bool:
-        start = self.start_local
-        other_start = other.start_local
-        if isinstance(start, dt.date) and not isinstance(start, dt.datetime):
-            start = dt.datetime.combine(start, dt.time.min)
-
-        if isinstance(other_start, dt.date) and not isinstance(other_start, dt.datetime):
-            other_start = dt.datetime.combine(other_start, dt.time.min)
-
-        start = start.replace(tzinfo=None)
-        other_start = other_start.replace(tzinfo=None)
+    @property
+    def sort_key(self) -> tuple[dt.datetime, dt.datetime, str]:
+        """the key events are ordered by: naive local start, end and summary
 
-        if start == other_start:
+        computed on first use and cached, as it involves localizing the
+        event's start and end; any method changing the event resets it
+        """
+        if self._sort_key is None:
+            start = self.start_local
             end = self.end_local
-            other_end = other.end_local
-            if isinstance(end, dt.date) and not isinstance(end, dt.datetime):
+            if not isinstance(start, dt.datetime):
+                start = dt.datetime.combine(start, dt.time.min)
+            if not isinstance(end, dt.datetime):
                 end = dt.datetime.combine(end, dt.time.min)
+            self._sort_key = (start.replace(tzinfo=None), end.replace(tzinfo=None), self.summary)
+        return self._sort_key
 
-            if isinstance(other_end, dt.date) and not isinstance(other_end, dt.datetime):
-                other_end = dt.datetime.combine(other_end, dt.time.min)
-
-            end = end.replace(tzinfo=None)
-            other_end = other_end.replace(tzinfo=None)
-
-            if end == other_end:
-                return self.summary < other.summary
-
-            try:
-                return end < other_end
-            except TypeError:
-                raise ValueError(f'Cannot compare events {end} and {other_end}')
-
-        try:
-            return start < other_start
-        except TypeError:
-            raise ValueError(f'Cannot compare events {start} and {other_start}')
+    def __lt__(self, other: 'Event') -> bool:
+        return self.sort_key < other.sort_key
 
+    @modifies_vevents
     def update_start_end(self, start: dt.datetime, end: dt.datetime) -> None:
         """update start and end time of this event
 
@@ -257,6 +336,7 @@ class Event:
         else:
             return icalendar.vRecur()
 
+    @modifies_vevents
     def update_rrule(self, rrule: str) -> None:
         self._vevents['PROTO'].pop('RRULE')
         if rrule is not None:
@@ -271,6 +351,7 @@ class Event:
         else:
             return dt.datetime.fromtimestamp(int(self.ref), pytz.UTC)
 
+    @modifies_vevents
     def increment_sequence(self) -> None:
         """update the SEQUENCE number, call before saving this event"""
         # TODO we might want to do this automatically in raw() everytime
@@ -361,6 +442,7 @@ class Event:
             return ''
         return self._vevents[self.ref]['URL']
 
+    @modifies_vevents
     def update_url(self, url: str) -> None:
         if url:
             self._vevents[self.ref]['URL'] = url
@@ -442,6 +524,7 @@ class Event:
         else:
             return self._vevents[self.ref].get('SUMMARY', '')
 
+    @modifies_vevents
     def update_summary(self, summary: str) -> None:
         self._vevents[self.ref]['SUMMARY'] = summary
 
@@ -463,6 +546,7 @@ class Event:
                 for a in self._vevents[self.ref].subcomponents
                 if a.name == 'VALARM' and self._can_handle_alarm(a)]
 
+    @modifies_vevents
     def update_alarms(self, alarms: list[tuple[dt.timedelta, str]]) -> None:
         """
         Replaces all alarms in the event that can be handled with the ones provided.
@@ -484,6 +568,7 @@ class Event:
     def location(self) -> str:
         return self._vevents[self.ref].get('LOCATION', '')
 
+    @modifies_vevents
     def update_location(self, location: str) -> None:
         if location:
             self._vevents[self.ref]['LOCATION'] = location
@@ -498,6 +583,7 @@ class Event:
         return ", ".join([address.split(':')[-1]
                           for address in addresses])
 
+    @modifies_vevents
     def update_attendees(self, attendees: list[str]):
         assert isinstance(attendees, list)
         attendees = [a.strip().lower() for a in attendees if a != ""]
@@ -534,6 +620,7 @@ class Event:
         except AttributeError:
             return ''
 
+    @modifies_vevents
     def update_categories(self, categories: list[str]) -> None:
         assert isinstance(categories, list)
         categories = [c.strip() for c in categories if c != ""]
@@ -545,6 +632,7 @@ class Event:
     def description(self) -> str:
         return self._vevents[self.ref].get('DESCRIPTION', '')
 
+    @modifies_vevents
     def update_description(self, description: str):
         if description:
             self._vevents[self.ref]['DESCRIPTION'] = description
@@ -597,11 +685,18 @@ class Event:
             relative_to: Union[tuple[dt.date, dt.date], dt.date],
             env=None,
             colors: bool=True,
+            fields: Optional[Iterable[str]]=None,
     ):
         """
         :param colors: determines if colors codes should be printed or not
+        :param fields: the names of the attributes that are needed, others
+            are not computed and might be missing (all are computed by default)
         """
         env = env or {}
+        wanted = _with_dependencies(fields) if fields is not None else None
+
+        def needed(*names: str) -> bool:
+            return wanted is None or not wanted.isdisjoint(names)
 
         attributes = {}
         if isinstance(relative_to, tuple):
@@ -614,6 +709,121 @@ class Event:
         if isinstance(relative_to_start, dt.datetime):
             relative_to_start = relative_to_start.date()
 
+        allday = self.allday
+
+        # the formats of the start and end attributes, by their suffixes
+        time_formats = {
+            '': self._locale['datetimeformat'],
+            '-long': self._locale['longdatetimeformat'],
+            '-date': self._locale['dateformat'],
+            '-date-long': self._locale['longdateformat'],
+            '-time': self._locale['timeformat'],
+        }
+        # the -full variants are not changed for allday events below
+        for name, moment in [('start', self.start_local), ('end', self.end_local)]:
+            for suffix, time_format in time_formats.items():
+                attr = name + suffix
+                if needed(attr, attr + '-full'):
+                    value = moment.strftime(time_format)
+                    if needed(attr):
+                        attributes[attr] = value
+                    if needed(attr + '-full'):
+                        attributes[attr + '-full'] = value
+
+        if needed('duration', 'duration-full'):
+            attributes["duration"] = attributes["duration-full"] = timedelta2str(self.duration)
+
+        if allday:
+            for name in ['start', 'end']:
+                if name in attributes:
+                    attributes[name] = attributes[name + '-date']
+                if name + '-long' in attributes:
+                    attributes[name + '-long'] = attributes[name + '-date-long']
+                if name + '-time' in attributes:
+                    attributes[name + '-time'] = ''
+
+        if needed('start-style', 'end-style', 'to-style', 'start-end-time-style'):
+            self._style_attributes(attributes, relative_to_start, relative_to_end)
+
+        if needed('end-necessary', 'end-necessary-long'):
+            if allday:
+                attributes['end-necessary'] = ''
+                attributes['end-necessary-long'] = ''
+                if self.start_local != self.end_local:
+                    attributes['end-necessary'] = attributes['end-date']
+                    attributes['end-necessary-long'] = attributes['end-date-long']
+            else:
+                attributes['end-necessary'] = attributes['end-time']
+                attributes['end-necessary-long'] = attributes['end-time']
+                if self.start_local.date() != self.end_local.date():
+                    attributes['end-necessary'] = attributes['end']
+                    attributes['end-necessary-long'] = attributes['end-long']
+
+        if needed('repeat-symbol'):
+            attributes["repeat-symbol"] = self._recur_str
+        if needed('alarm-symbol'):
+            attributes["alarm-symbol"] = self._alarm_str
+        if needed('status-symbol'):
+            attributes["status-symbol"] = self._status_str
+        if needed('title'):
+            attributes["title"] = self.summary
+
+        if needed('description', 'description-separator'):
+            formatters = FORMATTERS.values()
+            if len(formatters) == 1:
+                fmt: Callable[[str], str] = list(formatters)[0]
+            else:
+                def fmt(s: str) -> str: return s.strip()
+
+            attributes["description"] = fmt(self.description)
+            attributes["description-separator"] = ""
+            if attributes["description"]:
+                attributes["description-separator"] = " :: "
+        if needed('location'):
+            attributes["location"] = self.location.strip()
+        attributes["all-day"] = str(allday)
+        if needed('uid'):
+            attributes['uid'] = self.uid
+        if needed(*VEVENT_ATTRIBUTES):
+            attributes.update(self._vevent_attributes())
+
+        if "calendars" in env and self.calendar in env["calendars"]:
+            cal = env["calendars"][self.calendar]
+            attributes["calendar-color"] = cal.get('color', '')
+            attributes["calendar"] = cal.get("displayname", self.calendar)
+        else:
+            attributes["calendar-color"] = attributes["calendar"] = ''
+            attributes["calendar"] = self.calendar
+
+        if not needed(*COLOR_ATTRIBUTES):
+            pass
+        elif colors:
+            attributes['reset'] = style('', reset=True)
+            attributes['bold'] = style('', bold=True, reset=False)
+            for c in ["black", "red", "green", "yellow", "blue", "magenta", "cyan", "white"]:
+                attributes[c] = style("", reset=False, fg=c)
+                attributes[c + "-bold"] = style("", reset=False, fg=c, bold=True)
+        else:
+            attributes['reset'] = attributes['bold'] = ''
+            for c in ["black", "red", "green", "yellow", "blue", "magenta", "cyan", "white"]:
+                attributes[c] = attributes[c + '-bold'] = ''
+
+        attributes['nl'] = '\n'
+        attributes['tab'] = '\t'
+        attributes['bell'] = '\a'
+
+        attributes['status'] = self.status + ' ' if self.status else ''
+        attributes['cancelled'] = 'CANCELLED ' if self.status == 'CANCELLED' else ''
+        return attributes
+
+    def _style_attributes(self,
+                          attributes: dict[str, str],
+                          relative_to_start: dt.date,
+                          relative_to_end: dt.date,
+                          ) -> None:
+        """add start-style, end-style, to-style and start-end-time-style to
+        `attributes`, which need to contain start-time and end-time already
+        """
         if isinstance(self.start_local, dt.datetime):
             start_local_datetime = self.start_local
             end_local_datetime = self.end_local
@@ -631,36 +841,6 @@ class Event:
         )
         next_day_start = day_start + dt.timedelta(days=1)
 
-        allday = isinstance(self, AllDayEvent)
-
-        attributes["start"] = self.start_local.strftime(self._locale['datetimeformat'])
-        attributes["start-long"] = self.start_local.strftime(self._locale['longdatetimeformat'])
-        attributes["start-date"] = self.start_local.strftime(self._locale['dateformat'])
-        attributes["start-date-long"] = self.start_local.strftime(self._locale['longdateformat'])
-        attributes["start-time"] = self.start_local.strftime(self._locale['timeformat'])
-
-        attributes["end"] = self.end_local.strftime(self._locale['datetimeformat'])
-        attributes["end-long"] = self.end_local.strftime(self._locale['longdatetimeformat'])
-        attributes["end-date"] = self.end_local.strftime(self._locale['dateformat'])
-        attributes["end-date-long"] = self.end_local.strftime(self._locale['longdateformat'])
-        attributes["end-time"] = self.end_local.strftime(self._locale['timeformat'])
-
-        attributes["duration"] = timedelta2str(self.duration)
-
-        # should only have time attributes at this point (start/end)
-        full = {}
-        for attr in attributes:
-            full[attr + "-full"] = attributes[attr]
-        attributes.update(full)
-
-        if allday:
-            attributes["start"] = attributes["start-date"]
-            attributes["start-long"] = attributes["start-date-long"]
-            attributes["start-time"] = ""
-            attributes["end"] = attributes["end-date"]
-            attributes["end-long"] = attributes["end-date-long"]
-            attributes["end-time"] = ""
-
         tostr = ""
         if self.start_local.timetuple() < relative_to_start.timetuple():
             attributes["start-style"] = self.symbol_strings["right_arrow"]
@@ -694,7 +874,7 @@ class Event:
             attributes["start-end-time-style"] = attributes["start-style"] + \
                 tostr + attributes["end-style"]
 
-        if allday:
+        if self.allday:
             if self.start == self.end:
                 attributes['start-end-time-style'] = ''
             elif self.start == relative_to_start and self.end > relative_to_end:
@@ -706,72 +886,18 @@ class Event:
             else:
                 attributes['start-end-time-style'] = ''
 
-        if allday:
-            attributes['end-necessary'] = ''
-            attributes['end-necessary-long'] = ''
-            if self.start_local != self.end_local:
-                attributes['end-necessary'] = attributes['end-date']
-                attributes['end-necessary-long'] = attributes['end-date-long']
-        else:
-            attributes['end-necessary'] = attributes['end-time']
-            attributes['end-necessary-long'] = attributes['end-time']
-            if self.start_local.date() != self.end_local.date():
-                attributes['end-necessary'] = attributes['end']
-                attributes['end-necessary-long'] = attributes['end-long']
-
-        attributes["repeat-symbol"] = self._recur_str
+    def _vevent_attributes(self) -> dict[str, str]:
+        """the attributes in VEVENT_ATTRIBUTES"""
+        attributes = {}
         attributes["repeat-pattern"] = self.recurpattern
-        attributes["alarm-symbol"] = self._alarm_str
-        attributes["status-symbol"] = self._status_str
         attributes["partstat-symbol"] = self._partstat_str
-        attributes["title"] = self.summary
         attributes["organizer"] = self.organizer.strip()
-
-        formatters = FORMATTERS.values()
-        if len(formatters) == 1:
-            fmt: Callable[[str], str] = list(formatters)[0]
-        else:
-            def fmt(s: str) -> str: return s.strip()
-
-        attributes["description"] = fmt(self.description)
-        attributes["description-separator"] = ""
-        if attributes["description"]:
-            attributes["description-separator"] = " :: "
-        attributes["location"] = self.location.strip()
         attributes["attendees"] = self.attendees
-        attributes["all-day"] = str(allday)
         attributes["categories"] = self.categories
-        attributes['uid'] = self.uid
         attributes['url'] = self.url
         attributes['url-separator'] = ""
         if attributes['url']:
             attributes['url-separator'] = " :: "
-
-        if "calendars" in env and self.calendar in env["calendars"]:
-            cal = env["calendars"][self.calendar]
-            attributes["calendar-color"] = cal.get('color', '')
-            attributes["calendar"] = cal.get("displayname", self.calendar)
-        else:
-            attributes["calendar-color"] = attributes["calendar"] = ''
-            attributes["calendar"] = self.calendar
-
-        if colors:
-            attributes['reset'] = style('', reset=True)
-            attributes['bold'] = style('', bold=True, reset=False)
-            for c in ["black", "red", "green", "yellow", "blue", "magenta", "cyan", "white"]:
-                attributes[c] = style("", reset=False, fg=c)
-                attributes[c + "-bold"] = style("", reset=False, fg=c, bold=True)
-        else:
-            attributes['reset'] = attributes['bold'] = ''
-            for c in ["black", "red", "green", "yellow", "blue", "magenta", "cyan", "white"]:
-                attributes[c] = attributes[c + '-bold'] = ''
-
-        attributes['nl'] = '\n'
-        attributes['tab'] = '\t'
-        attributes['bell'] = '\a'
-
-        attributes['status'] = self.status + ' ' if self.status else ''
-        attributes['cancelled'] = 'CANCELLED ' if self.status == 'CANCELLED' else ''
         return attributes
 
     def duplicate(self) -> 'Event':
@@ -786,6 +912,7 @@ class Event:
         event._locale = self._locale
         return event
 
+    @modifies_vevents
     def delete_instance(self, instance: dt.datetime) -> None:
         """delete an instance from this event
 
@@ -823,13 +950,14 @@ class Event:
 
 
 class DatetimeEvent(Event):
-    pass
+    __slots__ = ()
 
 
 class LocalizedEvent(DatetimeEvent):
     """
     see parent
     """
+    __slots__ = ()
 
     def __init__(self, *args, **kwargs) -> None:
         super().__init__(*args, **kwargs)
@@ -884,6 +1012,7 @@ class FloatingEvent(DatetimeEvent):
     """
     """
     allday: bool = False
+    __slots__ = ()
 
     @property
     def start_local(self) -> dt.datetime:
@@ -896,6 +1025,7 @@ class FloatingEvent(DatetimeEvent):
 
 class AllDayEvent(Event):
     allday: bool = True
+    __slots__ = ()
 
     @property
     def end(self) -> dt.datetime:
@@ -918,6 +1048,127 @@ class AllDayEvent(Event):
             return self.end - self.start + dt.timedelta(days=1)
 
 
+class LightEvent(Event):
+    """an instance of an event, created from the fields stored in the db
+    instead of the event's icalendar
+
+    This only supports what is needed to display events, i.e. all attributes
+    but those in VEVENT_ATTRIBUTES, and cannot be edited.
+    """
+    __slots__ = (
+        'allday', '_uid', '_summary', '_description', '_location', '_status', '_recurring',
+        '_alarms',
+    )
+
+    def __init__(self,
+                 locale: LocaleConfiguration,
+                 ref: str,
+                 start: Union[dt.date, dt.datetime],
+                 end: Union[dt.date, dt.datetime],
+                 uid: str,
+                 summary: str,
+                 description: str,
+                 location: str,
+                 status: str,
+                 recurring: bool,
+                 alarms: bool,
+                 href: Optional[str] = None,
+                 etag: Optional[str] = None,
+                 calendar: Optional[str] = None,
+                 color: Optional[str] = None,
+                 ) -> None:
+        """
+        :param start: start of this instance, a date for allday events, an
+            aware datetime for localized and a naive one for floating events
+        :param end: end of this instance, as stored in the db (i.e. the
+            day after the last day for allday events)
+        :param alarms: if the event has any alarms khal can handle
+        """
+        self.ref = ref
+        self._locale = locale
+        self.readonly = True
+        self.href = href
+        self.etag = etag
+        self.calendar = calendar if calendar else ''
+        self.color = color
+        self.addresses = []
+        self.allday = not isinstance(start, dt.datetime)
+        self._start = start  # type: ignore
+        self._end = end  # type: ignore
+        self._uid = uid
+        self._summary = summary
+        self._description = description
+        self._location = location
+        self._status = status
+        self._recurring = recurring
+        self._alarms = alarms
+        self._sort_key = None
+
+    @property
+    def start_local(self) -> dt.datetime:
+        if self.allday:
+            return self.start
+        elif is_aware(self.start):
+            return self.start.astimezone(self._locale['local_timezone'])
+        else:
+            return self._locale['local_timezone'].localize(self.start)
+
+    @property
+    def end_local(self) -> dt.datetime:
+        if self.allday:
+            return self.end
+        elif is_aware(self.end):
+            return self.end.astimezone(self._locale['local_timezone'])
+        else:
+            return self._locale['local_timezone'].localize(self.end)
+
+    @property
+    def end(self) -> dt.datetime:
+        if self.allday:
+            # see AllDayEvent.end
+            end = self._end if self._end != self._start else self._end + dt.timedelta(days=1)
+            return end - dt.timedelta(days=1)
+        return self._end
+
+    @property
+    def duration(self) -> dt.timedelta:
+        if self.allday:
+            return self.end - self.start + dt.timedelta(days=1)
+        return self.end - self.start
+
+    @property
+    def uid(self) -> str:
+        return self._uid
+
+    @property
+    def summary(self) -> str:
+        return self._summary
+
+    @property
+    def description(self) -> str:
+        return self._description
+
+    @property
+    def location(self) -> str:
+        return self._location
+
+    @property
+    def status(self) -> str:
+        return self._status
+
+    @property
+    def recurring(self) -> bool:
+        return self._recurring
+
+    @property
+    def _alarm_str(self) -> str:
+        return ' ' + self.symbol_strings['alarming'] if self._alarms else ''
+
+    def _vevent_attributes(self) -> dict[str, str]:
+        # only use LightEvents if none of these are needed
+        return {}
+
+
 def create_timezone(
     tz: pytz.BaseTzInfo,
     first_date: Optional[dt.datetime]=None,
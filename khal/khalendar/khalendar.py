@@ -25,19 +25,31 @@ CalendarCollection should enable modifying and querying a collection of
 calendars. Each calendar is defined by the contents of a vdir, but uses an
 SQLite db for caching (see backend if you're interested).
 """
+import bisect
 import datetime as dt
 import itertools
 import logging
 import os
 import os.path
+from collections import OrderedDict, namedtuple
 from collections.abc import Iterable
-from typing import Optional, Union
-
-from khal.custom_types import CalendarConfiguration, EventCreationTypes, LocaleConfiguration
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional, Union
+
+import icalendar
+
+from khal import utils
+from khal.custom_types import (
+    CalendarConfiguration,
+    EventCreationTypes,
+    EventTuple,
+    LocaleConfiguration,
+    SupportsRaw,
+)
 from khal.icalendar import new_vevent
 
 from . import backend
-from .event import Event
+from .event import Event, LightEvent
 from .exceptions import (
     DuplicateUid,
     EtagMissmatch,
@@ -49,13 +61,43 @@ from .exceptions import (
 from .vdir import (
     AlreadyExistingError,
     CollectionNotFoundError,
+    Item,
     Vdir,
     WrongEtagError,
     get_etag_from_file,
+    get_etag_from_stat,
 )
 
 logger = logging.getLogger('khal')
 
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+# only use worker processes if at least this many events need to be updated
+MIN_PARALLEL_UPDATES = 100
+
+# how many events are handed to the worker processes at once
+PARALLEL_UPDATES_BATCH = 1000
+
+# how many files insert_many writes before syncing them to disk together
+INSERT_MANY_BATCH = 1000
+
+
+def _prepare_update(args: tuple) -> tuple:
+    """run `backend.prepare_update` (in a worker process)
+
+    :returns: the prepared update and None, or None and the exception raised
+    """
+    try:
+        return backend.prepare_update(*args), None
+    except Exception as error:
+        return None, error
+
+
+def _to_unix_time(day: Union[dt.datetime, dt.date]) -> float:
+    if not isinstance(day, dt.datetime):
+        day = dt.datetime.combine(day, dt.time.min)
+    return utils.to_unix_time(day)
+
 
 class CalendarCollection:
     """CalendarCollection allows access to various calendars stored in vdirs
@@ -73,6 +115,10 @@ class CalendarCollection:
                  highlight_event_days: bool=False,
                  locale: Optional[LocaleConfiguration]=None,
                  dbpath: Optional[str]=None,
+                 recurrence_window: Optional[dt.timedelta]=None,
+                 event_cache_size: int=256,
+                 workers: int=1,
+                 threads: int=1,
                  ) -> None:
         assert locale
         assert dbpath is not None
@@ -106,8 +152,17 @@ class CalendarCollection:
         self.priority = priority
         self.highlight_event_days = highlight_event_days
         self._locale = locale
-        self._backend = backend.SQLiteDb(self.names, dbpath, self._locale)
+        self._backend = backend.SQLiteDb(
+            self.names, dbpath, self._locale, recurrence_window=recurrence_window)
         self._last_ctags: dict[str, str] = {}
+        # parsed vevents, keyed by (calendar, href, etag)
+        self._event_cache: OrderedDict[tuple[str, str, str], dict[str, icalendar.Event]] = \
+            OrderedDict()
+        self._event_cache_size = event_cache_size
+        self._event_cache_hits = 0
+        self._event_cache_misses = 0
+        self._workers = workers if workers > 0 else (os.cpu_count() or 1)
+        self._threads = threads
         self.update_db()
 
     @property
@@ -144,13 +199,88 @@ class CalendarCollection:
     def _local_ctag(self, calendar: str) -> str:
         return get_etag_from_file(self._calendars[calendar]['path'])
 
-    def get_floating(self, start: dt.datetime, end: dt.datetime) -> Iterable[Event]:
-        for args in self._backend.get_floating(start, end):
-            yield self._construct_event(*args)
+    def get_floating(self, start: dt.datetime, end: dt.datetime,
+                     light: bool=False) -> Iterable[Event]:
+        """
+        :param light: return `LightEvent`s if possible, they can only be
+            displayed, not edited
+        """
+        if light:
+            for args, fields in self._backend.get_floating_with_fields(start, end):
+                yield self._construct_light_event(args, fields)
+        else:
+            for args in self._backend.get_floating(start, end):
+                yield self._construct_event(*args)
 
-    def get_localized(self, start: dt.datetime, end: dt.datetime) -> Iterable[Event]:
-        for args in self._backend.get_localized(start, end):
-            yield self._construct_event(*args)
+    def get_localized(self, start: dt.datetime, end: dt.datetime,
+                      light: bool=False) -> Iterable[Event]:
+        """
+        :param light: return `LightEvent`s if possible, they can only be
+            displayed, not edited
+        """
+        if light:
+            for args, fields in self._backend.get_localized_with_fields(start, end):
+                yield self._construct_light_event(args, fields)
+        else:
+            for args in self._backend.get_localized(start, end):
+                yield self._construct_event(*args)
+
+    def get_events_in_ranges(self,
+                             ranges: list[tuple[dt.datetime, dt.datetime]],
+                             light: bool=False,
+                             ) -> list[list[Event]]:
+        """return the events in each of the (naive, local) `ranges`
+
+        Returns the same events as calling `get_localized` and `get_floating`
+        for each range, but the db is only queried once and each event is only
+        constructed once, even if it is in several ranges.
+
+        :param ranges: must be sorted and must not overlap, e.g., the days
+            of an agenda
+        :param light: see `get_localized`
+        :returns: the events in each range, localized events first
+        """
+        events: list[list[Event]] = [[] for _ in ranges]
+        if not ranges:
+            return events
+        localize = self._locale['local_timezone'].localize
+        start, end = ranges[0][0], ranges[-1][1]
+        rows: Iterable[tuple[EventTuple, Optional[tuple]]]
+        for table in ['recs_loc', 'recs_float']:
+            if table == 'recs_loc':
+                bounds = [(utils.to_unix_time(localize(range_start)),
+                           utils.to_unix_time(localize(range_end)))
+                          for range_start, range_end in ranges]
+                if light:
+                    rows = self._backend.get_localized_with_fields(localize(start), localize(end))
+                else:
+                    rows = ((args, None) for args in
+                            self._backend.get_localized(localize(start), localize(end)))
+            else:
+                bounds = [(utils.to_unix_time(range_start), utils.to_unix_time(range_end))
+                          for range_start, range_end in ranges]
+                if light:
+                    rows = self._backend.get_floating_with_fields(start, end)
+                else:
+                    rows = ((args, None) for args in self._backend.get_floating(start, end))
+            starts = [bound[0] for bound in bounds]
+            ends = [bound[1] for bound in bounds]
+            for args, fields in rows:
+                dtstart, dtend = _to_unix_time(args[2]), _to_unix_time(args[3])
+                event: Optional[Event] = None
+                # only the ranges between those can overlap the instance
+                first = bisect.bisect_left(ends, dtstart)
+                last = bisect.bisect_right(starts, dtend)
+                for index in range(first, last):
+                    if not backend.overlaps(table, *bounds[index], dtstart, dtend):
+                        continue
+                    if event is None:
+                        if fields is None:
+                            event = self._construct_event(*args)
+                        else:
+                            event = self._construct_light_event(args, fields)
+                    events[index].append(event)
+        return events
 
     def get_events_on(self, day: dt.date) -> Iterable[Event]:
         """return all events on `day`"""
@@ -179,6 +309,7 @@ class CalendarCollection:
         assert event.raw is not None
         if self._calendars[event.calendar]['readonly']:
             raise ReadOnlyCalendarError()
+        self._invalidate_event_cache(event.calendar, event.href)
         with self._backend.at_once():
             event.etag = self._storages[event.calendar].update(event.href, event, event.etag)
             self._backend.update(event.raw, event.href, event.etag, calendar=event.calendar)
@@ -199,6 +330,7 @@ class CalendarCollection:
                 href = error.existing_href
                 _, etag = self._storages[calendar].get(href)
                 etag = self._storages[calendar].update(href, event, etag)
+            self._invalidate_event_cache(calendar, href)
             self._backend.update(event.raw, href, etag, calendar=calendar)
             self._backend.set_ctag(self._local_ctag(calendar), calendar=calendar)
 
@@ -227,9 +359,64 @@ class CalendarCollection:
             except AlreadyExistingError as Error:
                 href = getattr(Error, 'existing_href', None)
                 raise DuplicateUid(href)
+            self._invalidate_event_cache(calendar, event.href)
             self._backend.update(event.raw, event.href, event.etag, calendar=calendar)
             self._backend.set_ctag(self._local_ctag(calendar), calendar=calendar)
 
+    def insert_many(self,
+                    items: Iterable[SupportsRaw],
+                    collection: str,
+                    overwrite: bool=False,
+                    progress: Optional[Callable[[int], None]]=None,
+                    ) -> int:
+        """Insert many new events into the vdir and the database
+
+        This is much faster than calling `insert` for each of them: new files
+        are synced to disk in groups (overwritten ones still one by one), the
+        db is updated in one transaction and the ctag is set only once. Events
+        that cannot be added to the db are skipped with a warning, as during
+        `update_db`.
+
+        :param items: the events to be inserted, this can be a lazy iterable
+        :param overwrite: update events with the same UID which already exist
+            instead of raising DuplicateUid
+        :param progress: called with the number of events inserted so far
+            after each group of events
+        :returns: the number of events inserted
+        """
+        if self._calendars[collection]['readonly']:
+            raise ReadOnlyCalendarError()
+        storage = self._storages[collection]
+        count = 0
+        with self._backend.at_once():
+            self._invalidate_event_cache(collection)
+            items = iter(items)
+            while True:
+                batch = list(itertools.islice(items, INSERT_MANY_BATCH))
+                if not batch:
+                    break
+                hrefs = []
+                for item in batch:
+                    try:
+                        href, _ = storage.upload(item, fsync=False)
+                    except AlreadyExistingError as error:
+                        href = error.existing_href
+                        if not overwrite:
+                            raise DuplicateUid(href)
+                        _, etag = storage.get(href)
+                        storage.update(href, item, etag)
+                    hrefs.append(href)
+                for item, href, etag in zip(batch, hrefs, storage.sync(hrefs)):
+                    try:
+                        self._backend.update(item.raw, href, etag, calendar=collection)
+                    except Exception as error:
+                        self._log_skipped(href, collection, error)
+                count += len(batch)
+                if progress is not None:
+                    progress(count)
+            self._backend.set_ctag(self._local_ctag(collection), calendar=collection)
+        return count
+
     def delete(self, href: str, etag: Optional[str], calendar: str) -> None:
         """Delete an event specified by `href` from `calendar`"""
         if self._calendars[calendar]['readonly']:
@@ -238,6 +425,7 @@ class CalendarCollection:
             self._storages[calendar].delete(href, etag)
         except WrongEtagError:
             raise EtagMissmatch()
+        self._invalidate_event_cache(calendar, href)
         self._backend.delete(href, calendar=calendar)
 
     def delete_instance(self,
@@ -275,8 +463,8 @@ class CalendarCollection:
                          calendar: Optional[str]=None,
                          ) -> Event:
         assert calendar is not None
-        event = Event.fromString(
-            item,
+        event = Event.fromVEventsDict(
+            self._get_vevents(item, href, etag, calendar),
             locale=self._locale,
             href=href,
             calendar=calendar,
@@ -287,9 +475,81 @@ class CalendarCollection:
             color=self._calendars[calendar]['color'],
             readonly=self._calendars[calendar]['readonly'],
             addresses=self._calendars[calendar]['addresses'],
+            shared_vevents=True,
         )
         return event
 
+    def _construct_light_event(self, args: EventTuple, fields: tuple) -> Event:
+        """construct a `LightEvent` from the VEVENT_FIELDS stored in the db,
+        or a normal event if they are not stored (e.g., for birthdays)
+
+        :param args: the arguments for `_construct_event`
+        """
+        item, href, start, end, ref, etag, calendar = args
+        uid, summary, description, location, status, recurring, alarms = fields
+        if summary is None:
+            return self._construct_event(*args)
+        return LightEvent(
+            locale=self._locale,
+            ref=ref,
+            start=start,
+            end=end,
+            uid=uid,
+            summary=summary,
+            description=description,
+            location=location,
+            status=status,
+            recurring=bool(recurring),
+            alarms=bool(alarms),
+            href=href,
+            etag=etag,
+            calendar=calendar,
+            color=self._calendars[calendar]['color'],
+        )
+
+    def _get_vevents(self,
+                     item: str,
+                     href: str,
+                     etag: Optional[str],
+                     calendar: str,
+                     ) -> dict[str, icalendar.Event]:
+        """return the parsed vevents of `item`, from the cache if possible
+
+        the returned dict is shared by all events of `href`, see
+        `event.modifies_vevents`
+        """
+        if not etag or not self._event_cache_size:
+            self._event_cache_misses += 1
+            return Event.vevents_from_string(item, self._locale)
+        key = (calendar, href, etag)
+        try:
+            vevents = self._event_cache[key]
+        except KeyError:
+            self._event_cache_misses += 1
+            vevents = Event.vevents_from_string(item, self._locale)
+            self._event_cache[key] = vevents
+            if len(self._event_cache) > self._event_cache_size:
+                self._event_cache.popitem(last=False)
+        else:
+            self._event_cache_hits += 1
+            self._event_cache.move_to_end(key)
+        return vevents
+
+    def _invalidate_event_cache(self, calendar: str, href: Optional[str]=None) -> None:
+        """remove all cached vevents of `href` (or all of `calendar`'s)"""
+        for key in list(self._event_cache):
+            if key[0] == calendar and (href is None or key[1] == href):
+                del self._event_cache[key]
+
+    def cache_info(self) -> CacheInfo:
+        """return statistics about the parsed event cache"""
+        return CacheInfo(
+            self._event_cache_hits,
+            self._event_cache_misses,
+            self._event_cache_size,
+            len(self._event_cache),
+        )
+
     def change_collection(self, event: Event, new_collection: str) -> None:
         """Moves `event` to a new collection (calendar)"""
         href, etag, calendar = event.href, event.etag, event.calendar
@@ -325,10 +585,43 @@ class CalendarCollection:
         """update the db from the vdir,
 
         should be called after every change to the vdir
+
+        The vdirs are listed and their changed items read and parsed in up to
+        `threads` threads at once, only this thread writes to the db.
         """
-        for calendar in self._calendars:
-            if self._needs_update(calendar, remember=True):
-                self._db_update(calendar)
+        db_ctags = {calendar: self._backend.get_ctag(calendar) for calendar in self._calendars}
+        threads = max(1, min(self._threads, len(self._calendars)))
+        updates = []
+        in_processes = []
+        with ThreadPoolExecutor(threads) as executor:
+            scans = [
+                (calendar, executor.submit(self._scan_vdir, calendar, db_ctags[calendar]))
+                for calendar in self._calendars
+            ]
+            for calendar, scan in scans:
+                local_ctag, etags = scan.result()
+                self._last_ctags[calendar] = local_ctag
+                if etags is None:
+                    continue
+                hrefs, removed = self._diff_etags(calendar, etags)
+                prepared = None
+                if self._in_processes(calendar, hrefs):
+                    # forking the worker processes while this pool's threads
+                    # are alive (and might hold locks) can deadlock them, so
+                    # these calendars are only written once the pool is shut down
+                    in_processes.append((calendar, local_ctag, hrefs, removed))
+                    continue
+                if threads > 1 and self._calendars[calendar].get('ctype') != 'birthdays':
+                    prepared = executor.submit(
+                        self._prepare_updates, hrefs, calendar, self._backend.get_window(calendar))
+                updates.append((calendar, local_ctag, hrefs, removed, prepared))
+            for calendar, local_ctag, hrefs, removed, prepared in updates:
+                self._db_update(
+                    calendar, local_ctag, hrefs, removed,
+                    prepared.result() if prepared is not None else None,
+                )
+        for calendar, local_ctag, hrefs, removed in in_processes:
+            self._db_update(calendar, local_ctag, hrefs, removed)
 
     def needs_update(self) -> bool:
         """Check if you need to call update_db.
@@ -363,31 +656,121 @@ class CalendarCollection:
             self._last_ctags[calendar] = local_ctag
         return local_ctag != self._backend.get_ctag(calendar)
 
-    def _db_update(self, calendar: str) -> None:
-        """implements the actual db update on a per calendar base"""
+    def _scan_vdir(self, calendar: str, db_ctag: Optional[str]) -> tuple[str, Optional[dict]]:
+        """get the ctag of `calendar`'s vdir and, if it differs from `db_ctag`,
+        the etags of all its items (called from worker threads)"""
         local_ctag = self._local_ctag(calendar)
-        db_hrefs = {href for href, etag in self._backend.list(calendar)}
-        storage_hrefs: set[str] = set()
-        bdays = self._calendars[calendar].get('ctype') == 'birthdays'
-
+        if local_ctag == db_ctag:
+            return local_ctag, None
+        return local_ctag, dict(self._storages[calendar].list())
+
+    def _diff_etags(self, calendar: str, etags: dict[str, str]) -> tuple[list[str], set[str]]:
+        """:returns: the added or changed and the removed hrefs of `calendar`"""
+        storage = self._storages[calendar]
+        item_href: Optional[Callable[[str], str]] = None
+        if self._calendars[calendar].get('ctype') == 'birthdays':
+            # events created from a vcard have the vcard's href and the
+            # vcard's key (e.g. BDAY) as their href
+            def item_href(href: str) -> str:
+                return href[:href.rfind(storage.fileext) + len(storage.fileext)]
+        added, changed, removed = self._backend.diff_etags(etags, calendar, item_href)
+        return sorted(added | changed), removed
+
+    def _in_processes(self, calendar: str, hrefs: list[str]) -> bool:
+        """if the items of `hrefs` should be parsed in worker processes"""
+        return self._workers > 1 and len(hrefs) >= MIN_PARALLEL_UPDATES and \
+            self._calendars[calendar].get('ctype') != 'birthdays'
+
+    def _prepare_updates(self,
+                         hrefs: list[str],
+                         calendar: str,
+                         window: Optional[tuple[float, float]],
+                         ) -> list[tuple]:
+        """read and `backend.prepare_update` the items of `hrefs` (called from
+        worker threads)
+
+        :returns: the href, item, etag, prepared update and exception of each
+        """
+        storage = self._storages[calendar]
+        default_timezone = self._locale['default_timezone']
+        updates = []
+        for href in hrefs:
+            item, etag = storage.get(href)
+            prepared, error = _prepare_update(
+                (item.raw, href, calendar, default_timezone, window))
+            updates.append((href, item, etag, prepared, error))
+        return updates
+
+    def _db_update(self,
+                   calendar: str,
+                   local_ctag: str,
+                   hrefs: list[str],
+                   removed: Iterable[str],
+                   prepared: Optional[list[tuple]]=None,
+                   ) -> None:
+        """implements the actual db update on a per calendar base
+
+        :param prepared: the result of `_prepare_updates` for `hrefs`, if
+            None, the items are read and parsed here
+        """
+        self._invalidate_event_cache(calendar)
         with self._backend.at_once():
-            for href, etag in self._storages[calendar].list():
-                storage_hrefs.add(href)
-                db_etag = self._backend.get_etag(href, calendar=calendar)
-                if etag != db_etag:
-                    logger.debug(f'Updating {href} because {etag} != {db_etag}')
+            if prepared is not None:
+                for href, item, etag, update, error in prepared:
+                    logger.debug(f'Updating {href} because it was added or changed')
+                    self._update_prepared(href, item, etag, update, error, calendar)
+            elif self._in_processes(calendar, hrefs):
+                self._update_vevents_parallel(hrefs, calendar)
+            else:
+                for href in hrefs:
+                    logger.debug(f'Updating {href} because it was added or changed')
                     self._update_vevent(href, calendar=calendar)
-            for href in db_hrefs - storage_hrefs:
-                if bdays:
-                    for sh in storage_hrefs:
-                        if href.startswith(sh):
-                            break
+            for href in removed:
+                self._backend.delete(href, calendar=calendar)
+            self._backend.set_ctag(local_ctag, calendar=calendar)
+            self._last_ctags[calendar] = local_ctag
+
+    def update_hrefs(self, calendar: str, hrefs: Iterable[str]) -> list[tuple[dt.date, dt.date]]:
+        """update the db for only those items of `calendar` that are known to
+        have been added, changed or removed (e.g., as reported by a
+        `watcher.VdirWatcher`)
+
+        :returns: the ranges of days that might look different now
+        """
+        local_ctag = self._local_ctag(calendar)
+        storage = self._storages[calendar]
+        birthdays = self._calendars[calendar].get('ctype') == 'birthdays'
+        days = []
+        with self._backend.at_once():
+            for href in sorted(hrefs):
+                if not href.endswith(storage.fileext):
+                    continue
+                try:
+                    etag: Optional[str] = get_etag_from_stat(
+                        os.stat(os.path.join(storage.path, href)))
+                except FileNotFoundError:
+                    etag = None
+                if not birthdays and etag is not None and \
+                        etag == self._backend.get_etag(href, calendar):
+                    continue
+                db_href = href + '%' if birthdays else href
+                days.append(self._backend.get_days(db_href, calendar, like=birthdays))
+                if etag is None:
+                    logger.debug(f'Removing {href} because it was removed')
+                    if birthdays:
+                        self._backend.deletelike(db_href, calendar=calendar)
                     else:
                         self._backend.delete(href, calendar=calendar)
                 else:
-                    self._backend.delete(href, calendar=calendar)
-            self._backend.set_ctag(local_ctag, calendar=calendar)
-            self._last_ctags[calendar] = local_ctag
+                    logger.debug(f'Updating {href} because it was added or changed')
+                    self._update_vevent(href, calendar=calendar)
+                    days.append(self._backend.get_days(db_href, calendar, like=birthdays))
+                self._invalidate_event_cache(calendar, None if birthdays else href)
+            if self._backend.get_ctag(calendar) == self._last_ctags.get(calendar):
+                # the db was up to date before, so now it is again
+                self._backend.set_ctag(local_ctag, calendar=calendar)
+                self._last_ctags[calendar] = local_ctag
+        return [day_range for day_range in days if day_range is not None]
 
     def _update_vevent(self, href: str, calendar: str) -> bool:
         """should only be called during db_update, only updates the db,
@@ -401,13 +784,55 @@ class CalendarCollection:
             update(event.raw, href=href, etag=etag, calendar=calendar)
             return True
         except Exception as e:
-            if not isinstance(e, (UpdateFailed, UnsupportedFeatureError, NonUniqueUID)):
-                logger.exception('Unknown exception happened.')
-            logger.warning(
-                f'Skipping {calendar}/{href}: {e!s}\n'
-                'This event will not be available in khal.')
+            self._log_skipped(href, calendar, e)
             return False
 
+    def _update_vevents_parallel(self, hrefs: list[str], calendar: str) -> None:
+        """like calling `_update_vevent` for all `hrefs`, but parsing and
+        expanding the events in worker processes
+
+        should only be called during db_update (from within `at_once`)
+        """
+        storage = self._storages[calendar]
+        default_timezone = self._locale['default_timezone']
+        window = self._backend.get_window(calendar)
+        logger.debug(f'Updating {len(hrefs)} events with {self._workers} processes')
+        with ProcessPoolExecutor(self._workers) as executor:
+            for start in range(0, len(hrefs), PARALLEL_UPDATES_BATCH):
+                items = [(href, *storage.get(href))
+                         for href in hrefs[start:start + PARALLEL_UPDATES_BATCH]]
+                jobs = ((item.raw, href, calendar, default_timezone, window)
+                        for href, item, _ in items)
+                results = executor.map(_prepare_update, jobs, chunksize=16)
+                for (href, item, etag), (prepared, error) in zip(items, results):
+                    self._update_prepared(href, item, etag, prepared, error, calendar)
+
+    def _update_prepared(self,
+                         href: str,
+                         item: Item,
+                         etag: str,
+                         prepared: Optional[tuple],
+                         error: Optional[Exception],
+                         calendar: str,
+                         ) -> None:
+        """write the result of `_prepare_update` to the db, like `backend.update`
+        would have"""
+        if error is not None:
+            if not isinstance(error, NonUniqueUID):
+                self._backend.delete(href, calendar=calendar)
+            self._log_skipped(href, calendar, error)
+        else:
+            assert prepared is not None
+            self._backend.update_prepared(prepared, item.raw, href, etag, calendar)
+
+    @staticmethod
+    def _log_skipped(href: str, calendar: str, error: Exception) -> None:
+        if not isinstance(error, (UpdateFailed, UnsupportedFeatureError, NonUniqueUID)):
+            logger.error('Unknown exception happened.', exc_info=error)
+        logger.warning(
+            f'Skipping {calendar}/{href}: {error!s}\n'
+            'This event will not be available in khal.')
+
     def search(self, search_string: str) -> Iterable[Event]:
         """search for the db for events matching `search_string`"""
         return (self._construct_event(*args) for args in self._backend.search(search_string))
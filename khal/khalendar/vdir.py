@@ -6,6 +6,7 @@ vdirsyncer.
 import contextlib
 import errno
 import os
+import re
 import tempfile
 import uuid
 from collections.abc import Iterable
@@ -88,6 +89,18 @@ def get_etag_from_file(f) -> str:
         if close_f:
             os.close(f)
 
+    return get_etag_from_stat(stat)
+
+
+def _get_etag(f: IO, fsync: bool) -> str:
+    if fsync:
+        return get_etag_from_file(f)
+    f.flush()
+    return get_etag_from_stat(os.fstat(f.fileno()))
+
+
+def get_etag_from_stat(stat: os.stat_result) -> str:
+    '''Get mtime-based etag from the result of a stat call.'''
     mtime = getattr(stat, 'st_mtime_ns', None)
     if mtime is None:
         mtime = stat.st_mtime
@@ -120,26 +133,50 @@ class AlreadyExistingError(VdirError):
     existing_href: str = ''
 
 
+def get_uid(raw: str) -> Optional[str]:
+    '''Get the UID of the first VEVENT in `raw`.
+
+    Reading stops at that UID, so the cost does not depend on the size of the
+    rest of `raw`. If no VEVENT has a UID, the first UID of any other component
+    is returned.
+    '''
+    # imported here, khal.icalendar pulls in icalendar and dateutil
+    from khal.icalendar import unfolded_lines
+
+    components: list[str] = []
+    fallback = None
+    lines = (match.group() for match in re.finditer(r'[^\n]*\n|[^\n]+', raw))
+    for line in unfolded_lines(lines):
+        name, sep, value = line.partition(':')
+        if not sep:
+            continue
+        name = name.upper()
+        if name == 'BEGIN':
+            components.append(value.strip().upper())
+        elif name == 'END':
+            if components:
+                components.pop()
+        elif name == 'UID' or name.startswith('UID;'):
+            if components and components[-1] == 'VEVENT':
+                return value.strip() or None
+            if fallback is None:
+                fallback = value.strip() or None
+    return fallback
+
+
 class Item:
-    def __init__(self, raw: str) -> None:
+    def __init__(self, raw: str, uid: Optional[str]=None) -> None:
+        '''
+        :param uid: the UID of `raw`, if it is already known
+        '''
         assert isinstance(raw, str)
         self.raw = raw
+        if uid is not None:
+            self.__dict__['uid'] = uid
 
     @cached_property
     def uid(self) -> Optional[str]:
-        uid = ''
-        lines = iter(self.raw.splitlines())
-        for line in lines:
-            if line.startswith('UID:'):
-                uid += line[4:].strip()
-                break
-
-        for line in lines:
-            if not line.startswith(' '):
-                break
-            uid += line[1:]
-
-        return uid or None
+        return get_uid(self.raw)
 
 
 @contextlib.contextmanager
@@ -209,10 +246,19 @@ class VdirBase:
         return _generate_href(uid) + self.fileext
 
     def list(self) -> Iterable[tuple[str, str]]:
-        for fname in os.listdir(self.path):
-            fpath = os.path.join(self.path, fname)
-            if os.path.isfile(fpath) and fname.endswith(self.fileext):
-                yield fname, get_etag_from_file(fpath)
+        # the files are not opened (or synced, as in get_etag_from_file), one
+        # stat call per file is enough and os.scandir often even knows which
+        # entries are files without one
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if not entry.name.endswith(self.fileext):
+                    continue
+                try:
+                    if entry.is_file():
+                        yield entry.name, get_etag_from_stat(entry.stat())
+                except FileNotFoundError:
+                    # deleted while we were listing the directory
+                    continue
 
     def get(self, href: str) -> tuple[Item, str]:
         fpath = self._get_filepath(href)
@@ -228,13 +274,17 @@ class VdirBase:
             else:
                 raise
 
-    def upload(self, item: SupportsRaw) -> tuple[str, str]:
+    def upload(self, item: SupportsRaw, fsync: bool=True) -> tuple[str, str]:
+        '''
+        :param fsync: if False, the file is not synced to disk and the returned
+            etag is only preliminary, call `sync` later
+        '''
         if not isinstance(item.raw, str):
             raise TypeError('item.raw must be a unicode string.')
 
         try:
             href = self._get_href(item.uid)
-            _, etag = self._upload_impl(item, href)
+            _, etag = self._upload_impl(item, href, fsync)
         except OSError as e:
             if e.errno in (
                 errno.ENAMETOOLONG,  # Unix
@@ -242,18 +292,18 @@ class VdirBase:
             ):
                 # random href instead of UID-based
                 href = self._get_href(None)
-                _, etag = self._upload_impl(item, href)
+                _, etag = self._upload_impl(item, href, fsync)
             else:
                 raise
         return href, etag
 
-    def _upload_impl(self, item: SupportsRaw, href: str) -> tuple[str, str]:
+    def _upload_impl(self, item: SupportsRaw, href: str, fsync: bool=True) -> tuple[str, str]:
         fpath = self._get_filepath(href)
         try:
             f: IO
             with atomic_write(fpath, overwrite=False) as f:
                 f.write(item.raw.encode(self.encoding))
-                return fpath, get_etag_from_file(f)
+                return fpath, _get_etag(f, fsync)
         except OSError as e:
             if e.errno == errno.EEXIST:
                 raise AlreadyExistingError(existing_href=href)
@@ -277,6 +327,17 @@ class VdirBase:
 
         return etag
 
+    def sync(self, hrefs: Iterable[str]) -> Iterable[str]:
+        '''Sync the files of `hrefs`, which were written with `fsync=False`,
+        and the directory entries pointing to them to disk.
+
+        :returns: their final etags
+        '''
+        etags = [get_etag_from_file(self._get_filepath(href)) for href in hrefs]
+        if hasattr(os, 'O_DIRECTORY'):
+            get_etag_from_file(self.path)
+        return etags
+
     def delete(self, href: str, etag: Optional[str]) -> None:
         fpath = self._get_filepath(href)
         if not os.path.isfile(fpath):
@@ -0,0 +1,142 @@
+# Copyright (c) 2013-2022 khal contributors
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be
+# included in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""Watching vdirs for changed items with Linux' inotify"""
+
+import ctypes
+import ctypes.util
+import errno
+import logging
+import os
+import struct
+from typing import Optional
+
+logger = logging.getLogger('khal')
+
+# from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+# items are written to a temporary file which is then renamed or linked
+# into place, deleted or edited in place
+WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_DELETE_SELF | IN_MOVE_SELF)
+
+# struct inotify_event without its variable length name
+EVENT = struct.Struct('iIII')
+
+
+class VdirWatcher:
+    """watch the directories of calendars for changed files
+
+    Meant to be used with a main loop watching `fileno()` for new data, which
+    can then be obtained from `read()`.
+
+    :param paths: the paths of the vdirs to watch by the calendars' names
+    :raises OSError: if inotify is not available
+    """
+
+    def __init__(self, paths: dict[str, str]) -> None:
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError(errno.ENOSYS, 'Cannot find libc')
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self._libc = libc
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'Cannot initialize inotify')
+        self._paths = paths
+        self._calendars: dict[int, str] = {}
+        try:
+            self.rewatch()
+        except OSError:
+            self.close()
+            raise
+
+    def _watch(self, path: str) -> int:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f'Cannot watch {path}: {os.strerror(error)}')
+        return wd
+
+    def rewatch(self) -> None:
+        """(re-)add the watches for all vdirs
+
+        Needed after `read()` returned None, as the kernel drops the watch of
+        a vdir that is deleted or moved away (even if it is re-created or
+        moved back later).
+
+        :raises OSError: if a vdir cannot be watched (e.g. it does not exist)
+        """
+        calendars = {self._watch(path): calendar for calendar, path in self._paths.items()}
+        for wd in self._calendars.keys() - calendars.keys():
+            # e.g. still watching a vdir that was moved elsewhere, fails
+            # harmlessly if the kernel dropped the watch already
+            self._libc.inotify_rm_watch(self._fd, wd)
+        self._calendars = calendars
+
+    def fileno(self) -> int:
+        return self._fd
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+    def read(self) -> Optional[dict[str, set[str]]]:
+        """return the names of the files that changed since the last call
+
+        :returns: the changed files by the calendars' names, or None if
+            changes might have been missed (because too many files changed
+            at once or a vdir was moved or deleted), then all calendars need
+            to be checked
+        """
+        changed: dict[str, set[str]] = {}
+        complete = True
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT.unpack_from(data, offset)
+                offset += EVENT.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if wd not in self._calendars and not mask & IN_Q_OVERFLOW:
+                    # a watch removed by rewatch()
+                    continue
+                if mask & (IN_Q_OVERFLOW | IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+                    logger.debug(f'inotify reported {mask:#x}, checking all calendars')
+                    complete = False
+                elif name and not mask & IN_ISDIR:
+                    changed.setdefault(self._calendars[wd], set()).add(os.fsdecode(name))
+        return changed if complete else None
@@ -1,5 +1,5 @@
-from collections.abc import Mapping
-from typing import Callable
+from collections.abc import Iterator, Mapping
+from typing import Callable, Optional
 
 from khal._compat import importlib_metadata
 
@@ -9,22 +9,40 @@ from khal._compat import importlib_metadata
 #   https://setuptools.pypa.io/en/latest/userguide/entry_point.html
 
 
-def _load_formatters() -> dict[str, Callable[[str], str]]:
-    formatter_entrypoints = importlib_metadata.entry_points(group="khal.formatter")
-    return {ep.name: ep.load() for ep in formatter_entrypoints}
+class _EntryPoints(Mapping):
+    """the objects registered for the entry point `group` by name
 
+    They are only loaded when first used, so that looking for plugins (and
+    importing them) does not slow down commands which do not need them.
+    """
 
-FORMATTERS: Mapping[str, Callable[[str], str]] = _load_formatters()
+    def __init__(self, group: str) -> None:
+        self._group = group
+        self._loaded: Optional[dict] = None
 
-def _load_color_themes() -> dict[str, list[tuple[str, ...]]]:
-    color_theme_entrypoints = importlib_metadata.entry_points(group="khal.color_theme")
-    return {ep.name: ep.load() for ep in color_theme_entrypoints}
+    def _load(self) -> dict:
+        if self._loaded is None:
+            entry_points = importlib_metadata.entry_points(group=self._group)
+            self._loaded = {ep.name: ep.load() for ep in entry_points}
+        return self._loaded
 
-THEMES: dict[str, list[tuple[str, ...]],] = _load_color_themes()
+    def __getitem__(self, name: str):
+        return self._load()[name]
 
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._load())
 
-def _load_commands() -> dict[str, Callable]:
-    command_entrypoints = importlib_metadata.entry_points(group="khal.commands")
-    return {ep.name: ep.load() for ep in command_entrypoints}
+    def __len__(self) -> int:
+        return len(self._load())
 
-COMMANDS: dict[str, Callable] = _load_commands()
+    def __repr__(self) -> str:
+        if self._loaded is None:
+            return f'<{self._group} plugins, not loaded yet>'
+        return repr(self._loaded)
+
+
+FORMATTERS: Mapping[str, Callable[[str], str]] = _EntryPoints('khal.formatter')
+
+THEMES: Mapping[str, list[tuple[str, ...]]] = _EntryPoints('khal.color_theme')
+
+COMMANDS: Mapping[str, Callable] = _EntryPoints('khal.commands')
@@ -80,6 +80,25 @@ addresses = force_list(default='')
 # khal stores its internal caching database here, by default this will be in the *$XDG_CACHE_HOME/khal/khal.db* (this will most likely be *~/.cache/khal/khal.db*).
 path = expand_db_path(default=None)
 
+# By default khal stores all instances of recurring events (up to the year 2037)
+# in its database. For calendars with many recurring events this can make the
+# database large and updating it slow. If you set this to a timedelta (e.g.
+# `180d`), only the instances falling into a window of this size around today
+# are stored, the window is extended as soon as you look at dates beyond it.
+recurrence_window = timedelta(default='')
+
+# When many events need to be (re-)read into the database, e.g. after
+# upgrading khal or syncing a large calendar for the first time, khal parses
+# them in this many processes. By default (0) one process per CPU is used, set
+# this to 1 to never start additional processes.
+workers = integer(default=0, min=0)
+
+# When khal starts, it checks all vdirs for changes and reads the changed
+# items. With many calendars on slow (e.g. network) filesystems this is faster
+# when up to this many vdirs are checked at the same time. Set this to 1 to
+# check one vdir after the other.
+threads = integer(default=4, min=1)
+
 # It is mandatory to set (long)date-, time-, and datetimeformat options, all others options in the **[locale]** section are optional and have (sensible) defaults.
 [locale]
 
@@ -231,6 +250,12 @@ default_dayevent_alarm = timedelta(default='')
 # 'ikhal' only)
 enable_mouse = boolean(default=True)
 
+# Whether interactive mode ('khal interactive' and 'ikhal' only) should watch
+# the vdirs for changes made by other programs (e.g. vdirsyncer) and show
+# them right away. Only supported on Linux, elsewhere (or if this is set to
+# False) the vdirs are checked for changes once a minute.
+watch_vdirs = boolean(default=True)
+
 
 # The view section contains configuration options that effect the visual appearance
 # when using khal and ikhal.
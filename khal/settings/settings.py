@@ -20,13 +20,17 @@
 # WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 #
 
+import glob
 import logging
 import os
+import pickle
+import re
+import tempfile
 
 import xdg.BaseDirectory
 from configobj import ConfigObj, ConfigObjError, flatten_errors, get_extra_values
 
-from khal import __productname__
+from khal import __productname__, __version__
 
 try:
     # Available from configobj 5.1.0
@@ -34,7 +38,7 @@ try:
 except ModuleNotFoundError:
     from validate import Validator
 
-from typing import Callable, Optional
+from typing import Any, Callable, Optional
 
 from .exceptions import CannotParseConfigFileError, InvalidSettingsError, NoConfigFile
 from .utils import (
@@ -53,6 +57,10 @@ from .utils import (
 logger = logging.getLogger('khal')
 SPECPATH = os.path.join(os.path.dirname(__file__), 'khal.spec')
 
+# environment variables the validated configuration (always) depends on, on
+# top of those used in the configuration file
+CACHE_ENVIRON = ['HOME', 'TZ']
+
 
 def find_configuration_file() -> Optional[str]:
     """Return the configuration filename.
@@ -75,13 +83,17 @@ def find_configuration_file() -> Optional[str]:
 def get_config(
         config_path: Optional[str]=None,
         _get_color_from_vdir: Callable=get_color_from_vdir,
-        _get_vdir_type: Callable=get_vdir_type) -> ConfigObj:
+        _get_vdir_type: Callable=get_vdir_type,
+        use_cache: bool=False) -> ConfigObj:
     """reads the config file, validates it and return a config dict
 
     :param config_path: path to a custom config file, if none is given the
                         default locations will be searched
     :param _get_color_from_vdir: override get_color_from_vdir for testing purposes
     :param _get_vdir_type: override get_vdir_type for testing purposes
+    :param use_cache: return the configuration validated by an earlier call,
+                      if neither the config file nor the discovered vdirs
+                      have changed since, see `load_cached_config`
     :returns: configuration
     """
     if config_path is None:
@@ -91,6 +103,14 @@ def get_config(
 
     logger.debug(f'using the config file at {config_path}')
 
+    if use_cache:
+        cached = load_cached_config(config_path)
+        if cached is not None:
+            return cached
+        # before reading anything, so that changes made meanwhile invalidate
+        # the cached configuration
+        cache_key = _cache_key(config_path, _config_environ(config_path))
+
     try:
         user_config = ConfigObj(config_path,
                                 configspec=SPECPATH,
@@ -135,23 +155,151 @@ def get_config(
     if abort or not results:
         raise InvalidSettingsError()
 
+    if use_cache:
+        # the vdirs config_checks() reads, before it expands them
+        vdir_mtimes = _vdir_mtimes([
+            calendar['path'] for calendar in user_config['calendars'].values()
+            if isinstance(calendar, dict) and
+            (calendar['type'] == 'discover' or calendar['color'] == 'auto')
+        ])
     config_checks(user_config, _get_color_from_vdir, _get_vdir_type)
 
+    warnings = []
     extras = get_extra_values(user_config)
     for section, value in extras:
         if section == ():
-            logger.warning(f'unknown section "{value}" in config file')
+            warnings.append(f'unknown section "{value}" in config file')
         elif section == ('palette',):
             # we don't validate the palette section, because there is no way to
             # automatically extract valid attributes from the ui module
             continue
         else:
             section = sectionize(section)
-            logger.warning(
+            warnings.append(
                 f'unknown key or subsection "{value}" in section "{section}"')
+    for warning in warnings:
+        logger.warning(warning)
+    if use_cache:
+        store_cached_config(cache_key, vdir_mtimes, warnings, user_config)
     return user_config
 
 
+def config_cache_path() -> str:
+    """the path of the cached, validated configuration"""
+    return os.path.join(xdg.BaseDirectory.xdg_cache_home, __productname__, 'config.pickle')
+
+
+def _mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _config_environ(config_path: str) -> list[str]:
+    """the environment variables the configuration depends on"""
+    try:
+        with open(config_path) as config_file:
+            used = re.findall(r'\$\{?(\w+)', config_file.read())
+    except OSError:
+        used = []
+    return sorted(set(CACHE_ENVIRON + used))
+
+
+def _cache_key(config_path: str, environ: list[str]) -> dict[str, Any]:
+    """everything besides the vdirs a validated configuration depends on"""
+    try:
+        stat = os.stat(config_path)
+        config_stat = (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        config_stat = None
+    return {
+        'version': __version__,
+        'spec': _mtime(SPECPATH),
+        'path': os.path.abspath(config_path),
+        'config': config_stat,
+        'environ': {name: os.environ.get(name) for name in environ},
+        # the local timezone, unless set in the environment or config file
+        'localtime': os.path.realpath('/etc/localtime'),
+    }
+
+
+def _watched_dirs(path: str) -> list[str]:
+    """the directories which change when a vdir matching `path` (which may
+    be a glob pattern) is added or removed or its metadata changes"""
+    parts = path.rstrip(os.sep).split(os.sep)
+    dirs = []
+    for index in range(1, len(parts) + 1):
+        partial = os.sep.join(parts[:index]) or os.sep
+        if glob.escape(partial) != partial:
+            dirs.extend(glob.glob(f'{partial}/', recursive=True))
+        elif index == len(parts) or glob.escape(parts[index]) != parts[index]:
+            # the last directory before the first glob pattern (or path
+            # itself), which might not exist (yet)
+            dirs.append(partial)
+    return dirs
+
+
+def _vdir_mtimes(paths: list[str]) -> dict[str, Optional[int]]:
+    return {path: _mtime(path) for vdir_path in paths for path in _watched_dirs(vdir_path)}
+
+
+def load_cached_config(config_path: str) -> Optional[ConfigObj]:
+    """return the configuration validated by an earlier `get_config` (with
+    `use_cache`) for `config_path`, if it is still valid
+
+    It is valid as long as the config file, khal's version, the environment
+    variables used in the config file and the vdirs it was read from (for
+    calendars with type `discover` or color `auto`) are unchanged.
+    """
+    try:
+        with open(config_cache_path(), 'rb') as cache_file:
+            cached = pickle.load(cache_file)
+        key, dirs, warnings, config = cached
+        if key != _cache_key(config_path, list(key['environ'])):
+            return None
+    except FileNotFoundError:
+        return None
+    except Exception as error:
+        logger.debug(f'could not read the cached configuration: {error}')
+        return None
+    for path, mtime in dirs.items():
+        if _mtime(path) != mtime:
+            logger.debug(f'{path} changed, not using the cached configuration')
+            return None
+    logger.debug('using the cached configuration')
+    for warning in warnings:
+        logger.warning(warning)
+    return config
+
+
+def store_cached_config(
+        key: dict[str, Any],
+        vdir_mtimes: dict[str, Optional[int]],
+        warnings: list[str],
+        config: ConfigObj) -> None:
+    """cache the validated `config` for `load_cached_config`
+
+    :param key: the `_cache_key` from before reading the config file
+    :param vdir_mtimes: the mtimes of the directories the vdirs were read
+                        from, from before reading them
+    :param warnings: warnings to show whenever the configuration is used
+    """
+    path = config_cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+                'wb', dir=os.path.dirname(path), delete=False) as cache_file:
+            try:
+                pickle.dump((key, vdir_mtimes, warnings, config), cache_file)
+            except Exception:
+                os.unlink(cache_file.name)
+                raise
+        os.replace(cache_file.name, path)
+    except Exception as error:
+        logger.debug(f'could not cache the configuration: {error}')
+
+
 def sectionize(sections: list[str], depth: int=1) -> str:
     """converts list of string into [list][[of]][[[strings]]]"""
     this_part = depth * '[' + sections[0] + depth * ']'
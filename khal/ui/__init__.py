@@ -24,6 +24,7 @@ import logging
 import signal
 import sys
 from enum import IntEnum
+from operator import attrgetter
 from typing import Literal, Optional
 
 import click
@@ -32,6 +33,7 @@ import urwid
 from khal import plugins, utils
 from khal.khalendar import CalendarCollection
 from khal.khalendar.exceptions import FatalError, ReadOnlyCalendarError
+from khal.khalendar.watcher import VdirWatcher
 from khal.parse_datetime import timedelta2str
 
 from . import colors
@@ -496,7 +498,7 @@ class DayWalker(urwid.SimpleFocusListWalker):
             conf=self._conf,
         )
         event_list.append(urwid.AttrMap(date_header, 'date'))
-        self.events = sorted(self._collection.get_events_on(day))
+        self.events = sorted(self._collection.get_events_on(day), key=attrgetter('sort_key'))
         event_list.extend([
             urwid.AttrMap(
                 U_Event(event, conf=self._conf, this_date=day, delete_status=self.delete_status),
@@ -1173,7 +1175,7 @@ class ClassicView(Pane):
         """search for events matching `search_term"""
         assert self.window is not None
         self.window.backtrack()
-        events = sorted(self.collection.search(search_term))
+        events = self.collection.search(search_term)
         event_list = []
         event_list.extend([
             urwid.AttrMap(
@@ -1473,15 +1475,69 @@ def start_pane(
 
     loop.set_alarm_in(60, redraw_today, pane)
 
-    def check_for_updates(loop, pane):
+    def check_for_updates(loop, pane, again=True):
         if pane.collection.needs_update():
             pane.window.alert('detected external vdir modification, updating...')
             pane.collection.update_db()
             pane.eventscolumn.base_widget.update(None, None, everything=True)
             pane.window.alert('detected external vdir modification, updated.')
+        if again:
+            loop.set_alarm_in(60, check_for_updates, pane)
+
+    watcher = None
+    if pane._conf['default']['watch_vdirs']:
+        try:
+            watcher = VdirWatcher(
+                {calendar['name']: calendar['path'] for calendar in pane.collection.calendars})
+        except OSError as error:
+            logger.debug(f'Cannot watch vdirs for changes, polling instead: {error}')
+
+    if watcher is None:
         loop.set_alarm_in(60, check_for_updates, pane)
+    else:
+        # editors and sync tools often touch a file several times in quick
+        # succession, collect those changes before updating
+        pending: dict[str, set[str]] = {}
+        meta: dict = {'alarm': None, 'everything': False, 'closed': False}
+
+        def apply_changes(loop, pane):
+            meta['alarm'] = None
+            if meta['everything']:
+                meta['everything'] = False
+                pending.clear()
+                check_for_updates(loop, pane, again=False)
+                try:
+                    # the kernel has dropped the watches of deleted or
+                    # moved vdirs
+                    watcher.rewatch()
+                except OSError as error:
+                    logger.debug(f'Cannot watch vdirs for changes, polling instead: {error}')
+                    loop.remove_watch_file(meta['handle'])
+                    watcher.close()
+                    meta['closed'] = True
+                    loop.set_alarm_in(60, check_for_updates, pane)
+                return
+            ranges = []
+            for calendar, hrefs in pending.items():
+                ranges.extend(pane.collection.update_hrefs(calendar, hrefs))
+            pending.clear()
+            # nothing to show for changes khal made itself
+            if ranges:
+                for start, end in ranges:
+                    pane.eventscolumn.base_widget.update(start, end, everything=False)
+                pane.window.alert('detected external vdir modification, updated.')
+
+        def on_vdir_change():
+            changed = watcher.read()
+            if changed is None:
+                meta['everything'] = True
+            else:
+                for calendar, hrefs in changed.items():
+                    pending.setdefault(calendar, set()).update(hrefs)
+            if meta['alarm'] is None and (pending or meta['everything']):
+                meta['alarm'] = loop.set_alarm_in(0.5, apply_changes, pane)
 
-    loop.set_alarm_in(60, check_for_updates, pane)
+        meta['handle'] = loop.watch_file(watcher.fileno(), on_vdir_change)
 
     colors_ = 2**24 if color_mode == 'rgb' else 256
     loop.screen.set_terminal_properties(
@@ -1503,3 +1559,6 @@ def start_pane(
             pass
         print(tb)
         sys.exit(1)
+    finally:
+        if watcher is not None and not meta['closed']:
+            watcher.close()
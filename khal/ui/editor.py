@@ -583,7 +583,6 @@ class EventEditor(urwid.WidgetWrap):
 
         if self._always_save or self.changed is True:
             self.update_vevent()
-            self.event.allday = self.startendeditor.allday
             self.event.increment_sequence()
             if self.event.etag is None:  # has not been saved before
                 self.event.calendar = self.calendar_chooser.original_widget.active['name']
@@ -30,16 +30,18 @@ import string
 from calendar import month_abbr, timegm
 from collections.abc import Iterator
 from textwrap import wrap
-from typing import Optional
+from typing import TYPE_CHECKING, Callable, Optional
 
 import icalendar
 import pytz
-import urwid
 from click import style
 
 from .parse_datetime import guesstimedeltafstr
 from .terminal import get_color
 
+if TYPE_CHECKING:
+    import urwid
+
 
 def generate_random_uid() -> str:
     """generate a random uid
@@ -86,6 +88,18 @@ def find_unmatched_sgr(string: str) -> Optional[str]:
         return None
 
 
+# whitespace textwrap replaces with spaces
+wrap_whitespace = re.compile('[\t\n\x0b\x0c\r]')
+
+
+def _fits(text: str, width: int) -> bool:
+    """check if `color_wrap` would return `text` unchanged (as the only line)"""
+    return (0 < len(text) <= width and
+            not text[-1].isspace() and
+            wrap_whitespace.search(text) is None and
+            ('\x1b' not in text or text.endswith(RESET)))
+
+
 def color_wrap(text: str, width: int = 70) -> list[str]:
     """A variant of wrap that takes SGR codes (somewhat) into account.
 
@@ -93,6 +107,9 @@ def color_wrap(text: str, width: int = 70) -> list[str]:
     lines that enable some attribues also contain a RESET, and also adds
     that code to the next line
     """
+    # most lines fit, no need to wrap them or look for SGR codes
+    if _fits(text, width):
+        return [text]
     # TODO we really want to ignore all SGR codes when measuring the width
     lines = wrap(text, width)
     for num, _ in enumerate(lines):
@@ -182,12 +199,43 @@ def relative_timedelta_str(day: dt.date) -> str:
     return f'{approx}{count} {unit} {direction}'
 
 
-def get_wrapped_text(widget: urwid.AttrMap) -> str:
+def get_wrapped_text(widget: 'urwid.AttrMap') -> str:
     return widget.original_widget.get_edit_text()
 
 
+def compile_format(format_string: str) -> Callable[[dict], str]:
+    """return a function that formats a dict with `format_string`, like
+    `format_string.format(**row)`, but only parsing `format_string` once
+    """
+    parts = []
+    for literal, name, spec, conversion in string.Formatter().parse(format_string):
+        spec = spec or ''
+        if name is not None and (
+                not name or '.' in name or '[' in name or '{' in spec or
+                conversion not in (None, 's')):
+            # too complicated for us, leave it to str.format
+            return format_string.format_map
+        parts.append((literal, name, spec, conversion))
+
+    def render(row: dict) -> str:
+        out = []
+        for literal, name, spec, conversion in parts:
+            out.append(literal)
+            if name is not None:
+                value = row[name]
+                if conversion == 's':
+                    value = str(value)
+                out.append(value if not spec and type(value) is str else format(value, spec))
+        return ''.join(out)
+    return render
+
+
 def human_formatter(format_string, width=None, colors=True):
     """Create a formatter that formats events to be human readable."""
+    render = compile_format(format_string)
+    reset = style('', reset=True)
+    calendar_colors: dict[str, str] = {}
+
     def fmt(rows):
         single = isinstance(rows, dict)
         if single:
@@ -195,12 +243,15 @@ def human_formatter(format_string, width=None, colors=True):
         results = []
         for row in rows:
             if 'calendar-color' in row:
-                row['calendar-color'] = get_color(row['calendar-color'])
+                color = row['calendar-color']
+                if color not in calendar_colors:
+                    calendar_colors[color] = get_color(color)
+                row['calendar-color'] = calendar_colors[color]
 
-            s = format_string.format(**row)
+            s = render(row)
 
             if colors:
-                s += style('', reset=True)
+                s += reset
 
             if width:
                 results += color_wrap(s, width)
@@ -224,8 +275,18 @@ CONTENT_ATTRIBUTES = ['start', 'start-long', 'start-date', 'start-date-long',
                       'uid', 'url', 'calendar', 'calendar-color', 'status', 'cancelled']
 
 
-def json_formatter(fields):
-    """Create a formatter that formats events in JSON."""
+def format_fields(format_string: str) -> set[str]:
+    """return the names of all fields used in `format_string`"""
+    return {re.split(r'[.\[]', name)[0]
+            for _, name, _, _ in string.Formatter().parse(format_string) if name}
+
+
+def json_formatter(fields, ndjson: bool = False):
+    """Create a formatter that formats events in JSON.
+
+    :param ndjson: format each event as a JSON object on its own line,
+        instead of all events as one JSON array
+    """
 
     if len(fields) == 1 and fields[0] == 'all':
         fields = CONTENT_ATTRIBUTES
@@ -248,7 +309,10 @@ def json_formatter(fields):
 
             filtered.append(f)
 
-        results = [json.dumps(filtered, ensure_ascii=False)]
+        if ndjson:
+            results = [json.dumps(f, ensure_ascii=False) for f in filtered]
+        else:
+            results = [json.dumps(filtered, ensure_ascii=False)]
 
         if single:
             return results[0]
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""Measure the memory taken by the events of several years of days.
+
+Fills a temporary vdir with single and weekly recurring events, loads every
+day with `CalendarCollection.get_events_on` and keeps the events alive (as
+ikhal does), then prints how much the RSS grew and how long it took.
+
+Run it on two checkouts of khal to compare them, e.g.:
+
+    python misc/benchmark_events_memory.py --years 5
+"""
+
+import argparse
+import datetime as dt
+import gc
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import pytz
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from khal.khalendar import CalendarCollection  # noqa: E402
+
+BERLIN = pytz.timezone('Europe/Berlin')
+
+LOCALE = {
+    'default_timezone': BERLIN,
+    'local_timezone': BERLIN,
+    'dateformat': '%d.%m.',
+    'longdateformat': '%d.%m.%Y',
+    'timeformat': '%H:%M',
+    'datetimeformat': '%d.%m. %H:%M',
+    'longdatetimeformat': '%d.%m.%Y %H:%M',
+    'unicode_symbols': True,
+    'firstweekday': 0,
+    'weeknumbers': False,
+}
+
+EVENT = '''BEGIN:VCALENDAR
+VERSION:2.0
+PRODID:-//khal//benchmark//EN
+BEGIN:VEVENT
+UID:event{num}
+SUMMARY:Event {num}
+DESCRIPTION:Description of event {num}
+LOCATION:Room {num}
+DTSTART;TZID=Europe/Berlin:{start:%Y%m%dT%H%M%S}
+DTEND;TZID=Europe/Berlin:{end:%Y%m%dT%H%M%S}
+DTSTAMP:20140401T234817Z
+{rrule}END:VEVENT
+END:VCALENDAR
+'''
+
+
+def rss() -> int:
+    """the current resident set size in bytes"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # only the maximum is available, which is good enough here
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def write_vdir(path: str, items: int, start: dt.date, days: int) -> None:
+    """every tenth item is a weekly event recurring 20 times"""
+    for num in range(items):
+        day = start + dt.timedelta(days=num * days // items)
+        begin = dt.datetime.combine(day, dt.time(8 + num % 10))
+        rrule = 'RRULE:FREQ=WEEKLY;COUNT=20\n' if num % 10 == 0 else ''
+        with open(os.path.join(path, f'event{num}.ics'), 'w') as item:
+            item.write(EVENT.format(
+                num=num, start=begin, end=begin + dt.timedelta(hours=1), rrule=rrule))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--items', type=int, default=3000)
+    args = parser.parse_args()
+
+    start = dt.date(2020, 1, 1)
+    days = 365 * args.years
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, 'calendar')
+        os.mkdir(path)
+        write_vdir(path, args.items, start, days)
+        calendars = {'calendar': {
+            'name': 'calendar', 'path': path, 'color': '', 'readonly': False,
+            'unicode_symbols': True, 'addresses': '', 'priority': 10, 'ctype': 'calendar',
+        }}
+        collection = CalendarCollection(
+            calendars, locale=LOCALE, dbpath=os.path.join(tmpdir, 'khal.db'))
+
+        gc.collect()
+        before = rss()
+        begin = time.perf_counter()
+        loaded = [list(collection.get_events_on(start + dt.timedelta(days=day)))
+                  for day in range(days)]
+        duration = time.perf_counter() - begin
+        gc.collect()
+        grown = rss() - before
+
+    events = sum(len(day) for day in loaded)
+    print(f'{events} events from {args.items} items on {days} days')
+    print(f'RSS grew by {grown / 2 ** 20:.1f} MiB in {duration:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
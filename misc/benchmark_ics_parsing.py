@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Compare parsing ics files with `cal_from_ics` and with icalendar alone.
+
+`cal_from_ics` first tries khal's parser for simple ics files and falls back
+to `icalendar.Calendar.from_ical`. Prints the time each takes to parse every
+file `--number` times, by default for the files in tests/ics, e.g.:
+
+    python misc/benchmark_ics_parsing.py tests/ics/event_d.ics
+"""
+
+import argparse
+import glob
+import os
+import sys
+import timeit
+
+import icalendar
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from khal.icalendar import _cal_from_simple_ics, cal_from_ics  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--number', type=int, default=3000)
+    args = parser.parse_args()
+
+    files = args.files or sorted(glob.glob(os.path.join(ROOT, 'tests', 'ics', '*.ics')))
+    total_khal = total_icalendar = 0.0
+    print(f'{"file":50} {"khal":>7} {"icalendar":>7}')
+    for path in files:
+        with open(path) as f:
+            ics = f.read()
+        try:
+            icalendar.Calendar.from_ical(ics)
+        except ValueError as error:
+            print(f'{os.path.basename(path):50} skipped, icalendar cannot parse it: {error}')
+            continue
+        fast = _cal_from_simple_ics(ics) is not None
+        khal_time = timeit.timeit(lambda ics=ics: cal_from_ics(ics), number=args.number)
+        icalendar_time = timeit.timeit(
+            lambda ics=ics: icalendar.Calendar.from_ical(ics), number=args.number)
+        total_khal += khal_time
+        total_icalendar += icalendar_time
+        print(f'{os.path.basename(path):50} {khal_time:6.2f}s {icalendar_time:6.2f}s '
+              f'{icalendar_time / khal_time:4.1f}x{"" if fast else " (fallback)"}')
+    print(f'{"total":50} {total_khal:6.2f}s {total_icalendar:6.2f}s '
+          f'{total_icalendar / total_khal:4.1f}x')
+
+
+if __name__ == '__main__':
+    main()
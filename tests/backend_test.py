@@ -3,7 +3,9 @@ from operator import itemgetter
 
 import icalendar
 import pytest
+from freezegun import freeze_time
 
+from khal import utils
 from khal.khalendar import backend
 from khal.khalendar.exceptions import OutdatedDbVersionError, UpdateFailed
 
@@ -12,13 +14,47 @@ from .utils import BERLIN, LOCALE_BERLIN, _get_text
 calname = 'home'
 
 
-def test_new_db_version():
+def test_new_db_version(monkeypatch):
     dbi = backend.SQLiteDb(calname, ':memory:', locale=LOCALE_BERLIN)
-    backend.DB_VERSION += 1
+    monkeypatch.setattr(backend, 'DB_VERSION', backend.DB_VERSION - 1)
     with pytest.raises(OutdatedDbVersionError):
         dbi._check_table_version()
 
 
+def test_old_db_version(tmpdir):
+    """databases created by an older khal get rebuilt"""
+    db_path = str(tmpdir.join('khal.db'))
+    dbi = backend.SQLiteDb([calname], db_path, locale=LOCALE_BERLIN)
+    dbi.update(_get_text('event_dt_simple'), href='12345.ics', etag='abcd', calendar=calname)
+    dbi.set_ctag('some_ctag', calendar=calname)
+    dbi.sql_ex('UPDATE version SET version = ?', (backend.DB_VERSION - 1, ))
+    dbi.conn.close()
+
+    dbi = backend.SQLiteDb([calname], db_path, locale=LOCALE_BERLIN)
+    assert dbi.sql_ex('SELECT version FROM version', ()) == [(backend.DB_VERSION, )]
+    assert dbi.list(calname) == []
+    assert dbi.get_ctag(calname) is None
+
+
+def test_long_event_short_range():
+    """events which started long before the queried range are found"""
+    dbi = backend.SQLiteDb([calname], ':memory:', locale=LOCALE_BERLIN)
+    dbi.update(_get_text('event_dt_long'), href='12345.ics', etag='abcd', calendar=calname)
+    events = list(dbi.get_floating(
+        dt.datetime(2014, 4, 11, 0, 0), dt.datetime(2014, 4, 11, 1, 0)))
+    assert len(events) == 1
+    assert dbi.sql_ex('SELECT span FROM recs_float', ()) == [
+        (backend.span_bucket(3 * 24 * 3600 + 3600), )]
+
+
+def test_span_bucket():
+    assert backend.span_bucket(0) == 0
+    assert backend.span_bucket(-3600) == 0
+    assert backend.span_bucket(1) == 1
+    assert backend.span_bucket(3600) == 12
+    assert 3600 < 2 ** backend.span_bucket(3600)
+
+
 def test_event_rrule_recurrence_id():
     dbi = backend.SQLiteDb([calname], ':memory:', locale=LOCALE_BERLIN)
     assert dbi.list(calname) == []
@@ -173,7 +209,7 @@ def test_event_recuid_rrule_no_master():
     assert events[0][3] == dt.datetime(2014, 6, 30, 12, 0)
     assert events[1][2] == dt.datetime(2014, 7, 7, 8, 30)
     assert events[1][3] == dt.datetime(2014, 7, 7, 12, 0)
-    events = dbi.search('VEVENT')
+    events = dbi.search('Arbeit')
     assert len(list(events)) == 2
 
 
@@ -790,3 +826,197 @@ def test_birthday_v3():
             dt.datetime(2016, 3, 11, 0, 0),
             dt.datetime(2016, 3, 11, 23, 59, 59, 999)))
     assert 'SUMMARY:Unix\'s birthday' in events[0][0]
+
+
+event_rrule_open = """BEGIN:VCALENDAR
+BEGIN:VEVENT
+UID:daily_standup
+SUMMARY:Standup
+DTSTART;TZID=Europe/Berlin:20140101T090000
+DTEND;TZID=Europe/Berlin:20140101T091500
+RRULE:FREQ=DAILY
+EXDATE;TZID=Europe/Berlin:20140102T090000
+EXDATE;TZID=Europe/Berlin:20140702T090000
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+def _count_instances(dbi):
+    return dbi.sql_ex('SELECT count(*) FROM recs_loc', ())[0][0]
+
+
+@freeze_time('2014-07-01 12:00')
+def test_recurrence_window():
+    dbi = backend.SQLiteDb(
+        [calname], ':memory:', locale=LOCALE_BERLIN, recurrence_window=dt.timedelta(days=10))
+    dbi.update(event_rrule_open, href='12345.ics', etag='abcd', calendar=calname)
+    # the first instance, 22 days in the window (+/- one day), minus one EXDATE
+    assert _count_instances(dbi) == 1 + 22 - 1
+
+    events = list(dbi.get_localized(
+        BERLIN.localize(dt.datetime(2014, 7, 1, 0, 0)),
+        BERLIN.localize(dt.datetime(2014, 7, 3, 0, 0)),
+    ))
+    assert len(events) == 1
+    assert _count_instances(dbi) == 1 + 22 - 1
+
+    # asking for dates outside of the window extends it
+    events = list(dbi.get_localized(
+        BERLIN.localize(dt.datetime(2014, 9, 1, 0, 0)),
+        BERLIN.localize(dt.datetime(2014, 9, 3, 0, 0)),
+    ))
+    assert len(events) == 2
+    assert events[0][2] == BERLIN.localize(dt.datetime(2014, 9, 1, 9, 0))
+    window_start, window_end = dbi._windows[calname]
+    assert window_end >= utils.to_unix_time(BERLIN.localize(dt.datetime(2014, 9, 3)))
+    assert dbi.sql_ex(
+        'SELECT window_start, window_end FROM calendars WHERE calendar = ?',
+        (calname, )) == [(window_start, window_end)]
+    assert list(dbi.sql_ex('SELECT windowed FROM events', ())) == [(1, )]
+
+
+@freeze_time('2014-07-01 12:00')
+def test_recurrence_window_disabled(tmpdir):
+    """all instances get expanded once the window is disabled"""
+    db_path = str(tmpdir.join('khal.db'))
+    dbi = backend.SQLiteDb(
+        [calname], db_path, locale=LOCALE_BERLIN, recurrence_window=dt.timedelta(days=10))
+    dbi.update(event_rrule_open, href='12345.ics', etag='abcd', calendar=calname)
+    windowed_instances = _count_instances(dbi)
+    dbi.conn.close()
+
+    dbi = backend.SQLiteDb([calname], db_path, locale=LOCALE_BERLIN)
+    assert _count_instances(dbi) > windowed_instances
+    assert dbi._windows[calname] is None
+    assert list(dbi.sql_ex('SELECT windowed FROM events', ())) == [(0, )]
+    events = list(dbi.get_localized(
+        BERLIN.localize(dt.datetime(2020, 9, 1, 0, 0)),
+        BERLIN.localize(dt.datetime(2020, 9, 3, 0, 0)),
+    ))
+    assert len(events) == 2
+
+
+event_rrule_week_long = """BEGIN:VCALENDAR
+BEGIN:VEVENT
+UID:weeklong
+SUMMARY:Workweek
+DTSTART;VALUE=DATE:20240101
+DTEND;VALUE=DATE:20240106
+RRULE:FREQ=WEEKLY
+END:VEVENT
+END:VCALENDAR
+"""
+
+
+@freeze_time('2024-05-31 00:00')
+def test_recurrence_window_long_instances():
+    """instances starting before the window but lasting into it are expanded"""
+    dbi = backend.SQLiteDb(
+        [calname], ':memory:', locale=LOCALE_BERLIN, recurrence_window=dt.timedelta(days=30))
+    dbi.update(event_rrule_week_long, href='weeklong.ics', etag='abcd', calendar=calname)
+    # the window starts on Wednesday, 2024-05-01, the instance on Monday
+    events = list(dbi.get_floating(dt.datetime(2024, 5, 2), dt.datetime(2024, 5, 3)))
+    assert len(events) == 1
+    assert events[0][2:4] == (dt.date(2024, 4, 29), dt.date(2024, 5, 4))
+
+
+def test_diff_etags():
+    dbi = backend.SQLiteDb([calname], ':memory:', locale=LOCALE_BERLIN)
+    dbi.update(_get_text('event_dt_simple'), href='one.ics', etag='1', calendar=calname)
+    dbi.update(_get_text('event_d'), href='two.ics', etag='2', calendar=calname)
+    dbi.update(_get_text('event_dt_long'), href='three.ics', etag='3', calendar=calname)
+    added, changed, removed = dbi.diff_etags(
+        {'one.ics': '1', 'two.ics': '2b', 'four.ics': '4'}, calname)
+    assert added == {'four.ics'}
+    assert changed == {'two.ics'}
+    assert removed == {'three.ics'}
+
+
+def test_diff_etags_vcf():
+    dbi = backend.SQLiteDb([calname], ':memory:', locale=LOCALE_BERLIN)
+    dbi.update_vcf_dates(card, 'unix.vcf', etag='1', calendar=calname)
+    assert dbi.diff_etags({'unix.vcf': '1'}, calname) == (
+        {'unix.vcf'}, set(), {'unix.vcfBDAY'})
+    assert dbi.diff_etags({'unix.vcf': '1'}, calname, lambda href: href[:8]) == (
+        set(), set(), set())
+    assert dbi.diff_etags({}, calname, lambda href: href[:8]) == (
+        set(), set(), {'unix.vcfBDAY'})
+
+
+@pytest.mark.parametrize('fts', [True, False])
+def test_search(fts):
+    dbi = backend.SQLiteDb([calname], ':memory:', locale=LOCALE_BERLIN)
+    dbi._fts = dbi._fts and fts
+    dbi.update(_get_text('event_dt_partstat'), href='one.ics', etag='1', calendar=calname)
+    dbi.update(_get_text('event_rrule_recuid'), href='two.ics', etag='2', calendar=calname)
+    dbi.update_vcf_dates(card, 'unix.vcf', etag='3', calendar=calname)
+    assert [href for _, href, *_ in dbi.search('jqpublic')] == ['one.ics']
+    assert [href for _, href, *_ in dbi.search('Jane Doe')] == ['one.ics']
+    assert [href for _, href, *_ in dbi.search('birthday')] == ['unix.vcfBDAY']
+    # property names, UIDs and dates are not searched
+    assert list(dbi.search('VEVENT')) == []
+    assert list(dbi.search('V042MJ8B3SJNFXQOJL6P53OFMHJE8Z3VZWOU')) == []
+    assert list(dbi.search('2014')) == []
+    # the master event and the overwritten instance are found, once each
+    events = list(dbi.search('Arbeit'))
+    assert [(href, start, ref) for _, href, start, _, ref, *_ in events] == [
+        ('two.ics', BERLIN.localize(dt.datetime(2014, 6, 30, 7, 0)), backend.PROTO),
+        ('two.ics', BERLIN.localize(dt.datetime(2014, 7, 7, 9, 0)), '1404709200'),
+    ]
+    # too short for the trigram index
+    assert [href for _, href, *_ in dbi.search('Ar')] == ['two.ics', 'two.ics']
+
+    dbi.update(_get_text('event_dt_simple_nocat'), href='one.ics', etag='4', calendar=calname)
+    assert list(dbi.search('jqpublic')) == []
+    assert [href for _, href, *_ in dbi.search('anywhere')] == ['one.ics']
+    dbi.delete('one.ics', calendar=calname)
+    dbi.deletelike('unix.vcf%', calendar=calname)
+    assert list(dbi.search('anywhere')) == []
+    assert list(dbi.search('birthday')) == []
+
+
+def test_search_ranked():
+    dbi = backend.SQLiteDb([calname], ':memory:', locale=LOCALE_BERLIN)
+    if not dbi._fts:
+        pytest.skip('sqlite3 has no FTS5 support')
+    dbi.update(_get_text('event_dt_simple_nocat'), href='one.ics', etag='1', calendar=calname)
+    dbi.update(_get_text('event_dt_simple'), href='two.ics', etag='2', calendar=calname)
+    # the shorter text matches better
+    assert [href for _, href, *_ in dbi.search('Event')] == ['two.ics', 'one.ics']
+
+
+def test_search_index_added(tmpdir):
+    """the index is filled with the events already in the db"""
+    db_path = str(tmpdir.join('khal.db'))
+    dbi = backend.SQLiteDb([calname], db_path, locale=LOCALE_BERLIN)
+    if not dbi._fts:
+        pytest.skip('sqlite3 has no FTS5 support')
+    dbi.update(_get_text('event_dt_simple'), href='one.ics', etag='1', calendar=calname)
+    for sql in ['DROP TRIGGER vevents_insert', 'DROP TRIGGER vevents_delete',
+                'DROP TABLE search_fts']:
+        dbi.sql_ex(sql, ())
+    dbi.conn.close()
+
+    dbi = backend.SQLiteDb([calname], db_path, locale=LOCALE_BERLIN)
+    assert dbi._fts
+    assert [href for _, href, *_ in dbi.search('Event')] == ['one.ics']
+
+
+def test_search_index_unusable(tmpdir):
+    """with an sqlite that cannot use the index, changing events still works"""
+    db_path = str(tmpdir.join('khal.db'))
+    dbi = backend.SQLiteDb([calname], db_path, locale=LOCALE_BERLIN)
+    if not dbi._fts:
+        pytest.skip('sqlite3 has no FTS5 support')
+    dbi.update(_get_text('event_dt_simple'), href='one.ics', etag='1', calendar=calname)
+    dbi.conn.execute('PRAGMA writable_schema = ON')
+    dbi.sql_ex("UPDATE sqlite_master SET sql = replace(sql, 'USING fts5', 'USING nofts5') "
+               "WHERE name = 'search_fts'", ())
+    dbi.conn.close()
+
+    dbi = backend.SQLiteDb([calname], db_path, locale=LOCALE_BERLIN)
+    assert not dbi._fts
+    dbi.update(_get_text('event_dt_simple_nocat'), href='two.ics', etag='2', calendar=calname)
+    dbi.delete('one.ics', calendar=calname)
+    assert [href for _, href, *_ in dbi.search('Event')] == ['two.ics']
@@ -2,13 +2,16 @@ import datetime as dt
 import json
 import os
 import re
+import subprocess
 import sys
 import traceback
 
+import click
 import pytest
 from click.testing import CliRunner
 from freezegun import freeze_time
 
+import khal.plugins
 from khal.cli import main_ikhal, main_khal
 from khal.utils import CONTENT_ATTRIBUTES
 
@@ -475,6 +478,23 @@ def test_list_json(runner):
     assert result.output.startswith(expected)
 
 
+def test_list_ndjson(runner):
+    runner = runner(days=2)
+    now = dt.datetime.now().strftime('%d.%m.%Y')
+    for time in ['18:00', '20:00']:
+        result = runner.invoke(main_khal, f'new {now} {time} myevent'.split())
+    args = ['list', '--ndjson', '--json', 'start-end-time-style', '--json', 'title', 'today']
+    result = runner.invoke(main_khal, args)
+    assert not result.exception
+    assert result.output == (
+        '{"start-end-time-style": "18:00-19:00", "title": "myevent"}\n'
+        '{"start-end-time-style": "20:00-21:00", "title": "myevent"}\n'
+    )
+
+    result = runner.invoke(main_khal, ['at', '--ndjson', '18:30'])
+    assert not result.exception
+    assert json.loads(result.output).keys() == set(CONTENT_ATTRIBUTES)
+
 def test_search(runner):
     runner = runner(days=2)
     now = dt.datetime.now().strftime('%d.%m.%Y')
@@ -495,6 +515,17 @@ def test_search_json(runner):
     assert result.output.startswith('[{"start-end-time-style": "18:00')
 
 
+def test_search_ndjson(runner):
+    runner = runner(days=2)
+    now = dt.datetime.now().strftime('%d.%m.%Y')
+    result = runner.invoke(
+        main_khal, ['new', now, '18:00', 'myevent', '::', 'a long description ' * 10])
+    result = runner.invoke(main_khal, ['--color', 'search', '--ndjson', '--json', 'title',
+                                       '--json', 'description', 'myevent'])
+    assert not result.exception
+    assert json.loads(result.output) == {
+        'title': 'myevent', 'description': ('a long description ' * 10).strip()}
+
 def test_no_default_new(runner):
     runner = runner(default_calendar=False)
     result = runner.invoke(main_khal, 'new 18:00 beer'.split())
@@ -603,6 +634,15 @@ def test_import_from_stdin(runner, monkeypatch):
     assert importer.kwargs['ics'] == ics_data
 
 
+def test_import_batch_from_stdin(runner):
+    runner = runner()
+    result = runner.invoke(
+        main_khal, ['import', '--batch', '-a', 'one'], input=_get_text('cal_d'))
+    assert not result.exception
+    result = runner.invoke(main_khal, ['search', 'Event'])
+    assert result.output == '09.04.-09.04. An Event\n'
+
+
 def test_interactive_command(runner, monkeypatch):
     runner = runner(days=2)
     token = "hooray"
@@ -1022,3 +1062,71 @@ def test_list_now(runner, tmpdir):
 
     result = runner.invoke(main_khal, ['list', 'now'])
     assert not result.exception
+
+
+# what importing khal may cost `khal list` and `khal at` (in microseconds, as
+# reported by `python -X importtime`), about four times what it takes on a
+# current laptop
+IMPORT_BUDGET = 1_000_000
+
+
+@pytest.mark.parametrize('args', [['list', '09.04.2014', '1d'], ['at', '09.04.2014', '10:00']])
+def test_import_time(runner, args, monkeypatch):
+    runner = runner()
+    monkeypatch.setenv('XDG_CACHE_HOME', str(runner.xdg_cache_home))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-m', 'khal', '-c', str(runner.config_file), *args],
+        capture_output=True, text=True,
+    )
+    assert result.returncode == 0, result.stderr
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # only count top level imports, nested ones are part of those
+        if not name[1:].startswith(' '):
+            modules[name.strip()] = int(cumulative)
+        else:
+            modules.setdefault(name.strip(), 0)
+    # only needed by ikhal, khal configure and khal daemon
+    for module in ['urwid', 'khal.ui', 'khal.configwizard', 'socketserver']:
+        assert module not in modules
+    khal_time = sum(time for name, time in modules.items() if name.split('.')[0] == 'khal')
+    assert khal_time < IMPORT_BUDGET
+
+
+@pytest.mark.parametrize('args', [['list'], ['at']])
+def test_no_plugin_lookup(runner, args, monkeypatch):
+    """looking for plugins is slow, built-in commands should not need to"""
+    runner = runner()
+    scanned = []
+    monkeypatch.setattr(
+        'khal.plugins.importlib_metadata.entry_points',
+        lambda group: scanned.append(group) or [],
+    )
+    for plugins in [khal.plugins.COMMANDS, khal.plugins.FORMATTERS, khal.plugins.THEMES]:
+        monkeypatch.setattr(plugins, '_loaded', None)
+    result = runner.invoke(main_khal, ['-v', 'DEBUG', *args])
+    assert not result.exception, result.output
+    assert scanned == []
+
+
+def test_plugin_commands(runner, monkeypatch):
+    """plugins can add commands, but not replace built-in ones"""
+    runner = runner()
+
+    @click.command()
+    def plugin():
+        click.echo('plugin')
+
+    monkeypatch.setattr(khal.plugins.COMMANDS, '_loaded', {'hello': plugin, 'list': plugin})
+    result = runner.invoke(main_khal, ['hello'])
+    assert not result.exception, result.output
+    assert result.output == 'plugin\n'
+    result = runner.invoke(main_khal, ['list'])
+    assert not result.exception, result.output
+    assert result.output == ''
+    result = runner.invoke(main_khal, ['--help'])
+    assert result.output.count('  list ') == 1
+    assert '  hello' in result.output
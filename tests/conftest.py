@@ -151,3 +151,10 @@ def fix_caplog(monkeypatch):
     logger = logging.getLogger('khal')
     monkeypatch.setattr(logger, 'handlers', [])
     monkeypatch.setattr(logger, 'propagate', True)
+
+
+@pytest.fixture(autouse=True)
+def no_khal_daemon(tmpdir, monkeypatch):
+    """make sure commands are not answered by a khal daemon running outside
+    the tests"""
+    monkeypatch.setenv('KHAL_DAEMON_SOCKET', str(tmpdir.join('daemon.sock')))
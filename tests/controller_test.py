@@ -5,7 +5,7 @@ import pytest
 from freezegun import freeze_time
 
 from khal import exceptions
-from khal.controllers import import_ics, khal_list, start_end_from_daterange
+from khal.controllers import import_ics, khal_list, khal_list_iter, start_end_from_daterange
 from khal.khalendar.vdir import Item
 
 from . import utils
@@ -91,6 +91,25 @@ class TestGetAgenda:
         assert '\n'.join(khal_list(coll, [], conf,
                          agenda_format=event_format, day_format="{name}")).lower() == ''
 
+    def test_list_iter(self, coll_vdirs, monkeypatch):
+        """the first days are printed before the later ones are fetched"""
+        coll, vdirs = coll_vdirs
+        coll.insert(coll.create_event_from_ics(event_today, utils.cal1))
+        batches = []
+        get_events_in_ranges = coll.get_events_in_ranges
+
+        def get_events(ranges, light):
+            batches.append(len(ranges))
+            return get_events_in_ranges(ranges, light=light)
+        monkeypatch.setattr(coll, 'get_events_in_ranges', get_events)
+
+        lines = khal_list_iter(coll, ['today', '100d'], conf, agenda_format=event_format,
+                               day_format="{name}")
+        assert next(lines) == 'Today\x1b[0m'
+        assert batches == [1]
+        assert list(lines) == ['                 a meeting :: short description\x1b[0m']
+        assert batches == [1, 2, 4, 8, 16, 32, 32, 5]
+
 
 class TestImport:
     def test_import(self, coll_vdirs):
@@ -0,0 +1,144 @@
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from khal import daemon
+from khal.exceptions import FatalError
+
+from .utils import _get_text
+
+config_template = '''
+[calendars]
+[[one]]
+path = {calpath}
+
+[locale]
+local_timezone = Europe/Berlin
+default_timezone = Europe/Berlin
+timeformat = %H:%M
+dateformat = %d.%m.
+longdateformat = %d.%m.%Y
+datetimeformat = %d.%m. %H:%M
+longdatetimeformat = %d.%m.%Y %H:%M
+
+[sqlite]
+path = {dbpath}
+'''
+
+
+@pytest.fixture
+def config(tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.join('cache')))
+    calendar = tmpdir.mkdir('calendar')
+    config = tmpdir.join('config')
+    config.write(config_template.format(
+        calpath=str(calendar), dbpath=str(tmpdir.join('khal.db'))))
+    return config
+
+
+def khal(config, *args):
+    return subprocess.run(
+        [sys.executable, '-m', 'khal', '-c', str(config), *args],
+        capture_output=True, text=True, env=os.environ.copy(),
+    )
+
+
+def start_daemon(config, log):
+    with open(str(log), 'w') as logfile:
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'khal', '-c', str(config), '-v', 'INFO', 'daemon'],
+            stderr=logfile, env=os.environ.copy(),
+        )
+    for _ in range(200):
+        if 'listening' in log.read():
+            break
+        assert process.poll() is None, log.read()
+        time.sleep(0.05)
+    return process
+
+
+@pytest.fixture
+def khal_daemon(config, tmpdir):
+    log = tmpdir.join('daemon.log')
+    process = start_daemon(config, log)
+    yield log
+    process.terminate()
+    process.wait(10)
+
+
+def test_forward_without_daemon(config):
+    assert not os.path.exists(daemon.socket_path())
+    assert daemon.forward(['list'], str(config), False, 'WARNING') is None
+
+
+def test_list_in_daemon(config, khal_daemon):
+    calendar = config.dirpath('calendar')
+    calendar.join('event.ics').write(_get_text('event_dt_simple'))
+    args = ['list', '--format', '{start-end-time-style}: {title}', '09.04.2014', '1d']
+
+    result = khal(config, *args)
+    assert result.returncode == 0
+    assert result.stdout == 'Wednesday, 09.04.2014\n09:30-10:30: An Event\n'
+    assert 'running khal list' in khal_daemon.read()
+
+    # changes to the calendars show up
+    os.remove(str(calendar.join('event.ics')))
+    result = khal(config, *args)
+    assert result.returncode == 0
+    assert result.stdout == ''
+
+    # exit codes and error messages are forwarded
+    result = khal(config, 'list', 'not a date')
+    assert result.returncode == 1
+    assert 'Could not parse' in result.stderr
+    assert result.stdout == ''
+
+
+def test_daemon_with_other_config(config, khal_daemon, tmpdir):
+    other = tmpdir.join('other_config')
+    other.write(config.read())
+    result = khal(other, 'list')
+    assert result.returncode == 0
+    assert 'running' not in khal_daemon.read()
+
+
+def test_only_one_daemon(config, khal_daemon):
+    assert os.path.exists(daemon.socket_path())
+    result = khal(config, 'daemon')
+    assert result.returncode == 1
+    assert 'Another khal daemon' in result.stderr
+
+
+def test_daemon_removes_socket(config, tmpdir):
+    process = start_daemon(config, tmpdir.join('daemon.log'))
+    assert os.path.exists(daemon.socket_path())
+    process.terminate()
+    assert process.wait(10) == 0
+    assert not os.path.exists(daemon.socket_path())
+
+
+@pytest.fixture
+def default_socket(tmpdir, monkeypatch):
+    """the default socket path in a directory accessible to others"""
+    monkeypatch.delenv('KHAL_DAEMON_SOCKET')
+    monkeypatch.setenv('XDG_RUNTIME_DIR', str(tmpdir))
+    tmpdir.mkdir('khal').chmod(0o755)
+    return daemon.socket_path()
+
+
+def test_forward_checks_socket_dir(config, default_socket, fix_caplog, caplog):
+    assert default_socket == str(config.dirpath('khal', 'daemon.sock'))
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.bind(default_socket)
+        assert daemon.forward(['list'], str(config), False, 'WARNING') is None
+    assert 'must be a directory owned by and only accessible to you' in caplog.text
+
+
+def test_serve_checks_socket_dir(config, default_socket):
+    with pytest.raises(FatalError, match='only accessible to you'):
+        daemon.Daemon(str(config)).serve(default_socket)
+    assert not os.path.exists(default_socket)
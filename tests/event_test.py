@@ -650,6 +650,19 @@ def test_sort_event_summary():
     assert event1 < event2
 
 
+def test_sort_key_reset_on_change():
+    event = Event.fromString(_get_text('event_dt_simple'), **EVENT_KWARGS)
+    assert event.sort_key == (
+        dt.datetime(2014, 4, 9, 9, 30), dt.datetime(2014, 4, 9, 10, 30), 'An Event')
+    event.update_summary('ZZZ')
+    start = BERLIN.localize(dt.datetime(2014, 4, 10, 9, 30))
+    end = BERLIN.localize(dt.datetime(2014, 4, 10, 10, 30))
+    assert event.sort_key[2] == 'ZZZ'
+    event.update_start_end(start, end)
+    assert event.sort_key == (
+        dt.datetime(2014, 4, 10, 9, 30), dt.datetime(2014, 4, 10, 10, 30), 'ZZZ')
+
+
 def test_create_timezone_in_future():
     """Events too far into the future (after the next DST transition) used
     to be created with invalid timezones"""
@@ -732,3 +745,22 @@ def test_partstat_deligated():
     event = Event.fromString(
         _get_text('event_dt_partstat'), addresses=['iamboss@example.com'], **EVENT_KWARGS)
     assert event.partstat == 'ACCEPTED'
+
+
+@pytest.mark.parametrize('name', [
+    'event_dt_simple', 'event_d', 'event_d_long', 'event_dt_long', 'event_dt_rr',
+    'event_dt_url',
+])
+@pytest.mark.parametrize('relative_to', [
+    dt.date(2014, 4, 9), (dt.date(2014, 4, 10), dt.date(2014, 4, 10)), dt.date(2014, 4, 12),
+])
+def test_attributes_fields(name, relative_to):
+    """only computing some attributes gives the same values as computing all"""
+    event = Event.fromString(_get_text(name), **EVENT_KWARGS)
+    env = {'calendars': {'foobar': {'color': 'dark blue'}}}
+    attributes = event.attributes(relative_to, env=env)
+    for field in attributes:
+        assert event.attributes(relative_to, env=env, fields=[field])[field] == \
+            attributes[field]
+    assert event.attributes(relative_to, env=env, fields=[]).keys() < attributes.keys()
+    assert 'start-long' not in event.attributes(relative_to, env=env, fields=['start-time'])
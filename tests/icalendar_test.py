@@ -1,11 +1,22 @@
 import datetime as dt
+import io
+import os
 import random
 import textwrap
 
 import icalendar
+import pytest
 from freezegun import freeze_time
 
-from khal.icalendar import new_vevent, split_ics
+from khal.icalendar import (
+    _cal_from_simple_ics,
+    cal_from_ics,
+    iter_split_ics,
+    new_vevent,
+    split_ics,
+    split_ics_by_uid,
+)
+from khal.khalendar.vdir import Item
 
 from .utils import LOCALE_BERLIN, _get_text, _replace_uid, normalize_component
 
@@ -67,6 +78,42 @@ def test_split_ics():
     assert sorted(vevents1) == sorted(part1)
 
 
+def test_split_ics_by_uid():
+    cal = _get_text('cal_lots_of_timezones')
+    split = split_ics_by_uid(cal)
+    assert [ics for _, ics in split] == split_ics(cal)
+    for uid, ics in split:
+        assert Item(ics).uid == uid
+    for uid, ics in split_ics_by_uid(cal, random_uid=True):
+        assert Item(ics).uid == uid
+
+
+class _Pipe(io.BytesIO):
+    def seekable(self):
+        return False
+
+
+@pytest.mark.parametrize('name', [
+    'cal_lots_of_timezones', 'mult_uids_and_recuid_no_order', 'tz_windows_format', 'cal_d',
+])
+def test_iter_split_ics(name):
+    cal = _get_text(name)
+    expected = split_ics_by_uid(cal)
+    assert sorted(iter_split_ics(io.StringIO(cal))) == sorted(expected)
+    assert sorted(iter_split_ics(_Pipe(cal.encode('utf-8')))) == sorted(expected)
+
+
+def test_iter_split_ics_yields_early():
+    cal = _get_text('cal_lots_of_timezones')
+    ics_file = io.StringIO(cal)
+    split = iter_split_ics(ics_file)
+    # `123` is complete before the second VEVENT with UID `abcde` is read
+    uid, _ = next(split)
+    assert uid == '123'
+    assert 'UID:abcde' in cal[ics_file.tell():]
+    assert [uid for uid, _ in split] == ['abcde']
+
+
 def test_split_ics_random_uid():
     random.seed(123)
     cal = _get_text('cal_lots_of_timezones')
@@ -112,3 +159,41 @@ def test_split_ics_without_uid():
     assert vevents
     vevents2 = split_ics(cal)
     assert vevents[0] == vevents2[0]
+
+
+ICS_CORPUS = sorted(
+    name[:-4] for name in os.listdir(os.path.join(os.path.dirname(__file__), 'ics'))
+    if name.endswith('.ics')
+)
+
+
+@pytest.mark.parametrize('name', ICS_CORPUS)
+def test_cal_from_ics_matches_icalendar(name):
+    """the fast path must parse everything exactly like icalendar does"""
+    ics = _get_text(name)
+    try:
+        expected = icalendar.Calendar.from_ical(ics)
+    except ValueError:
+        pytest.skip('not parsable by icalendar without workarounds')
+    cal = cal_from_ics(ics)
+    assert cal == expected
+    assert cal.to_ical() == expected.to_ical()
+    assert [comp.name for comp in cal.walk()] == [comp.name for comp in expected.walk()]
+
+
+def test_cal_from_ics_escaped_values():
+    """lines outside the simple subset are split by icalendar's parser"""
+    ics = _get_text('event_dt_simple').replace(
+        'SUMMARY:An Event', 'SUMMARY;LANGUAGE="en":An Event\\, with a comma')
+    cal = cal_from_ics(ics)
+    assert cal == icalendar.Calendar.from_ical(ics)
+    assert cal.walk('VEVENT')[0]['SUMMARY'] == 'An Event, with a comma'
+    assert cal.walk('VEVENT')[0]['SUMMARY'].params['LANGUAGE'] == 'en'
+
+
+def test_cal_from_ics_fallback():
+    """anything unusual is left to icalendar"""
+    ics = _get_text('event_dt_simple')
+    assert _cal_from_simple_ics(ics) is not None
+    assert _cal_from_simple_ics(ics + ics) is None
+    assert _cal_from_simple_ics(ics.replace('END:VEVENT\n', '')) is None
@@ -1,6 +1,8 @@
 import datetime as dt
+import itertools
 import logging
 import os
+import threading
 from textwrap import dedent
 from time import sleep
 
@@ -8,12 +10,13 @@ import pytest
 from freezegun import freeze_time
 
 import khal.khalendar.exceptions
+import khal.khalendar.khalendar
 import khal.utils
 from khal import icalendar as icalendar_helpers
 from khal.controllers import human_formatter
 from khal.khalendar import CalendarCollection
 from khal.khalendar.backend import CouldNotCreateDbDir
-from khal.khalendar.event import Event
+from khal.khalendar.event import VEVENT_ATTRIBUTES, Event, LightEvent
 from khal.khalendar.vdir import Item
 
 from . import utils
@@ -216,6 +219,34 @@ class TestCollection:
         assert len(list(vdirs[cal3].list())) == 0
         assert list(coll.get_localized(self.bstart_berlin, self.bend_berlin)) == []
 
+    def test_insert_many(self, coll_vdirs, monkeypatch):
+        coll, vdirs = coll_vdirs
+        monkeypatch.setattr(khal.khalendar.khalendar, 'INSERT_MANY_BATCH', 2)
+        items = [
+            Item(event_allday_template.format('20140409', '20140410').replace(
+                'uid3@host1.com', f'uid{num}').replace('a meeting', f'meeting {num}'))
+            for num in range(5)
+        ]
+        progress = []
+        assert coll.insert_many(iter(items), cal1, progress=progress.append) == 5
+        assert progress == [2, 4, 5]
+        assert sorted(event.summary for event in coll.get_events_on(aday)) == \
+            [f'meeting {num}' for num in range(5)]
+        assert dict(vdirs[cal1].list()) == dict(coll._backend.list(cal1))
+        assert not coll._needs_update(cal1)
+
+        updated = Item(items[0].raw.replace('meeting 0', 'updated'))
+        with pytest.raises(khal.khalendar.exceptions.DuplicateUid):
+            coll.insert_many([updated], cal1)
+        assert coll.insert_many([updated], cal1, overwrite=True) == 1
+        assert sorted(event.summary for event in coll.get_events_on(aday)) == \
+            [f'meeting {num}' for num in range(1, 5)] + ['updated']
+        assert len(list(vdirs[cal1].list())) == 5
+
+        coll._calendars[cal2]['readonly'] = True
+        with pytest.raises(khal.khalendar.exceptions.ReadOnlyCalendarError):
+            coll.insert_many(items, cal2)
+
     def test_get(self, coll_vdirs):
         """test getting an event by its href"""
         coll, vdirs = coll_vdirs
@@ -299,21 +330,21 @@ class TestCollection:
         """test searching for recurring events which only have a recuid event,
         and no master"""
         coll, vdirs = coll_vdirs
-        assert len(list(coll.search('Event'))) == 0
+        assert len(list(coll.search('Planning'))) == 0
         event = Event.fromString(
             _get_text('event_dt_recuid_no_master'), calendar=cal1, locale=LOCALE_BERLIN)
         coll.insert(event, cal1)
-        assert len(list(coll.search('Event'))) == 1
+        assert len(list(coll.search('Planning'))) == 1
 
     def test_search_recurrence_id_only_multi(self, coll_vdirs):
         """test searching for recurring events which only have a recuid event,
         and no master"""
         coll, vdirs = coll_vdirs
-        assert len(list(coll.search('Event'))) == 0
+        assert len(list(coll.search('Arbeit'))) == 0
         event = Event.fromString(
             _get_text('event_dt_multi_recuid_no_master'), calendar=cal1, locale=LOCALE_BERLIN)
         coll.insert(event, cal1)
-        events = sorted(coll.search('Event'))
+        events = sorted(coll.search('Arbeit'))
         assert len(events) == 2
         assert human_formatter('{start} {end} {title}')(events[0].attributes(
             dt.date.today())) == '30.06. 07:30 30.06. 12:00 Arbeit\x1b[0m'
@@ -366,6 +397,198 @@ class TestCollection:
         )
         assert 'EXDATE;TZID=Europe/Berlin:20140714T050000,20140721T050000' in event.raw.split()
 
+    def test_event_cache(self, coll_vdirs):
+        """recurring instances of the same event are only parsed once"""
+        coll, _ = coll_vdirs
+        event = Event.fromString(_get_text('event_rrule_recuid'), calendar=cal1,
+                                 locale=LOCALE_BERLIN)
+        coll.insert(event, cal1)
+        start = BERLIN.localize(dt.datetime(2014, 6, 30))
+        end = BERLIN.localize(dt.datetime(2014, 8, 26))
+        hits, misses, _, currsize = coll.cache_info()
+        events = list(coll.get_localized(start, end))
+        assert len(events) == 6
+        assert coll.cache_info().misses == misses + 1
+        assert coll.cache_info().hits == hits + 5
+        assert coll.cache_info().currsize == currsize + 1
+        assert all(ev._vevents is events[0]._vevents for ev in events)
+        assert not hasattr(events[0], '__dict__')
+
+        # changing one instance does not change the others
+        events[0].update_summary('changed')
+        assert [ev.summary for ev in events[1:]] == ['Arbeit'] * 5
+        assert events[0]._vevents is not events[1]._vevents
+        coll.update(events[0])
+        assert coll.cache_info().currsize == currsize
+        summaries = [ev.summary for ev in coll.get_localized(start, end)]
+        assert summaries.count('changed') == 5
+
+    def test_event_cache_size(self, tmpdir):
+        calendars = {cal1: {'name': cal1, 'path': str(tmpdir), 'color': 'dark blue',
+                            'readonly': False, 'unicode_symbols': True, 'addresses': ''}}
+        coll = CalendarCollection(
+            calendars, dbpath=':memory:', locale=LOCALE_BERLIN, event_cache_size=1)
+        for name in ['event_dt_simple', 'event_rrule_recuid']:
+            coll.insert(Event.fromString(_get_text(name), calendar=cal1, locale=LOCALE_BERLIN))
+        for _ in range(2):
+            assert len(list(coll.get_events_on(aday))) == 1
+            assert len(list(coll.get_events_on(dt.date(2014, 7, 7)))) == 1
+        assert coll.cache_info() == (0, 4, 1, 1)
+
+    def test_update_db_parallel(self, tmpdir, monkeypatch):
+        """parsing events in worker processes gives the same db as in one"""
+        monkeypatch.setattr(khal.khalendar.khalendar, 'MIN_PARALLEL_UPDATES', 1)
+        for name in ['event_dt_simple', 'event_rrule_recuid', 'invalid_tzoffset',
+                     'event_rrule_recuid_invalid_tzid']:
+            tmpdir.join(f'{name}.ics').write(_get_text(name))
+        calendars = {cal1: {'name': cal1, 'path': str(tmpdir), 'color': 'dark blue',
+                            'readonly': False, 'unicode_symbols': True, 'addresses': ''}}
+        start = BERLIN.localize(dt.datetime(2014, 1, 1))
+        end = BERLIN.localize(dt.datetime(2015, 1, 1))
+        results = []
+        for workers in [1, 2]:
+            coll = CalendarCollection(
+                calendars, dbpath=':memory:', locale=LOCALE_BERLIN, workers=workers)
+            results.append(sorted(
+                (event.href, event.start, event.summary)
+                for event in coll.get_localized(start, end)))
+        assert results[0] == results[1]
+        assert len(results[1]) == 13
+
+    def test_update_db_threads(self, tmpdir):
+        """scanning vdirs in threads gives the same db as one after the other"""
+        calendars = {}
+        for num, names in enumerate([['event_dt_simple', 'invalid_tzoffset'],
+                                     ['event_rrule_recuid'],
+                                     [],
+                                     ['event_rrule_recuid_invalid_tzid', 'event_d']]):
+            path = tmpdir.mkdir(f'cal{num}')
+            for name in names:
+                path.join(f'{name}.ics').write(_get_text(name))
+            calendars[f'cal{num}'] = {
+                'name': f'cal{num}', 'path': str(path), 'color': 'dark blue',
+                'readonly': False, 'unicode_symbols': True, 'addresses': ''}
+        start = BERLIN.localize(dt.datetime(2014, 1, 1))
+        end = BERLIN.localize(dt.datetime(2015, 1, 1))
+        results = []
+        for threads in [1, 3]:
+            coll = CalendarCollection(
+                calendars, dbpath=':memory:', locale=LOCALE_BERLIN, threads=threads)
+            assert not coll.needs_update()
+            results.append(sorted(
+                (event.calendar, event.href, event.start, event.summary)
+                for event in itertools.chain(
+                    coll.get_localized(start, end),
+                    coll.get_floating(start.replace(tzinfo=None), end.replace(tzinfo=None)))))
+        assert results[0] == results[1]
+        assert {calendar for calendar, *_ in results[1]} == {'cal0', 'cal1', 'cal3'}
+
+    def test_update_db_threads_and_processes(self, tmpdir, monkeypatch):
+        """no threads are alive when forking the worker processes"""
+        monkeypatch.setattr(khal.khalendar.khalendar, 'MIN_PARALLEL_UPDATES', 2)
+        alive = []
+
+        class ProcessPoolExecutor(khal.khalendar.khalendar.ProcessPoolExecutor):
+            def __init__(self, *args, **kwargs):
+                alive.append([thread.name for thread in threading.enumerate()
+                              if thread is not threading.current_thread()])
+                super().__init__(*args, **kwargs)
+
+        monkeypatch.setattr(
+            khal.khalendar.khalendar, 'ProcessPoolExecutor', ProcessPoolExecutor)
+        calendars = {}
+        for num, names in enumerate([['event_dt_simple'],
+                                     ['event_rrule_recuid', 'event_d', 'invalid_tzoffset'],
+                                     ['event_dt_floating'],
+                                     ['event_rrule_recuid_invalid_tzid']]):
+            path = tmpdir.mkdir(f'cal{num}')
+            for name in names:
+                path.join(f'{name}.ics').write(_get_text(name))
+            calendars[f'cal{num}'] = {
+                'name': f'cal{num}', 'path': str(path), 'color': 'dark blue',
+                'readonly': False, 'unicode_symbols': True, 'addresses': ''}
+        start = BERLIN.localize(dt.datetime(2014, 1, 1))
+        end = BERLIN.localize(dt.datetime(2015, 1, 1))
+        results = []
+        for workers, threads in [(1, 1), (2, 3)]:
+            coll = CalendarCollection(calendars, dbpath=':memory:', locale=LOCALE_BERLIN,
+                                      workers=workers, threads=threads)
+            results.append(sorted(
+                (event.calendar, event.href, event.start, event.summary)
+                for event in itertools.chain(
+                    coll.get_localized(start, end),
+                    coll.get_floating(start.replace(tzinfo=None), end.replace(tzinfo=None)))))
+        assert results[0] == results[1]
+        assert {calendar for calendar, *_ in results[1]} == {'cal0', 'cal1', 'cal2', 'cal3'}
+        assert alive == [[]]
+
+    def test_light_events(self, coll_vdirs):
+        """LightEvents have the same attributes as events parsed from ics"""
+        coll, _ = coll_vdirs
+        for name in ['event_dt_simple', 'event_dt_floating', 'event_d_long', 'event_d_rr',
+                     'event_rrule_recuid_cancelled', 'event_dt_status_confirmed']:
+            ics = _get_text(name).replace('V042MJ8B3SJNFXQOJL6P53OFMHJE8Z3VZWOU', name)
+            event = Event.fromString(ics, calendar=cal1, locale=LOCALE_BERLIN)
+            if name == 'event_dt_simple':
+                event.update_alarms([(dt.timedelta(minutes=-10), 'alarm')])
+            coll.insert(event, cal1)
+        start = dt.datetime(2014, 4, 1)
+        end = dt.datetime(2014, 8, 1)
+        localize = LOCALE_BERLIN['local_timezone'].localize
+
+        def get_events(light):
+            return sorted(itertools.chain(
+                coll.get_localized(localize(start), localize(end), light=light),
+                coll.get_floating(start, end, light=light),
+            ))
+
+        def get_attributes(events):
+            return [{key: value for key, value in event.attributes(
+                relative_to=dt.date(2014, 7, 14), env={}).items()
+                if key not in VEVENT_ATTRIBUTES} for event in events]
+
+        light_events = get_events(light=True)
+        assert all(isinstance(event, LightEvent) for event in light_events)
+        full_attributes = get_attributes(get_events(light=False))
+        assert get_attributes(light_events) == full_attributes
+        assert len(full_attributes) == 19
+        assert {attr['alarm-symbol'] for attr in full_attributes} == {'', ' \N{Alarm clock}'}
+        assert {attr['cancelled'] for attr in full_attributes} == {'', 'CANCELLED '}
+
+    @pytest.mark.parametrize('light', [False, True])
+    def test_events_in_ranges(self, coll_vdirs, light):
+        """same events as querying each range separately"""
+        coll, _ = coll_vdirs
+        for name in ['event_dt_simple', 'event_dt_floating', 'event_d_long', 'event_d_rr',
+                     'event_dt_rr', 'event_dt_two_tz', 'event_dt_multi_recuid_no_master']:
+            ics = _get_text(name).replace('V042MJ8B3SJNFXQOJL6P53OFMHJE8Z3VZWOU', name)
+            coll.insert(Event.fromString(ics, calendar=cal1, locale=LOCALE_BERLIN), cal1)
+        for index, (start, end) in enumerate([('T220000Z', 'T230000Z'),  # ends at midnight
+                                              ('T000000', 'T000000')]):  # lasts no time
+            coll.insert(coll.create_event_from_ics(dedent(f"""
+            BEGIN:VEVENT
+            UID:midnight-{index}
+            DTSTART:20140410{start}
+            DTEND:20140410{end}
+            SUMMARY:midnight
+            END:VEVENT
+            """), cal1), cal1)
+        localize = LOCALE_BERLIN['local_timezone'].localize
+        days = [(dt.datetime.combine(day, dt.time.min), dt.datetime.combine(day, dt.time.max))
+                for day in (dt.date(2014, 4, 1) + dt.timedelta(days=n) for n in range(122))]
+        days[-1] = (days[-1][0], days[-1][0] + dt.timedelta(hours=12))
+
+        def get_events(events):
+            return sorted((event.href, event.start, event.summary) for event in events)
+        expected = [get_events(itertools.chain(
+            coll.get_localized(localize(start), localize(end), light=light),
+            coll.get_floating(start, end, light=light),
+        )) for start, end in days]
+        assert [get_events(events) for events in
+                coll.get_events_in_ranges(days, light=light)] == expected
+        assert sum(len(events) for events in expected) == 30
+        assert expected[9]
+
     def test_invalid_timezones(self, coll_vdirs):
         """testing if we can delete any of two events in two different
         calendars with the same filename"""
@@ -547,6 +770,40 @@ def test_only_update_old_event(coll_vdirs, monkeypatch, sleep_time):
     assert updated_hrefs == [href_three]
 
 
+def test_update_hrefs(coll_vdirs, sleep_time):
+    coll, vdirs = coll_vdirs
+    meeting = dedent("""
+    BEGIN:VEVENT
+    UID:meeting-one
+    DTSTART;TZID=Europe/Berlin:{}T233000
+    DTEND;TZID=Europe/Berlin:{}T234500
+    SUMMARY:late meeting
+    END:VEVENT
+    """)
+    href, etag = vdirs[cal1].upload(
+        coll.create_event_from_ics(meeting.format('20140909', '20140909'), cal1))
+    assert coll.update_hrefs(cal1, [href, 'color']) == [(dt.date(2014, 9, 9), dt.date(2014, 9, 9))]
+    assert len(list(coll.get_events_on(dt.date(2014, 9, 9)))) == 1
+    assert not coll.needs_update()
+    # nothing changed
+    assert coll.update_hrefs(cal1, [href]) == []
+
+    sleep(sleep_time)  # Make sure we get a new etag
+    vdirs[cal1].update(
+        href, coll.create_event_from_ics(meeting.format('20140912', '20140913'), cal1), etag)
+    assert coll.update_hrefs(cal1, [href]) == [
+        (dt.date(2014, 9, 9), dt.date(2014, 9, 9)),
+        (dt.date(2014, 9, 12), dt.date(2014, 9, 13)),
+    ]
+    assert list(coll.get_events_on(dt.date(2014, 9, 9))) == []
+    assert len(list(coll.get_events_on(dt.date(2014, 9, 12)))) == 1
+
+    os.remove(os.path.join(vdirs[cal1].path, href))
+    assert coll.update_hrefs(cal1, [href]) == [(dt.date(2014, 9, 12), dt.date(2014, 9, 13))]
+    assert list(coll.get_events_on(dt.date(2014, 9, 12))) == []
+    assert not coll.needs_update()
+
+
 card = """BEGIN:VCARD
 VERSION:3.0
 FN:Unix
@@ -585,6 +842,18 @@ def test_birthdays(coll_vdirs_birthday, sleep_time):
         coll.get_floating(dt.datetime(2014, 3, 11), dt.datetime(2014, 3, 11)))[0].summary
 
 
+def test_birthdays_light(coll_vdirs_birthday, sleep_time):
+    """birthdays are always parsed, as their summary depends on the instance"""
+    coll, vdirs = coll_vdirs_birthday
+    sleep(sleep_time)  # Make sure we get a new ctag on upload
+    vdirs[cal1].upload(DumbItem(card, 'unix'))
+    coll.update_db()
+    events = list(
+        coll.get_floating(dt.datetime(2012, 3, 11), dt.datetime(2012, 3, 11), light=True))
+    assert not isinstance(events[0], LightEvent)
+    assert events[0].summary == 'Unix\'s 41st birthday'
+
+
 def test_birthdays_29feb(coll_vdirs_birthday, sleep_time):
     """test how we deal with birthdays on 29th of feb in leap years"""
     coll, vdirs = coll_vdirs_birthday
@@ -356,6 +356,12 @@ class TestExpand:
         dtstart = icalendar_helpers.expand(vevent, berlin)
         assert dtstart == self.dstartend
 
+    def test_expand_window(self):
+        vevent = _get_vevent(event_dt)
+        dtstart = icalendar_helpers.expand(
+            vevent, berlin, window=(dt.datetime(2013, 6, 1), dt.datetime(2013, 10, 1)))
+        assert dtstart == [self.dtstartend_berlin[i] for i in (0, 2, 3)]
+
     def test_expand_invalid_exdate(self):
         """testing if we can expand an event with EXDATEs that do not much
         its RRULE"""
@@ -49,7 +49,12 @@ class TestSettings:
                     'color': None, 'priority': 10, 'type': 'calendar', 'addresses': [''],
                 },
             },
-            'sqlite': {'path': os.path.expanduser('~/.cache/khal/khal.db')},
+            'sqlite': {
+                'path': os.path.expanduser('~/.cache/khal/khal.db'),
+                'recurrence_window': dt.timedelta(0),
+                'workers': 0,
+                'threads': 4,
+            },
             'locale': LOCALE_BERLIN,
             'default': {
                 'default_calendar': None,
@@ -62,6 +67,7 @@ class TestSettings:
                 'default_dayevent_alarm': dt.timedelta(0),
                 'show_all_days': False,
                 'enable_mouse': True,
+                'watch_vdirs': True,
             }
         }
         for key in comp_config:
@@ -89,7 +95,12 @@ class TestSettings:
                 'work': {'path': os.path.expanduser('~/.calendars/work/'),
                          'readonly': True, 'color': None, 'priority': 10,
                          'type': 'calendar', 'addresses': ['user@example.com']}},
-            'sqlite': {'path': os.path.expanduser('~/.cache/khal/khal.db')},
+            'sqlite': {
+                'path': os.path.expanduser('~/.cache/khal/khal.db'),
+                'recurrence_window': dt.timedelta(0),
+                'workers': 0,
+                'threads': 4,
+            },
             'locale': {
                 'local_timezone': get_localzone(),
                 'default_timezone': get_localzone(),
@@ -111,6 +122,7 @@ class TestSettings:
                 'default_dayevent_duration': dt.timedelta(days=1),
                 'show_all_days': False,
                 'enable_mouse': True,
+                'watch_vdirs': True,
                 'default_event_alarm': dt.timedelta(0),
                 'default_dayevent_alarm': dt.timedelta(0),
             }
@@ -311,3 +323,64 @@ def test_is_color():
     assert is_color('123') == '123'
     with pytest.raises(VdtValueError):
         assert is_color('red') == 'red'
+
+
+def test_cached_config(metavdirs, tmp_path_factory, monkeypatch):
+    # not in metavdirs, whose mtime is part of the cache key
+    monkeypatch.setattr(
+        'xdg.BaseDirectory.xdg_cache_home', str(tmp_path_factory.mktemp('cache')))
+    conf_path = str(tmp_path_factory.mktemp('config') / 'khal.conf')
+    with open(conf_path, 'w') as conf:
+        conf.write(f"""
+[calendars]
+[[default]]
+path = {metavdirs}/cal[1-3]/*
+type = discover
+[[cal4]]
+path = {metavdirs}/cal4/dircolor
+color = auto
+unknown = 42
+""")
+    read = []
+
+    def get_color(path):
+        read.append(path)
+        return get_color_from_vdir(path)
+
+    def cached_config():
+        read.clear()
+        return get_config(conf_path, _get_color_from_vdir=get_color, use_cache=True)
+
+    config = cached_config()
+    assert read
+    assert config['calendars']['cal4']['color'] == 'dark blue'
+    assert cached_config() == config
+    assert read == []
+
+    # a new vdir is discovered
+    os.makedirs(metavdirs + '/cal2/private')
+    config = cached_config()
+    assert metavdirs + '/cal2/private' in [
+        calendar['path'] for calendar in config['calendars'].values()]
+    assert metavdirs + '/cal2/private' in read
+    cached_config()
+    assert read == []
+
+    # a vdir's color changes
+    with open(metavdirs + '/cal4/dircolor/color.new', 'w') as metafile:
+        metafile.write('#ff0000')
+    os.replace(metavdirs + '/cal4/dircolor/color.new', metavdirs + '/cal4/dircolor/color')
+    assert cached_config()['calendars']['cal4']['color'] == '#ff0000'
+
+    # the config file changes
+    with open(conf_path, 'a') as conf:
+        conf.write('readonly = True\n')
+    assert cached_config()['calendars']['cal4']['readonly'] is True
+    assert read
+
+    # the cache is neither used nor updated without use_cache
+    read.clear()
+    get_config(conf_path, _get_color_from_vdir=get_color)
+    assert read
+    assert cached_config()['calendars']['cal4']['readonly'] is True
+    assert read == []
@@ -1,6 +1,8 @@
 """testing functions from the khal.utils"""
 import datetime as dt
+import textwrap
 
+import pytest
 from click import style
 from freezegun import freeze_time
 
@@ -101,6 +103,34 @@ def test_color_wrap_multiple_colors_and_tabs():
     assert actual == expected
 
 
+def test_color_wrap_fits():
+    """lines taking the shortcut in color_wrap would not have been changed"""
+    red = style('', reset=False, fg='red')
+    for text in ['short', '  indented', 'trailing ', 'tab\there', 'two\nlines', '', ' ',
+                 'no\u00a0break\u2003', red + 'red' + utils.RESET, red + 'unreset',
+                 'exactly ten', 'just 10 ch']:
+        if utils._fits(text, 10):
+            assert textwrap.wrap(text, 10) == [text]
+            assert utils.find_unmatched_sgr(text) is None
+    assert utils._fits('  indented', 10)
+    assert utils._fits(red + 'red' + utils.RESET, 20)
+    assert not utils._fits('exactly ten', 10)
+    assert not utils._fits(red + 'unreset', 20)
+
+
+def test_compile_format():
+    row = {'title': 'An Event', 'start-time': '10:00', 'count': 3}
+    for format_string in ['{start-time} {title}', '{title:>12}|{count:03}', '{title!s}{{}}',
+                          '{title!r}', '{title[0]}', '{title:{start-time}}', 'no fields']:
+        try:
+            expected = format_string.format(**row)
+        except ValueError:
+            continue
+        assert utils.compile_format(format_string)(row) == expected
+    with pytest.raises(KeyError):
+        utils.compile_format('{title} {location}')(row)
+
+
 def test_get_weekday_occurrence():
     assert utils.get_weekday_occurrence(dt.datetime(2017, 3, 1)) == (2, 1)
     assert utils.get_weekday_occurrence(dt.datetime(2017, 3, 2)) == (3, 1)
@@ -126,3 +156,9 @@ def test_human_formatter_width():
     formatter = utils.human_formatter('{red}{title}', width=10)
     output = formatter({'title': 'morethan10characters', 'red': style('', reset=False, fg='red')})
     assert output.startswith('\x1b[31mmoret\x1b[0m')
+
+
+def test_format_fields():
+    assert utils.format_fields('{red}{title:>10} {start-date}{nl}') == \
+        {'red', 'title', 'start-date', 'nl'}
+    assert utils.format_fields('no fields {{here}}') == set()
@@ -77,3 +77,50 @@ def test_get_href_from_uid():
 
     href = vdir._generate_href()
     assert href is not None
+
+
+def test_item_uid():
+    raw = (
+        'BEGIN:VCALENDAR\r\n'
+        'BEGIN:VTIMEZONE\r\nTZID:Europe/Berlin\r\nEND:VTIMEZONE\r\n'
+        'BEGIN:VEVENT\r\n'
+        'BEGIN:VALARM\r\nUID:alarm\r\nEND:VALARM\r\n'
+        'UID:V042MJ8B3SJNFXQOJL6P\r\n 53OFMHJE8Z3VZWOU\r\n'
+        'SUMMARY:An Event\r\n'
+        'END:VEVENT\r\n'
+        'BEGIN:VEVENT\r\nUID:second\r\nEND:VEVENT\r\n'
+        'END:VCALENDAR\r\n'
+    )
+    assert vdir.Item(raw).uid == 'V042MJ8B3SJNFXQOJL6P53OFMHJE8Z3VZWOU'
+    assert vdir.Item('BEGIN:VTODO\nUID:todo\nEND:VTODO').uid == 'todo'
+    assert vdir.Item('BEGIN:VEVENT\nEND:VEVENT').uid is None
+    assert vdir.Item(raw, uid='known').uid == 'known'
+
+
+def test_list(tmpdir):
+    collection = vdir.Vdir(str(tmpdir), '.ics')
+    items = [vdir.Item(f'BEGIN:VEVENT\nUID:{uid}\nEND:VEVENT') for uid in ['one', 'two']]
+    etags = dict(collection.upload(item) for item in items)
+    tmpdir.mkdir('directory.ics')
+    tmpdir.join('displayname').write('calendar')
+    assert dict(collection.list()) == etags == {
+        href: vdir.get_etag_from_file(str(tmpdir.join(href))) for href in etags}
+
+
+def test_sync(tmpdir, monkeypatch):
+    collection = vdir.Vdir(str(tmpdir), '.ics')
+    items = [vdir.Item(f'BEGIN:VEVENT\nUID:{uid}\nEND:VEVENT') for uid in ['one', 'two']]
+    hrefs = [collection.upload(item, fsync=False)[0] for item in items]
+    synced = []
+    monkeypatch.setattr(os, 'fsync', lambda fd: synced.append(os.fstat(fd).st_ino))
+    monkeypatch.setattr(os, 'sync', None)
+    etags = collection.sync(hrefs)
+    # only the new files and the vdir are synced
+    assert synced == [os.stat(path).st_ino for path in
+                      [str(tmpdir.join(href)) for href in hrefs] + [str(tmpdir)]]
+    assert dict(collection.list()) == dict(zip(hrefs, etags))
+
+    # an overwritten file is synced before it replaces the old one
+    synced.clear()
+    collection.update(hrefs[0], vdir.Item(items[0].raw + '\n'), etags[0])
+    assert synced[-1] == os.stat(str(tmpdir.join(hrefs[0]))).st_ino
@@ -0,0 +1,70 @@
+import os
+import sys
+
+import pytest
+
+from khal.khalendar.watcher import VdirWatcher
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason='needs inotify')
+
+
+@pytest.fixture
+def watcher(tmpdir):
+    paths = {name: str(tmpdir.mkdir(name)) for name in ['home', 'work']}
+    watcher = VdirWatcher(paths)
+    yield watcher, paths
+    watcher.close()
+
+
+def test_watch(watcher):
+    watcher, paths = watcher
+    assert watcher.read() == {}
+
+    with open(os.path.join(paths['home'], '.tmp-one.ics'), 'w') as f:
+        f.write('BEGIN:VCALENDAR')
+    os.rename(os.path.join(paths['home'], '.tmp-one.ics'), os.path.join(paths['home'], 'one.ics'))
+    os.remove(os.path.join(paths['home'], 'one.ics'))
+    with open(os.path.join(paths['work'], 'two.ics'), 'w') as f:
+        f.write('BEGIN:VCALENDAR')
+    assert watcher.read() == {'home': {'.tmp-one.ics', 'one.ics'}, 'work': {'two.ics'}}
+    assert watcher.read() == {}
+
+
+def test_vdir_removed(watcher):
+    watcher, paths = watcher
+    os.rmdir(paths['work'])
+    assert watcher.read() is None
+
+
+def test_rewatch(watcher):
+    watcher, paths = watcher
+    os.rmdir(paths['work'])
+    assert watcher.read() is None
+    with pytest.raises(OSError, match='Cannot watch'):
+        watcher.rewatch()
+
+    os.mkdir(paths['work'])
+    watcher.rewatch()
+    assert watcher.read() == {}
+    with open(os.path.join(paths['work'], 'two.ics'), 'w') as f:
+        f.write('BEGIN:VCALENDAR')
+    assert watcher.read() == {'work': {'two.ics'}}
+
+
+def test_rewatch_moved_vdir(watcher, tmpdir):
+    watcher, paths = watcher
+    os.rename(paths['work'], str(tmpdir.join('moved')))
+    os.mkdir(paths['work'])
+    assert watcher.read() is None
+    watcher.rewatch()
+    # changes to the moved away directory are not reported anymore
+    with open(str(tmpdir.join('moved', 'one.ics')), 'w') as f:
+        f.write('BEGIN:VCALENDAR')
+    with open(os.path.join(paths['work'], 'two.ics'), 'w') as f:
+        f.write('BEGIN:VCALENDAR')
+    assert watcher.read() == {'work': {'two.ics'}}
+
+
+def test_missing_vdir(tmpdir):
+    with pytest.raises(OSError, match='Cannot watch'):
+        VdirWatcher({'home': str(tmpdir.join('nonexisting'))})